@@ -0,0 +1,204 @@
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from django_nats_nkeys.executor import nsc_executor
+from django_nats_nkeys.jwt import decode_jwt
+from django_nats_nkeys.settings import nats_nkeys_settings
+
+# (src account, target account, subject)
+ActivationKey = Tuple[str, str, str]
+
+# tokens expiring within this many seconds are minted again, so the import isn't added with an about-to-expire token
+EXPIRY_MARGIN = 60
+
+
+def activation_jwt(output: str) -> str:
+    """
+    Returns the JWT from `nsc generate activation` output, which may be wrapped in -----BEGIN/END----- markers
+    """
+    lines = [line.strip() for line in output.strip().split("\n")]
+    for i, line in enumerate(lines[:-1]):
+        if line.startswith("-----BEGIN "):
+            return lines[i + 1]
+    return lines[0] if lines else ""
+
+
+@contextmanager
+def token_file(token: str) -> Iterator[Tuple[str, Tuple[int, ...]]]:
+    """
+    Yields (path, pass_fds) of a file holding token, for `nsc add import --token <path>`
+
+    The token is written to an anonymous memfd (Linux) or a pipe, passed to nsc as /dev/fd/<fd>, so it never touches the filesystem. Falls back to a NamedTemporaryFile where /dev/fd isn't available.
+    """
+    if not os.path.isdir("/dev/fd"):
+        with tempfile.NamedTemporaryFile("w+") as f:
+            f.write(token)
+            f.flush()
+            yield f.name, ()
+        return
+    data = token.encode()
+    if hasattr(os, "memfd_create"):
+        fd = os.memfd_create("nats-activation", os.MFD_CLOEXEC)
+        os.write(fd, data)
+        os.lseek(fd, 0, os.SEEK_SET)
+    else:
+        # tokens are a few hundred bytes, far below the pipe buffer, so the write never blocks
+        fd, write_fd = os.pipe()
+        try:
+            os.write(write_fd, data)
+        finally:
+            os.close(write_fd)
+    try:
+        yield f"/dev/fd/{fd}", (fd,)
+    finally:
+        os.close(fd)
+
+
+class ActivationTokenCache:
+    """
+    Activation tokens minted by `nsc generate activation`, keyed by (src account, target account, subject)
+
+    Tokens are reused until EXPIRY_MARGIN seconds before their exp claim (tokens without exp never expire), or until their issuer is no longer the src account's identity or one of its signing keys (e.g. after the account was deleted and re-added).
+    If NATS_NSC_ACTIVATION_CACHE names a Django cache alias, tokens are also shared through that cache, so re-runs in other processes (nsc_worker, nsc_reconcile) reuse them.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._tokens: Dict[ActivationKey, str] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def clear(self) -> None:
+        with self._lock:
+            self._tokens.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def invalidate(self, account_name: str) -> None:
+        """
+        Drops tokens issued by or for account_name
+        Only the in-process cache is cleared, shared entries fail the issuer check once the account's keys change
+        """
+        with self._lock:
+            for key in list(self._tokens):
+                if account_name in key[:2]:
+                    del self._tokens[key]
+
+    def _shared_cache(self):
+        alias = nats_nkeys_settings.NATS_NSC_ACTIVATION_CACHE
+        if alias is None:
+            return None
+        from django.core.cache import caches
+
+        return caches[alias]
+
+    def _shared_key(self, key: ActivationKey) -> str:
+        return ":".join(
+            [
+                "django_nats_nkeys",
+                "activation",
+                nats_nkeys_settings.NATS_NKEYS_OPERATOR_NAME,
+            ]
+            + list(key)
+        )
+
+    def _issuers(self, src_account_name: str) -> List[str]:
+        from django_nats_nkeys.services import nsc_describe_json
+
+        claims = nsc_describe_json(src_account_name)
+        signing_keys = claims.get("nats", {}).get("signing_keys") or []
+        return [claims.get("sub")] + [
+            # signing keys are either public keys or scoped signing key objects
+            sk if isinstance(sk, str) else sk.get("key")
+            for sk in signing_keys
+        ]
+
+    def valid(self, key: ActivationKey, token: str) -> bool:
+        try:
+            _, claims, _ = decode_jwt(activation_jwt(token))
+        except ValueError:
+            return False
+        exp = claims.get("exp")
+        if exp and exp - EXPIRY_MARGIN <= time.time():
+            return False
+        try:
+            issuers = self._issuers(key[0])
+        except Exception:
+            # src account unreadable or gone, mint again (and let nsc report why)
+            return False
+        return claims.get("iss") in issuers
+
+    def lookup(self, key: ActivationKey) -> Optional[str]:
+        """
+        Returns a cached, still valid token for key, or None
+        """
+        with self._lock:
+            token = self._tokens.get(key)
+        if token is None:
+            shared = self._shared_cache()
+            if shared is not None:
+                token = shared.get(self._shared_key(key))
+        if token is not None and self.valid(key, token):
+            with self._lock:
+                self._tokens[key] = token
+                self.hits += 1
+            return token
+        with self._lock:
+            self._tokens.pop(key, None)
+            self.misses += 1
+        return None
+
+    def set(self, key: ActivationKey, token: str) -> None:
+        with self._lock:
+            self._tokens[key] = token
+        shared = self._shared_cache()
+        if shared is not None:
+            shared.set(self._shared_key(key), token, timeout=None)
+
+    def _generate(self, key: ActivationKey) -> str:
+        from django_nats_nkeys.services import nsc_generate_activation
+
+        token = nsc_generate_activation(*key)
+        self.set(key, token)
+        return token
+
+    def get(self, src_account_name: str, target_account_name: str, subject: str) -> str:
+        """
+        Returns a valid activation token, minting one if none is cached
+        """
+        key = (src_account_name, target_account_name, subject)
+        token = self.lookup(key)
+        if token is None:
+            token = self._generate(key)
+        return token
+
+    def get_many(self, keys: Iterable[ActivationKey]) -> Dict[ActivationKey, str]:
+        """
+        Returns a valid activation token for each key, minting missing tokens in parallel on nsc_executor
+        Raises the first minting failure, after the other tokens are cached
+        """
+        tokens = {}
+        missing = []
+        for key in dict.fromkeys(keys):
+            token = self.lookup(key)
+            if token is None:
+                missing.append(key)
+            else:
+                tokens[key] = token
+        futures = [(key, nsc_executor.submit(self._generate, key)) for key in missing]
+        error = None
+        for key, future in futures:
+            try:
+                tokens[key] = future.result()
+            except Exception as e:
+                error = error or e
+        if error is not None:
+            raise error
+        return tokens
+
+
+activation_cache = ActivationTokenCache()
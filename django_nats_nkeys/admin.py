@@ -32,10 +32,13 @@ def enable_jetstream(
     request: HttpRequest,
     queryset: QuerySet[Any],
 ):
-    for org in queryset:
-        org.jetstream_enabled = True
-        # update_fields is required to trigger nsc account edit in signals.py
-        org.save(update_fields=["jetstream_enabled"])
+    from django_nats_nkeys.services import nsc_batch
+
+    with nsc_batch():
+        for org in queryset:
+            org.jetstream_enabled = True
+            # update_fields is required to trigger nsc account edit in signals.py
+            org.save(update_fields=["jetstream_enabled"])
 
 
 @admin.register(NatsOrganization)
@@ -78,10 +81,13 @@ def enable_bearer_auth(
     request: HttpRequest,
     queryset: QuerySet[Any],
 ):
-    for app in queryset:
-        app.bearer = True
-        # update_fields is required to trigger nsc user edit in signals.py
-        app.save(update_fields=["bearer"])
+    from django_nats_nkeys.services import nsc_batch
+
+    with nsc_batch():
+        for app in queryset:
+            app.bearer = True
+            # update_fields is required to trigger nsc user edit in signals.py
+            app.save(update_fields=["bearer"])
 
 
 @admin.register(NatsOrganizationApp)
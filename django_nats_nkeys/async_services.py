@@ -0,0 +1,544 @@
+"""
+asyncio counterparts of django_nats_nkeys.services
+
+nsc is run with asyncio.create_subprocess_exec, and all nsc subprocesses started from the same event loop share a semaphore sized by NATS_NSC_ASYNC_CONCURRENCY. ORM calls are wrapped with asgiref's sync_to_async.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import os
+import subprocess
+import weakref
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple, Union
+
+from asgiref.sync import sync_to_async
+
+from django_nats_nkeys import store
+from django_nats_nkeys.activation_cache import activation_cache, token_file
+from django_nats_nkeys.creds import creds_engine
+from django_nats_nkeys.creds_cache import creds_cache
+from django_nats_nkeys.describe_cache import describe_cache
+from django_nats_nkeys.executor import (
+    NscStoreLock,
+    nsc_cmd_account,
+    nsc_cmd_readonly,
+    nsc_cmd_user,
+)
+from django_nats_nkeys.outbox import nsc_deferred
+from django_nats_nkeys.push import push_scheduler
+from django_nats_nkeys.resolver import resolver_pusher
+from django_nats_nkeys.store_index import store_index
+from django_nats_nkeys.services import (
+    MODEL_GETTERS,
+    NscBatch,
+    NSCValidator,
+    _create_org_owner_units,
+    _get_or_create_org_owner_units_locked,
+    _nsc_batch,
+    check_nsc_returncode,
+    create_organization,
+    get_org_owner_units,
+    log_nsc_output,
+    nsc_app_permissions_cmd,
+    nsc_add_import_token_cmd,
+    nsc_dir_args,
+    nsc_generate_activation_cmd,
+    nsc_jetstream_update_cmd,
+    nsc_pull_cmd,
+    nsc_push_cmd,
+    nsc_skip_add,
+    set_nsc_complete,
+)
+from django_nats_nkeys.settings import NatsNscPushBackend, nats_nkeys_settings
+
+logger = logging.getLogger(__name__)
+
+
+def __getattr__(name: str) -> Any:
+    if name in MODEL_GETTERS:
+        return MODEL_GETTERS[name]()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+# asyncio.Semaphore is bound to the loop it is first used on, so keep one per running loop
+_semaphores: (
+    "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]"
+) = weakref.WeakKeyDictionary()
+
+
+def nsc_semaphore() -> asyncio.Semaphore:
+    loop = asyncio.get_running_loop()
+    semaphore = _semaphores.get(loop)
+    if semaphore is None:
+        semaphore = asyncio.Semaphore(nats_nkeys_settings.NATS_NSC_ASYNC_CONCURRENCY)
+        _semaphores[loop] = semaphore
+    return semaphore
+
+
+async def _exec(
+    cmd: List[str],
+    account: Optional[str] = None,
+    user: Optional[str] = None,
+    shared: bool = False,
+    pass_fds: Tuple[int, ...] = (),
+) -> subprocess.CompletedProcess:
+    async with nsc_semaphore():
+        lock = NscStoreLock(account, user=user, shared=shared)
+        # flock blocks, so wait for it off the event loop
+        acquired = asyncio.get_running_loop().run_in_executor(None, lock.acquire)
+        try:
+            await asyncio.shield(acquired)
+        except asyncio.CancelledError:
+            # the executor thread still takes the flock after we stop waiting, release it once it does
+            acquired.add_done_callback(lambda _: lock.release())
+            raise
+        try:
+            proc = await asyncio.create_subprocess_exec(
+                *cmd,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE,
+                pass_fds=pass_fds,
+            )
+            out, err = await proc.communicate()
+        finally:
+            lock.release()
+    return subprocess.CompletedProcess(
+        cmd, proc.returncode, out.decode("utf8"), err.decode("utf8")
+    )
+
+
+async def arun_nsc_and_log_output(
+    cmd: List[str], stdout=True, stderr=True, check=True, pass_fds=()
+) -> subprocess.CompletedProcess:
+    if "nsc" not in cmd:
+        raise ValueError(
+            "arun_nsc_and_log_output is a wrapper for nsc and not intended for general-purpose commands. Received command: %s",
+            cmd,
+        )
+    modified_cmd = cmd + nsc_dir_args()
+    logger.info("Running cmd: %s", modified_cmd)
+    result = await _exec(
+        modified_cmd,
+        account=nsc_cmd_account(cmd),
+        user=nsc_cmd_user(cmd),
+        shared=nsc_cmd_readonly(cmd),
+        pass_fds=pass_fds,
+    )
+    store_index.nsc_command_ran(cmd)
+    log_nsc_output(result, stdout=stdout, stderr=stderr)
+
+    if check is True:
+        check_nsc_returncode(cmd, result)
+    return result
+
+
+async def _aflush(batch: NscBatch) -> None:
+    accounts, batch.accounts = batch.accounts, {}
+    describes, batch.describes = batch.describes, {}
+    await asyncio.gather(
+        *[
+            ansc_push(account=account, force=force)
+            for account, force in accounts.items()
+        ]
+    )
+    await asyncio.gather(
+        *[
+            asave_describe_json(account_name, obj, app_name=app_name)
+            for account_name, obj, app_name in describes.values()
+        ]
+    )
+
+
+@asynccontextmanager
+async def ansc_batch(flush_on_error: bool = True) -> AsyncIterator[NscBatch]:
+    """
+    Async nsc_batch(): pushes touched accounts concurrently and refreshes each touched object once on exit
+    """
+    batch = _nsc_batch.get()
+    if batch is not None:
+        yield batch
+        return
+    batch = NscBatch()
+    token = _nsc_batch.set(batch)
+    try:
+        yield batch
+    except BaseException:
+        _nsc_batch.reset(token)
+        if flush_on_error:
+            await _aflush(batch)
+        raise
+    _nsc_batch.reset(token)
+    await _aflush(batch)
+
+
+async def ansc_push(
+    account=None, force=False, wait=False
+) -> Optional[Union[subprocess.CompletedProcess, List[Dict[str, Any]]]]:
+    batch = _nsc_batch.get()
+    if batch is not None and account is not None:
+        batch.push(account, force=force)
+        return None
+
+    if account is not None and nats_nkeys_settings.NATS_NSC_PUSH_DEBOUNCE > 0:
+        future = push_scheduler.schedule(account)
+        if wait is True:
+            return await asyncio.wrap_future(future)
+        return None
+
+    if nats_nkeys_settings.NATS_NSC_PUSH_BACKEND == NatsNscPushBackend.NATS:
+        return await resolver_pusher.apush(account=account)
+    cmd = nsc_push_cmd(account=account)
+    result = await _exec(cmd, account=account)
+    log_nsc_output(result)
+    result.check_returncode()
+    return result
+
+
+async def ansc_pull(account=None, force=False) -> subprocess.CompletedProcess:
+    return await arun_nsc_and_log_output(nsc_pull_cmd(account=account, force=force))
+
+
+async def ansc_validate(account_name: Optional[str] = None) -> NSCValidator:
+    validator = NSCValidator(account_name=account_name)
+    validator.result = await arun_nsc_and_log_output(validator.cmd(), check=False)
+    return validator
+
+
+async def ansc_describe_json(
+    account_name: str, app_name: Optional[str] = None
+) -> Dict[Any, Any]:
+    validator = describe_cache.validator(account_name, app_name)
+    if validator is None:
+        return await _ansc_describe_json(account_name, app_name=app_name)
+    data = describe_cache.get(account_name, app_name, validator)
+    if data is None:
+        data = await _ansc_describe_json(account_name, app_name=app_name)
+        describe_cache.set(account_name, app_name, validator, data)
+    return data
+
+
+async def _ansc_describe_json(
+    account_name: str, app_name: Optional[str] = None
+) -> Dict[Any, Any]:
+    if nats_nkeys_settings.NATS_NSC_NATIVE_DESCRIBE:
+        try:
+            return store.describe_json(account_name, user_name=app_name)
+        except (OSError, ValueError) as e:
+            logger.warning(
+                "Native describe unavailable for account=%s app=%s, falling back to nsc: %s",
+                account_name,
+                app_name,
+                e,
+            )
+    if app_name is None:
+        cmd = ["nsc", "describe", "account", "--name", account_name, "--json"]
+    else:
+        cmd = [
+            "nsc",
+            "describe",
+            "user",
+            "--name",
+            app_name,
+            "--account",
+            account_name,
+            "--json",
+        ]
+    result = await arun_nsc_and_log_output(cmd)
+    return json.loads(result.stdout)
+
+
+async def asave_describe_json(
+    account_name: str,
+    obj: Union[NatsOrganization, NatsRobotAccountModel, NatsOrganizationUser],
+    app_name: Optional[str] = None,
+) -> Union[NatsOrganization, NatsRobotAccountModel]:
+    batch = _nsc_batch.get()
+    if batch is not None:
+        batch.describe(account_name, obj, app_name=app_name)
+        return obj
+    obj.json = await ansc_describe_json(account_name, app_name=app_name)
+    await sync_to_async(obj.save)(update_fields=["json"])
+    return obj
+
+
+async def ansc_add_account(
+    obj: Union[NatsOrganization, NatsRobotAccountModel],
+) -> Union[NatsOrganization, NatsRobotAccountModel]:
+    # try create nsc account
+    if not nsc_skip_add(obj.name):
+        await arun_nsc_and_log_output(["nsc", "add", "account", "--name", obj.name])
+    # generate a signing key for account
+    await arun_nsc_and_log_output(
+        ["nsc", "edit", "account", "--name", obj.name, "--sk", "generate"]
+    )
+    # push local changes to remote NATs resolver
+    await ansc_push(account=obj.name)
+
+    # describe the account and update organization's json representation
+    return await asave_describe_json(obj.name, obj)
+
+
+async def ansc_jetstream_update(org: NatsOrganization):
+    await arun_nsc_and_log_output(nsc_jetstream_update_cmd(org))
+    # push local changes to remote NATs resolver
+    await ansc_push(account=org.name)
+
+    # describe the account and update organization's json representation
+    return await asave_describe_json(org.name, org)
+
+
+async def ansc_bearer_auth_enable(app: NatsOrganizationApp):
+    organization = await sync_to_async(lambda: app.organization)()
+    await arun_nsc_and_log_output(
+        [
+            "nsc",
+            "edit",
+            "user",
+            "--account",
+            organization.name,
+            "--name",
+            app.app_name,
+            "--bearer",
+        ]
+    )
+    creds_cache.invalidate(organization.name, app.app_name)
+    # push local changes to remote NATs resolver
+    await ansc_push(account=organization.name)
+    # describe the account and update organization's json representation
+    await asave_describe_json(organization.name, app, app_name=app.app_name)
+
+
+async def ansc_add_app(
+    account_name: str,
+    app_name: str,
+    obj: Union[NatsOrganizationApp, NatsRobotAppModel],
+) -> Union[NatsOrganizationApp, NatsRobotAppModel]:
+    if not nsc_skip_add(account_name, user_name=app_name):
+        await arun_nsc_and_log_output(
+            [
+                "nsc",
+                "add",
+                "user",
+                "--account",
+                account_name,
+                "--name",
+                app_name,
+            ]
+        )
+
+    # update app permissions (if needed)
+    cmd = nsc_app_permissions_cmd(account_name, app_name, obj)
+    if cmd is not None:
+        await arun_nsc_and_log_output(cmd)
+    creds_cache.invalidate(account_name, app_name)
+    return await asave_describe_json(account_name, obj, app_name=app_name)
+
+
+async def ansc_generate_creds(account_name: str, app_name: str) -> str:
+    if nats_nkeys_settings.NATS_NSC_NATIVE_CREDS:
+        try:
+            return creds_engine.generate_creds(account_name, app_name)
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(
+                "Native creds unavailable for account=%s app=%s, falling back to nsc: %s",
+                account_name,
+                app_name,
+                e,
+            )
+    result = await arun_nsc_and_log_output(
+        ["nsc", "generate", "creds", "--account", account_name, "--name", app_name],
+        stdout=False,  # do not log sensitive credentials to attached stdout logger, just capture and store in memory
+    )
+    return result.stdout
+
+
+async def ansc_delete_account(account_name: str) -> subprocess.CompletedProcess:
+    result = await arun_nsc_and_log_output(["nsc", "delete", "account", account_name])
+    creds_cache.invalidate(account_name)
+    activation_cache.invalidate(account_name)
+    return result
+
+
+async def ansc_add_import(
+    src_account_name: str, dest_account_name: str, subject_pattern: str, public=False
+) -> subprocess.CompletedProcess:
+    # specify --src-acount and --remote-subject if importing a public stream
+    if public is True:
+        cmd = [
+            "nsc",
+            "add",
+            "import",
+            "--account",
+            dest_account_name,
+            "--src-account",
+            src_account_name,
+            "--remote-subject",
+            subject_pattern,
+        ]
+        return await arun_nsc_and_log_output(cmd)
+    # for a private export, we must use an activation token, reused from activation_cache if still valid
+    key = (src_account_name, dest_account_name, subject_pattern)
+    activation_token = await sync_to_async(activation_cache.lookup)(key)
+    if activation_token is None:
+        cmd = nsc_generate_activation_cmd(*key)
+        # do not log sensitive token to stdout/stderr loggers
+        result = await arun_nsc_and_log_output(cmd, stdout=False, stderr=False)
+        activation_token = result.stdout
+        activation_cache.set(key, activation_token)
+
+    # pass the token through an in-memory file descriptor instead of a file on disk
+    with token_file(activation_token) as (path, pass_fds):
+        return await arun_nsc_and_log_output(
+            nsc_add_import_token_cmd(dest_account_name, path),
+            stdout=False,
+            stderr=False,
+            pass_fds=pass_fds,
+        )
+
+
+async def ansc_export(dirname: str, force=False) -> subprocess.CompletedProcess:
+    cmd = ["nsc", "export", "keys", "--operator", "--dir", dirname]
+    if force is True:
+        cmd.append("--force")
+    return await arun_nsc_and_log_output(cmd)
+
+
+async def ansc_import(dirname: str) -> subprocess.CompletedProcess:
+    return await arun_nsc_and_log_output(["nsc", "import", "keys", "--dir", dirname])
+
+
+async def ansc_init_operator(name, outdir, server) -> str:
+    """
+    Async nsc_init_operator
+    """
+    await arun_nsc_and_log_output(
+        ["nsc", "add", "operator", "--name", name, "--sys", "--generate-signing-key"]
+    )
+    await arun_nsc_and_log_output(
+        ["nsc", "edit", "operator", "--account-jwt-server-url", server]
+    )
+    filename = os.path.join(outdir, f"{name}.conf")
+    await arun_nsc_and_log_output(
+        [
+            "nsc",
+            "generate",
+            "config",
+            "--force",
+            "--nats-resolver",
+            "--config-file",
+            filename,
+        ]
+    )
+    return filename
+
+
+async def acreate_nats_sk_service(
+    account_name: str,
+    signing_key: str,
+    obj: Union[NatsOrganization, NatsRobotAccountModel],
+    role: str = "service",
+) -> NatsOrganization:
+    await arun_nsc_and_log_output(
+        [
+            "nsc",
+            "edit",
+            "signing-key",
+            "--account",
+            account_name,
+            "--role",
+            role,
+            "--sk",
+            signing_key,
+        ]
+    )
+    await ansc_push(account=account_name)
+    return await asave_describe_json(account_name, obj)
+
+
+async def acreate_organization(
+    user: User,
+    name,
+    slug=None,
+    is_active=None,
+    org_defaults=None,
+    org_user_defaults=None,
+):
+    """
+    Async create_organization
+
+    Rows are written by create_organization, so OUTBOX and ON_COMMIT provisioning modes queue the nsc operations as usual. In SYNC mode, the account and user are then added with async nsc commands.
+    """
+    deferred = nsc_deferred()
+    organization = await sync_to_async(create_organization)(
+        user,
+        name,
+        slug=slug,
+        is_active=is_active,
+        org_defaults=org_defaults,
+        org_user_defaults=org_user_defaults,
+        provision=deferred,
+    )
+    if not deferred:
+        org_user = await sync_to_async(organization.organization_users.get)(user=user)
+        await ansc_provision_organization(organization, org_user)
+    return organization
+
+
+async def acreate_org_owner_units_for_authenticated_user(
+    user: User,
+) -> Tuple[NatsOrganization, NatsOrganizationOwner, NatsOrganizationUser]:
+    """
+    Async create_org_owner_units_for_authenticated_user, claiming a pooled account if NATS_NSC_ACCOUNT_POOL_SIZE > 0
+    """
+    units, pending = await sync_to_async(_create_org_owner_units)(user)
+    if pending:
+        org, _, org_user = units
+        await ansc_provision_organization(org, org_user)
+    return units
+
+
+async def ansc_provision_organization(
+    org: NatsOrganization, org_user: NatsOrganizationUser
+) -> None:
+    """
+    Async nsc_provision_organization
+    """
+    try:
+        async with ansc_batch(flush_on_error=False):
+            await ansc_add_account(org)
+            if org.jetstream_enabled:
+                await ansc_jetstream_update(org)
+        await ansc_add_app(org.name, org_user.app_name, org_user)
+    except Exception:
+        logger.exception("Provisioning organization %s failed, deleting it", org)
+        await sync_to_async(org.delete)()
+        raise
+    await sync_to_async(set_nsc_complete)(org, org_user)
+
+
+async def aget_or_create_org_owner_units_for_authenticated_user(
+    user: User, refresh: bool = False
+) -> Tuple[bool, Tuple[NatsOrganization, NatsOrganizationOwner, NatsOrganizationUser]]:
+    """
+    Async get_or_create_org_owner_units_for_authenticated_user, sharing its per-user memo and first-login row lock
+    """
+    units = None if refresh else getattr(user, "_nats_org_owner_units", None)
+    if units is not None:
+        return (False, units)
+
+    created = False
+    units = await sync_to_async(get_org_owner_units)(user)
+    if units is None:
+        created, units, pending = await sync_to_async(
+            _get_or_create_org_owner_units_locked
+        )(user)
+        if pending:
+            # the rows have committed and user's row is unlocked
+            org, _, org_user = units
+            await ansc_provision_organization(org, org_user)
+    user._nats_org_owner_units = units
+    return (created, units)
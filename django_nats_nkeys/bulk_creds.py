@@ -0,0 +1,189 @@
+import io
+import itertools
+import tarfile
+import time
+import zipfile
+from collections import deque
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+from django.db.models import QuerySet
+from django.http import StreamingHttpResponse
+
+from django_nats_nkeys.creds_cache import NatsCreds
+from django_nats_nkeys.executor import nsc_executor
+from django_nats_nkeys.settings import nats_nkeys_settings
+
+ARCHIVE_FORMATS = ("zip", "tar", "tar.gz")
+CONTENT_TYPES = {
+    "zip": "application/zip",
+    "tar": "application/x-tar",
+    "tar.gz": "application/gzip",
+}
+
+
+class _StreamBuffer(io.RawIOBase):
+    """
+    Write-only, unseekable file object collecting archive bytes until they are yielded
+    """
+
+    def __init__(self) -> None:
+        self._chunks: List[bytes] = []
+        self._offset = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, b) -> int:
+        data = bytes(b)
+        self._chunks.append(data)
+        self._offset += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        # zipfile records local header offsets with tell()
+        return self._offset
+
+    def pop(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def _iter_apps(apps: Iterable, chunk_size: int) -> Iterator:
+    if isinstance(apps, QuerySet):
+        if any(f.name == "organization" for f in apps.model._meta.get_fields()):
+            apps = apps.select_related("organization")
+        else:
+            apps = apps.select_related("account")
+        return apps.iterator(chunk_size=chunk_size)
+    return iter(apps)
+
+
+def _generate(account_name: str, app_name: str) -> NatsCreds:
+    from django_nats_nkeys.services import nsc_generate_creds
+
+    return NatsCreds(nsc_generate_creds(account_name, app_name))
+
+
+def iter_app_creds(
+    apps: Iterable, window: Optional[int] = None, chunk_size: int = 2000
+) -> Iterator[Tuple[str, str, NatsCreds]]:
+    """
+    Yields (account name, app name, creds) for each app, in order
+
+    Creds are generated in parallel on nsc_executor, with at most `window` in flight, so memory stays flat for any number of apps.
+    apps may be a queryset of NatsOrganizationApp / NatsRobotApp, which is iterated in chunks, or any iterable of apps.
+    """
+    from django_nats_nkeys.services import nsc_account_name
+
+    if window is None:
+        window = nats_nkeys_settings.NATS_NSC_MAX_WORKERS * 4
+    pending = deque()
+    for app in _iter_apps(apps, chunk_size):
+        account_name = nsc_account_name(app)
+        future = nsc_executor.submit(_generate, account_name, app.app_name)
+        pending.append((account_name, app.app_name, future))
+        if len(pending) >= window:
+            account_name, app_name, future = pending.popleft()
+            yield account_name, app_name, future.result()
+    while pending:
+        account_name, app_name, future = pending.popleft()
+        yield account_name, app_name, future.result()
+
+
+def _entries(apps: Iterable, **kwargs) -> Iterator[Tuple[str, bytes]]:
+    for account_name, app_name, creds in iter_app_creds(apps, **kwargs):
+        yield f"{account_name}/{app_name}.creds", creds.creds.encode()
+        yield f"{account_name}/{app_name}.jwt", creds.jwt.encode()
+
+
+def _stream_zip(entries: Iterator[Tuple[str, bytes]]) -> Iterator[bytes]:
+    buffer = _StreamBuffer()
+    date_time = time.localtime()[:6]
+    with zipfile.ZipFile(buffer, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+        for name, data in entries:
+            info = zipfile.ZipInfo(name, date_time=date_time)
+            info.compress_type = zipfile.ZIP_DEFLATED
+            # creds are secrets, extract as 0600
+            info.external_attr = 0o600 << 16
+            zf.writestr(info, data)
+            yield buffer.pop()
+    yield buffer.pop()
+
+
+def _stream_tar(entries: Iterator[Tuple[str, bytes]], gzip=False) -> Iterator[bytes]:
+    buffer = _StreamBuffer()
+    mtime = time.time()
+    with tarfile.open(fileobj=buffer, mode="w|gz" if gzip else "w|") as tf:
+        for name, data in entries:
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            info.mode = 0o600
+            info.mtime = mtime
+            tf.addfile(info, io.BytesIO(data))
+            yield buffer.pop()
+    yield buffer.pop()
+
+
+def stream_creds_archive(
+    apps: Iterable, archive_format: str = "zip", **kwargs
+) -> Iterator[bytes]:
+    """
+    Yields a zip or tar archive of <account>/<app>.creds and <account>/<app>.jwt for every app, one chunk per entry
+    Entries are written as their creds are generated, so the archive is never held in memory
+    """
+    if archive_format not in ARCHIVE_FORMATS:
+        raise ValueError(
+            f"archive_format must be one of {ARCHIVE_FORMATS}, received {archive_format}"
+        )
+    entries = _entries(apps, **kwargs)
+    if archive_format == "zip":
+        chunks = _stream_zip(entries)
+    else:
+        chunks = _stream_tar(entries, gzip=archive_format == "tar.gz")
+    # skip empty chunks (buffered by the compressor)
+    return (chunk for chunk in chunks if chunk)
+
+
+def creds_archive_response(
+    apps: Iterable,
+    filename: str = "nats-creds.zip",
+    archive_format: Optional[str] = None,
+    **kwargs,
+) -> StreamingHttpResponse:
+    """
+    StreamingHttpResponse downloading stream_creds_archive() as filename
+    archive_format is inferred from filename if not provided
+    """
+    if archive_format is None:
+        archive_format = archive_format_for(filename)
+    response = StreamingHttpResponse(
+        stream_creds_archive(apps, archive_format=archive_format, **kwargs),
+        content_type=CONTENT_TYPES[archive_format],
+    )
+    response["Content-Disposition"] = f'attachment; filename="{filename}"'
+    return response
+
+
+def archive_format_for(filename: str) -> str:
+    if filename.endswith((".tar.gz", ".tgz")):
+        return "tar.gz"
+    if filename.endswith(".tar"):
+        return "tar"
+    return "zip"
+
+
+def apps_for_account(account_name: str) -> Iterator:
+    """
+    Every app (NATS user) of the organization or robot account named account_name
+    """
+    app_models = nats_nkeys_settings.get_nats_app_models()
+    querysets = []
+    for model in app_models:
+        if any(f.name == "organization" for f in model._meta.get_fields()):
+            querysets.append(model.objects.filter(organization__name=account_name))
+        else:
+            querysets.append(model.objects.filter(account__name=account_name))
+    return itertools.chain.from_iterable(
+        _iter_apps(qs.order_by("pk"), 2000) for qs in querysets
+    )
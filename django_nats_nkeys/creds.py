@@ -0,0 +1,23 @@
+from django_nats_nkeys import store
+from django_nats_nkeys.jwt import decode_jwt, format_user_creds
+
+
+class NscCredsEngine:
+    """
+    In-process replacement for `nsc generate creds`
+
+    Reads user JWTs from NATS_NSC_DATA_DIR and seeds from NATS_NSC_KEYSTORE_DIR
+    """
+
+    def generate_creds(self, account_name: str, app_name: str) -> str:
+        """
+        Equivalent to `nsc generate creds --account <account_name> --name <app_name>`
+        Raises FileNotFoundError if user JWT or seed is not in the nsc store
+        """
+        jwt = store.read_user_jwt(account_name, app_name)
+        _, claims, _ = decode_jwt(jwt)
+        seed = store.read_seed(claims["sub"])
+        return format_user_creds(jwt, seed)
+
+
+creds_engine = NscCredsEngine()
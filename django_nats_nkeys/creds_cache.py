@@ -0,0 +1,141 @@
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+from django.utils.functional import cached_property
+
+from django_nats_nkeys.jwt import decode_jwt
+from django_nats_nkeys.settings import nats_nkeys_settings
+
+CredsKey = Tuple[str, str]
+
+
+class NatsCreds:
+    """
+    Parsed `nsc generate creds` output
+    jwt, seed and expires are split out of the creds text on first access
+    """
+
+    def __init__(self, creds: str) -> None:
+        self.creds = creds
+
+    def __str__(self) -> str:
+        return self.creds
+
+    def _section(self, begin: str) -> Optional[str]:
+        lines = self.creds.split("\n")
+        for i, line in enumerate(lines[:-1]):
+            if line.startswith("-----BEGIN ") and begin in line:
+                return lines[i + 1].strip()
+        return None
+
+    @cached_property
+    def jwt(self) -> str:
+        return self._section("JWT") or self.creds
+
+    @cached_property
+    def seed(self) -> Optional[str]:
+        return self._section("SEED")
+
+    @cached_property
+    def claims(self) -> Dict[str, Any]:
+        _, claims, _ = decode_jwt(self.jwt)
+        return claims
+
+    @cached_property
+    def expires(self) -> Optional[int]:
+        """
+        JWT exp claim (unix timestamp), None if the JWT never expires
+        """
+        try:
+            return self.claims.get("exp")
+        except ValueError:
+            return None
+
+
+class NatsCredsCache:
+    """
+    Per-app cache of generated credentials
+
+    Creds and JWTs are cached separately: get_jwt() reads only the user JWT, so bearer token downloads never load the seed.
+    Entries are dropped by invalidate(), called from the app post_save/post_delete signals and by services that edit users, and otherwise expire after NATS_NSC_CREDS_CACHE_TTL seconds (bounding staleness if another process edits the nsc store) or at the JWT's exp claim, whichever is first.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._creds: Dict[CredsKey, Tuple[float, NatsCreds]] = {}
+        self._jwts: Dict[CredsKey, Tuple[float, str]] = {}
+
+    def clear(self) -> None:
+        with self._lock:
+            self._creds.clear()
+            self._jwts.clear()
+
+    def invalidate(self, account_name: str, app_name: Optional[str] = None) -> None:
+        """
+        Drops cached credentials for one app, or for every app of account_name
+        """
+        with self._lock:
+            for entries in (self._creds, self._jwts):
+                for key in list(entries):
+                    if key[0] == account_name and app_name in (None, key[1]):
+                        del entries[key]
+
+    def _deadline(self, jwt: str) -> Optional[float]:
+        ttl = nats_nkeys_settings.NATS_NSC_CREDS_CACHE_TTL
+        if ttl <= 0:
+            return None
+        deadline = time.time() + ttl
+        try:
+            _, claims, _ = decode_jwt(jwt)
+        except ValueError:
+            return deadline
+        if claims.get("exp"):
+            deadline = min(deadline, claims["exp"])
+        return deadline
+
+    def _get(self, entries: Dict[CredsKey, Tuple[float, Any]], key: CredsKey) -> Any:
+        with self._lock:
+            entry = entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= time.time():
+                del entries[key]
+                return None
+            return entry[1]
+
+    def _set(
+        self,
+        entries: Dict[CredsKey, Tuple[float, Any]],
+        key: CredsKey,
+        jwt: str,
+        value: Any,
+    ) -> None:
+        deadline = self._deadline(jwt)
+        if deadline is None:
+            return
+        with self._lock:
+            entries[key] = (deadline, value)
+
+    def get_creds(self, account_name: str, app_name: str) -> NatsCreds:
+        from django_nats_nkeys.services import nsc_generate_creds
+
+        key = (account_name, app_name)
+        creds = self._get(self._creds, key)
+        if creds is None:
+            creds = NatsCreds(nsc_generate_creds(account_name, app_name))
+            self._set(self._creds, key, creds.jwt, creds)
+        return creds
+
+    def get_jwt(self, account_name: str, app_name: str) -> str:
+        from django_nats_nkeys.services import nsc_generate_jwt
+
+        key = (account_name, app_name)
+        jwt = self._get(self._jwts, key)
+        if jwt is None:
+            jwt = nsc_generate_jwt(account_name, app_name)
+            self._set(self._jwts, key, jwt, jwt)
+        return jwt
+
+
+creds_cache = NatsCredsCache()
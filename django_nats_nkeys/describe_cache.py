@@ -0,0 +1,138 @@
+import copy
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from django_nats_nkeys import store
+from django_nats_nkeys.settings import nats_nkeys_settings
+
+# (st_mtime_ns, st_size) of the JWT file a describe was read from
+Validator = Tuple[int, int]
+DescribeKey = Tuple[str, Optional[str]]
+
+
+class DescribeCache:
+    """
+    LRU cache of describe JSON keyed by (account, user)
+
+    Entries are validated against the mtime and size of the account/user JWT in the nsc store, so any nsc edit (which rewrites the JWT) invalidates them without explicit bookkeeping.
+    Holds at most NATS_NSC_DESCRIBE_CACHE_SIZE entries in-process. If NATS_NSC_DESCRIBE_CACHE names a Django cache alias, entries are also shared through that cache, so processes reading the same nsc store share hits.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[DescribeKey, Tuple[Validator, Dict[Any, Any]]]" = (
+            OrderedDict()
+        )
+        self.hits = 0
+        self.misses = 0
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def validator(
+        self, account_name: str, user_name: Optional[str] = None
+    ) -> Optional[Validator]:
+        if user_name is None:
+            path = store.account_jwt_path(account_name)
+        else:
+            path = store.user_jwt_path(account_name, user_name)
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        return (st.st_mtime_ns, st.st_size)
+
+    def _shared_cache(self):
+        alias = nats_nkeys_settings.NATS_NSC_DESCRIBE_CACHE
+        if alias is None:
+            return None
+        from django.core.cache import caches
+
+        return caches[alias]
+
+    def _shared_key(self, key: DescribeKey) -> str:
+        account_name, user_name = key
+        return ":".join(
+            [
+                "django_nats_nkeys",
+                "describe",
+                nats_nkeys_settings.NATS_NKEYS_OPERATOR_NAME,
+                account_name,
+                user_name or "",
+            ]
+        )
+
+    def get(
+        self, account_name: str, user_name: Optional[str], validator: Validator
+    ) -> Optional[Dict[Any, Any]]:
+        key = (account_name, user_name)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == validator:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return copy.deepcopy(entry[1])
+        shared = self._shared_cache()
+        if shared is not None:
+            entry = shared.get(self._shared_key(key))
+            if entry is not None and tuple(entry[0]) == validator:
+                self._set_local(key, validator, entry[1])
+                with self._lock:
+                    self.hits += 1
+                return copy.deepcopy(entry[1])
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def _set_local(
+        self, key: DescribeKey, validator: Validator, data: Dict[Any, Any]
+    ) -> None:
+        maxsize = nats_nkeys_settings.NATS_NSC_DESCRIBE_CACHE_SIZE
+        if maxsize <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (validator, copy.deepcopy(data))
+            self._entries.move_to_end(key)
+            while len(self._entries) > maxsize:
+                self._entries.popitem(last=False)
+
+    def set(
+        self,
+        account_name: str,
+        user_name: Optional[str],
+        validator: Validator,
+        data: Dict[Any, Any],
+    ) -> None:
+        key = (account_name, user_name)
+        self._set_local(key, validator, data)
+        shared = self._shared_cache()
+        if shared is not None:
+            shared.set(self._shared_key(key), (validator, data))
+
+    def get_or_load(
+        self,
+        account_name: str,
+        user_name: Optional[str],
+        load: Callable[[], Dict[Any, Any]],
+    ) -> Dict[Any, Any]:
+        """
+        Returns cached describe JSON, calling load() on a miss
+        The validator is read before load(), so a JWT rewritten during load() is re-read on the next call
+        """
+        validator = self.validator(account_name, user_name)
+        if validator is None:
+            # not in the nsc store (yet), let load() raise or fall back
+            return load()
+        data = self.get(account_name, user_name, validator)
+        if data is None:
+            data = load()
+            self.set(account_name, user_name, validator, data)
+        return data
+
+
+describe_cache = DescribeCache()
@@ -1,4 +1,5 @@
 import subprocess
+from typing import List, Optional
 
 
 class NscError(Exception):
@@ -37,3 +38,46 @@ class NscStreamExportConflict(NscError):
             self.error.returncode,
             self.account,
         )
+
+
+class NatsResolverError(Exception):
+    """
+    The account resolver rejected (or did not acknowledge) a claims update
+    """
+
+    def __init__(self, account: str, code: int, description: str):
+        super().__init__(description)
+        self.account = account
+        self.code = code
+        self.description = description
+
+    def __str__(self):
+        return "Resolver rejected account %s JWT with code %s: %s" % (
+            self.account,
+            self.code,
+            self.description,
+        )
+
+
+class NatsSubjectOverlap(ValueError):
+    """
+    An export's subject pattern overlaps another export of the same account, which nsc rejects
+    """
+
+    def __init__(
+        self,
+        subject_pattern: str,
+        overlapping: List[str],
+        account_name: Optional[str] = None,
+    ):
+        super().__init__(subject_pattern)
+        self.subject_pattern = subject_pattern
+        self.overlapping = overlapping
+        self.account_name = account_name
+
+    def __str__(self):
+        return "Export subject %s of account %s overlaps exported subjects: %s" % (
+            self.subject_pattern,
+            self.account_name,
+            ", ".join(self.overlapping),
+        )
@@ -0,0 +1,220 @@
+import fcntl
+import os
+import re
+import subprocess
+import threading
+import zlib
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, List, Optional, Tuple
+
+from django.db import connections
+
+from django_nats_nkeys.settings import nats_nkeys_settings
+
+
+def nsc_cmd_account(cmd: List[str]) -> Optional[str]:
+    """
+    Returns the account an nsc command reads or modifies, or None for operator-level commands
+
+    nsc edit user --account <account> ... -> <account>
+    nsc add account --name <account> -> <account>
+    nsc delete account <account> -> <account>
+    nsc push --all -> None
+    """
+    args = cmd[cmd.index("nsc") + 1 :]
+    if "--account" in args:
+        return args[args.index("--account") + 1]
+    if len(args) >= 2 and args[1] == "account":
+        if "--name" in args:
+            return args[args.index("--name") + 1]
+        if len(args) > 2 and not args[2].startswith("-"):
+            return args[2]
+    return None
+
+
+def nsc_cmd_user(cmd: List[str]) -> Optional[str]:
+    """
+    Returns the user an nsc command adds or edits, or None for account/operator-level commands
+
+    nsc add user --account <account> --name <user> -> <user>
+    nsc edit user --account <account> --name <user> ... -> <user>
+    """
+    args = cmd[cmd.index("nsc") + 1 :]
+    if (
+        len(args) >= 2
+        and args[0] in ("add", "edit")
+        and args[1] == "user"
+        and "--account" in args
+        and "--name" in args
+    ):
+        return args[args.index("--name") + 1]
+    return None
+
+
+def nsc_cmd_readonly(cmd: List[str]) -> bool:
+    """
+    True for nsc commands that only read the store, which hold their account lock shared
+
+    nsc describe account --name <account> -> True
+    nsc generate activation --account <account> ... -> True
+    nsc edit account --name <account> ... -> False
+    """
+    args = cmd[cmd.index("nsc") + 1 :]
+    if not args:
+        return False
+    if args[0] == "describe":
+        return True
+    return (
+        len(args) >= 2 and args[0] == "generate" and args[1] in ("activation", "creds")
+    )
+
+
+class NscStoreLock:
+    """
+    Cross-process lock on the nsc store, backed by flock(2) files in NATS_NSC_LOCK_DIR
+
+    Account-scoped locks hold the operator lock shared and the account lock exclusive, so edits to different accounts run in parallel.
+    Operator-scoped locks (account=None) hold the operator lock exclusive, serializing them against every other nsc operation.
+    User-scoped locks hold the operator and account locks shared and one of USER_LOCK_STRIPES user locks of the account exclusive, so different users of one account are added/edited in parallel, but never concurrently with an edit of the account itself.
+    Shared account-scoped locks (shared=True) hold the account lock shared, for commands that only read the account (see nsc_cmd_readonly()).
+    """
+
+    USER_LOCK_STRIPES = 64
+
+    def __init__(
+        self,
+        account: Optional[str] = None,
+        user: Optional[str] = None,
+        shared: bool = False,
+    ) -> None:
+        self.account = account
+        self.user = user if account is not None else None
+        self.shared = shared
+        self._fds: List[int] = []
+
+    def _lock_file(self, name: str, operation: int) -> None:
+        lock_dir = nats_nkeys_settings.NATS_NSC_LOCK_DIR
+        os.makedirs(lock_dir, exist_ok=True)
+        fd = os.open(os.path.join(lock_dir, name), os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(fd, operation)
+        except BaseException:
+            os.close(fd)
+            raise
+        self._fds.append(fd)
+
+    def acquire(self) -> None:
+        try:
+            if self.account is None:
+                self._lock_file("operator.lock", fcntl.LOCK_EX)
+            else:
+                self._lock_file("operator.lock", fcntl.LOCK_SH)
+                safe_name = re.sub(r"[^A-Za-z0-9_.-]", "_", self.account)
+                if self.user is None:
+                    self._lock_file(
+                        f"account-{safe_name}.lock",
+                        fcntl.LOCK_SH if self.shared else fcntl.LOCK_EX,
+                    )
+                else:
+                    self._lock_file(f"account-{safe_name}.lock", fcntl.LOCK_SH)
+                    # zlib.crc32 is stable across processes, unlike hash()
+                    stripe = zlib.crc32(self.user.encode()) % self.USER_LOCK_STRIPES
+                    self._lock_file(
+                        f"account-{safe_name}.user-{stripe}.lock", fcntl.LOCK_EX
+                    )
+        except BaseException:
+            self.release()
+            raise
+
+    def release(self) -> None:
+        # closing the file descriptor releases the flock
+        while self._fds:
+            os.close(self._fds.pop())
+
+    def __enter__(self) -> "NscStoreLock":
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.release()
+
+
+class NscExecutor:
+    """
+    Bounded pool of workers running nsc subprocesses under NscStoreLock
+
+    run() blocks the caller until its command finishes. submit() schedules arbitrary work (e.g. provisioning one account) on the pool; nsc commands run from inside a pool worker execute inline, so nested work can't deadlock the pool.
+    """
+
+    def __init__(self) -> None:
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._pool_lock = threading.Lock()
+        self._local = threading.local()
+
+    @property
+    def pool(self) -> ThreadPoolExecutor:
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(
+                    max_workers=nats_nkeys_settings.NATS_NSC_MAX_WORKERS,
+                    thread_name_prefix="nsc",
+                )
+            return self._pool
+
+    def in_worker(self) -> bool:
+        return getattr(self._local, "worker", False)
+
+    def _call(self, fn: Callable, *args, **kwargs) -> Any:
+        self._local.worker = True
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            # pool threads outlive the task, don't leave its DB connections open on an idle worker
+            connections.close_all()
+
+    def submit(self, fn: Callable, *args, **kwargs) -> Future:
+        if self.in_worker():
+            # already on a worker, run inline instead of waiting on a saturated pool
+            future: Future = Future()
+            try:
+                future.set_result(fn(*args, **kwargs))
+            except BaseException as e:
+                future.set_exception(e)
+            return future
+        return self.pool.submit(self._call, fn, *args, **kwargs)
+
+    def run(
+        self,
+        cmd: List[str],
+        account: Optional[str] = None,
+        user: Optional[str] = None,
+        shared: bool = False,
+        pass_fds: Tuple[int, ...] = (),
+    ) -> subprocess.CompletedProcess:
+        return self.submit(
+            self._run_locked, cmd, account, user, shared, pass_fds
+        ).result()
+
+    def _run_locked(
+        self,
+        cmd: List[str],
+        account: Optional[str] = None,
+        user: Optional[str] = None,
+        shared: bool = False,
+        pass_fds: Tuple[int, ...] = (),
+    ) -> subprocess.CompletedProcess:
+        with NscStoreLock(account, user=user, shared=shared):
+            if pass_fds:
+                return subprocess.run(
+                    cmd, capture_output=True, encoding="utf8", pass_fds=pass_fds
+                )
+            return subprocess.run(cmd, capture_output=True, encoding="utf8")
+
+    def shutdown(self, wait=True) -> None:
+        with self._pool_lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=wait)
+                self._pool = None
+
+
+nsc_executor = NscExecutor()
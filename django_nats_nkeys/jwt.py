@@ -0,0 +1,63 @@
+import base64
+import binascii
+import json
+from typing import TYPE_CHECKING, Any, Dict, Tuple
+
+if TYPE_CHECKING:
+    import nkeys
+
+CREDS_TEMPLATE = """-----BEGIN NATS USER JWT-----
+{jwt}
+------END NATS USER JWT------
+
+************************* IMPORTANT *************************
+NKEY Seed printed below can be used to sign and prove identity.
+NKEYs are sensitive and should be treated as secrets.
+
+-----BEGIN USER NKEY SEED-----
+{seed}
+------END USER NKEY SEED------
+
+*************************************************************
+"""
+
+
+def keypair_from_seed(seed: str) -> "nkeys.KeyPair":
+    import nkeys
+
+    return nkeys.from_seed(bytearray(seed.strip().encode("ascii")))
+
+
+def _b64decode(data: str) -> bytes:
+    # nats jwts are unpadded, but tolerate std encoding written by older tools
+    padded = data + "=" * (-len(data) % 4)
+    try:
+        return base64.urlsafe_b64decode(padded)
+    except (binascii.Error, ValueError):
+        return base64.b64decode(padded)
+
+
+def decode_jwt(token: str) -> Tuple[Dict[str, Any], Dict[str, Any], bytes]:
+    """
+    Returns (header, claims, signature) without verifying the signature
+    """
+    try:
+        header, payload, signature = token.strip().split(".")
+    except ValueError:
+        raise ValueError("Malformed JWT: expected 3 segments")
+    return (
+        json.loads(_b64decode(header)),
+        json.loads(_b64decode(payload)),
+        _b64decode(signature),
+    )
+
+
+def format_user_creds(jwt: str, seed: str) -> str:
+    """
+    Decorates a user JWT and seed exactly like `nsc generate creds`
+    ref: https://github.com/nats-io/jwt/blob/main/v2/creds_utils.go
+    """
+    seed = seed.strip()
+    if not seed.startswith("SU"):
+        raise ValueError("Seed is not a user seed")
+    return CREDS_TEMPLATE.format(jwt=jwt.strip(), seed=seed)
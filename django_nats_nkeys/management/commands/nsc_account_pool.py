@@ -0,0 +1,42 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandParser
+
+from django_nats_nkeys.pool import nsc_pool_top_up
+from django_nats_nkeys.settings import nats_nkeys_settings
+
+
+class Command(BaseCommand):
+    help = "Keep NATS_NSC_ACCOUNT_POOL_SIZE pre-provisioned, pushed accounts ready to be claimed at signup"
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument(
+            "--size",
+            type=int,
+            help="Unclaimed accounts to keep (default: NATS_NSC_ACCOUNT_POOL_SIZE)",
+            required=False,
+        )
+        parser.add_argument(
+            "--once",
+            help="Top up the pool once and exit, instead of polling",
+            default=False,
+            action="store_true",
+        )
+        parser.add_argument(
+            "--sleep",
+            type=float,
+            help="Seconds to wait between polls",
+            default=5.0,
+        )
+
+    def handle(self, *args, **kwargs):
+        size = kwargs.get("size")
+        if size is None:
+            size = nats_nkeys_settings.NATS_NSC_ACCOUNT_POOL_SIZE
+        while True:
+            added = nsc_pool_top_up(size)
+            if added:
+                self.stdout.write(f"Added {added} pooled accounts")
+            if kwargs.get("once"):
+                return
+            time.sleep(kwargs.get("sleep"))
@@ -0,0 +1,61 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandParser
+
+from django_nats_nkeys.onboard import BulkOnboarder, read_records
+
+
+class Command(BaseCommand):
+    help = "Create a NatsOrganization, owner and organization user for every user in a CSV or JSONL file. Records are keyed by the user model's USERNAME_FIELD; optional org_name/org_slug columns name the organization, other columns matching user model fields are used to create missing users."
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument("file", type=str, help="Path to .csv or .jsonl file")
+        parser.add_argument(
+            "--org-defaults",
+            type=json.loads,
+            help="JSON object of NatsOrganization field defaults, e.g. '{\"jetstream_enabled\": true}'",
+            default=None,
+        )
+        parser.add_argument(
+            "--org-user-defaults",
+            type=json.loads,
+            help="JSON object of organization user field defaults (default: is_admin=true)",
+            default=None,
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            help="Records inserted and provisioned per batch",
+            default=500,
+        )
+        parser.add_argument(
+            "--checkpoint",
+            type=str,
+            help="Checkpoint file. If it exists, records processed by a previous run are skipped. Delete it to retry failed records.",
+            required=False,
+        )
+
+    def handle(self, *args, **kwargs):
+        onboarder = BulkOnboarder(
+            org_defaults=kwargs.get("org_defaults"),
+            org_user_defaults=kwargs.get("org_user_defaults"),
+            batch_size=kwargs.get("batch_size"),
+            checkpoint=kwargs.get("checkpoint"),
+            progress=self.stdout.write,
+        )
+        checkpoint = onboarder.run(read_records(kwargs.get("file")))
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Success! Provisioned {checkpoint.created} organizations, {checkpoint.failed} failed"
+            )
+        )
+        if checkpoint.failed_keys:
+            self.stdout.write(
+                self.style.WARNING(f"Failed: {', '.join(checkpoint.failed_keys)}")
+            )
+        if checkpoint.push_error:
+            self.stdout.write(
+                self.style.ERROR(
+                    f"nsc push failed, re-run to push again: {checkpoint.push_error}"
+                )
+            )
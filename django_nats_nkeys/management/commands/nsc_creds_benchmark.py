@@ -0,0 +1,57 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandParser
+
+from django_nats_nkeys.creds import creds_engine
+from django_nats_nkeys.services import nsc_generate_creds_subprocess
+
+
+class Command(BaseCommand):
+    help = "Compare creds/sec of in-process creds engine against `nsc generate creds`"
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument("--account", type=str, required=True, help="Account name")
+        parser.add_argument(
+            "--name", type=str, required=True, help="User/app name within account"
+        )
+        parser.add_argument(
+            "--iterations",
+            type=int,
+            default=50,
+            help="Number of creds to generate per engine",
+        )
+
+    def _bench(self, label, fn, iterations):
+        start = time.perf_counter()
+        for _ in range(iterations):
+            fn()
+        elapsed = time.perf_counter() - start
+        rate = iterations / elapsed
+        self.stdout.write(
+            f"{label}: {iterations} creds in {elapsed:.3f}s ({rate:.1f} creds/sec)"
+        )
+        return rate
+
+    def handle(self, *args, **kwargs):
+        account = kwargs.get("account")
+        name = kwargs.get("name")
+        iterations = kwargs.get("iterations")
+
+        native = creds_engine.generate_creds(account, name)
+        subprocess_creds = nsc_generate_creds_subprocess(account, name)
+        if native != subprocess_creds:
+            self.stderr.write(
+                self.style.WARNING("Native creds differ from `nsc generate creds`")
+            )
+
+        subprocess_rate = self._bench(
+            "nsc generate creds",
+            lambda: nsc_generate_creds_subprocess(account, name),
+            iterations,
+        )
+        native_rate = self._bench(
+            "native", lambda: creds_engine.generate_creds(account, name), iterations
+        )
+        self.stdout.write(
+            self.style.SUCCESS(f"Speedup: {native_rate / subprocess_rate:.1f}x")
+        )
@@ -0,0 +1,57 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandParser
+
+from django_nats_nkeys.bulk_creds import (
+    ARCHIVE_FORMATS,
+    apps_for_account,
+    archive_format_for,
+    stream_creds_archive,
+)
+
+
+class Command(BaseCommand):
+    help = "Export <account>/<app>.creds and <account>/<app>.jwt for every app of an organization or robot account as a zip or tar archive"
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument(
+            "--account",
+            type=str,
+            help="Name of NatsOrganization or NatsRobotAccount",
+            required=True,
+        )
+        parser.add_argument(
+            "--output",
+            type=str,
+            help="Archive path, or - to write to stdout",
+            required=True,
+        )
+        parser.add_argument(
+            "--format",
+            choices=ARCHIVE_FORMATS,
+            help="Archive format (default: inferred from --output, zip for stdout)",
+            required=False,
+        )
+
+    def handle(self, *args, **kwargs):
+        output = kwargs.get("output")
+        archive_format = kwargs.get("format") or archive_format_for(output)
+        chunks = stream_creds_archive(
+            apps_for_account(kwargs.get("account")), archive_format=archive_format
+        )
+        if output == "-":
+            for chunk in chunks:
+                sys.stdout.buffer.write(chunk)
+            sys.stdout.buffer.flush()
+            return
+
+        size = 0
+        with open(output, "wb") as f:
+            for chunk in chunks:
+                size += len(chunk)
+                f.write(chunk)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Success! Wrote {size} bytes of credentials to {output}"
+            )
+        )
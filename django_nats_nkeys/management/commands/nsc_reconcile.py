@@ -0,0 +1,52 @@
+from django.core.management.base import BaseCommand, CommandError, CommandParser
+
+from django_nats_nkeys.reconcile import nsc_reconcile
+
+
+class Command(BaseCommand):
+    help = "Apply changes of organizations, robot accounts, apps and message exports missing from the nsc store, and push each modified account once"
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument(
+            "--full",
+            action="store_true",
+            help="Diff every row, instead of rows changed since they were last reconciled",
+        )
+        parser.add_argument(
+            "--prune",
+            action="store_true",
+            help="Delete accounts, users, exports and imports that exist only in the nsc store",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Print the plan without applying it",
+        )
+
+    def handle(self, *args, **kwargs):
+        result = nsc_reconcile(
+            full=kwargs.get("full"),
+            prune=kwargs.get("prune"),
+            dry_run=kwargs.get("dry_run"),
+        )
+        plan = result.plan
+        if kwargs.get("dry_run"):
+            if plan.actions:
+                self.stdout.write(str(plan))
+            self.stdout.write(
+                f"{len(plan.actions)} actions planned for {len(plan.rows)} changed rows"
+            )
+            return
+
+        for action in result.applied:
+            self.stdout.write(str(action))
+        for action, e in result.failed:
+            self.stderr.write(f"FAILED {action}: {e}")
+        for account_name, e in result.push_failed:
+            self.stderr.write(f"FAILED push {account_name}: {e}")
+        self.stdout.write(
+            f"{len(result.applied)} actions applied, {len(result.failed)} failed, "
+            f"{len(result.pushed)} accounts pushed, {result.reconciled} rows reconciled, {result.duration:.2f}s"
+        )
+        if not result.ok():
+            raise CommandError("nsc reconcile failed, failed rows are retried next run")
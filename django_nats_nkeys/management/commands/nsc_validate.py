@@ -1,17 +1,42 @@
-from click import BaseCommand
-from django.core.management.base import BaseCommand, CommandParser
+from django.core.management.base import BaseCommand, CommandError, CommandParser
 
-from django_nats_nkeys.services import nsc_validate
+from django_nats_nkeys.validate import nsc_validate_accounts
 
 
 class Command(BaseCommand):
+    help = "Run nsc validate for every account (or --account) in parallel and print a report"
+
     def add_arguments(self, parser: CommandParser) -> None:
         parser.add_argument(
             "--account",
-            help="Push a specific account. If not provided, push --all will be executed",
+            help="Validate a specific account (may be repeated). If not provided, every account is validated",
+            action="append",
+            required=False,
+        )
+        parser.add_argument(
+            "--format",
+            choices=("table", "json"),
+            help="Report format",
+            default="table",
+        )
+        parser.add_argument(
+            "--changed-since",
+            type=str,
+            help="State file of a previous run. Only accounts changed since they last validated ok are validated, and the file is updated",
             required=False,
         )
 
     def handle(self, *args, **kwargs):
-        account_name = kwargs.get("account_name")
-        nsc_validate(account_name=account_name)
+        report = nsc_validate_accounts(
+            account_names=kwargs.get("account"),
+            state_file=kwargs.get("changed_since"),
+        )
+        if kwargs.get("format") == "json":
+            self.stdout.write(report.to_json(indent=2))
+        else:
+            self.stdout.write(report.to_table())
+        if not report.ok():
+            raise CommandError(
+                "nsc validate failed for: %s"
+                % ", ".join(r.account_name for r in report.failed())
+            )
@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand, CommandParser
+
+from django_nats_nkeys.outbox import NscOutboxWorker
+
+
+class Command(BaseCommand):
+    help = "Apply nsc operations queued in NatsNscOperation (NATS_NSC_PROVISIONING_MODE=OUTBOX)"
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument(
+            "--once",
+            help="Exit when no runnable operations are left, instead of polling",
+            default=False,
+            action="store_true",
+        )
+        parser.add_argument(
+            "--sleep",
+            type=float,
+            help="Seconds to wait between polls when the outbox is empty",
+            default=1.0,
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            help="Max operations claimed per poll (default: NATS_NSC_MAX_WORKERS)",
+            required=False,
+        )
+        parser.add_argument(
+            "--stale-after",
+            type=int,
+            help="Seconds after which a running operation is considered abandoned and re-queued",
+            default=600,
+        )
+
+    def handle(self, *args, **kwargs):
+        worker = NscOutboxWorker(
+            batch_size=kwargs.get("batch_size"),
+            stale_after=kwargs.get("stale_after"),
+        )
+        worker.run(sleep=kwargs.get("sleep"), once=kwargs.get("once"))
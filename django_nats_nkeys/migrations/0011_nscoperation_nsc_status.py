@@ -0,0 +1,168 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:09
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("django_nats_nkeys", "0010_alter_natsaccountinvitation_invited_by_and_more"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="natsorganization",
+            name="nsc_status",
+            field=models.CharField(
+                choices=[
+                    ("pending", "nsc provisioning pending"),
+                    ("running", "nsc provisioning running"),
+                    ("complete", "nsc provisioning complete"),
+                    ("failed", "nsc provisioning failed"),
+                ],
+                default="complete",
+                help_text="Provisioning status of nsc operations queued in NatsNscOperation",
+                max_length=16,
+            ),
+        ),
+        migrations.AddField(
+            model_name="natsorganizationapp",
+            name="nsc_status",
+            field=models.CharField(
+                choices=[
+                    ("pending", "nsc provisioning pending"),
+                    ("running", "nsc provisioning running"),
+                    ("complete", "nsc provisioning complete"),
+                    ("failed", "nsc provisioning failed"),
+                ],
+                default="complete",
+                help_text="Provisioning status of nsc operations queued in NatsNscOperation",
+                max_length=16,
+            ),
+        ),
+        migrations.AddField(
+            model_name="natsorganizationuser",
+            name="nsc_status",
+            field=models.CharField(
+                choices=[
+                    ("pending", "nsc provisioning pending"),
+                    ("running", "nsc provisioning running"),
+                    ("complete", "nsc provisioning complete"),
+                    ("failed", "nsc provisioning failed"),
+                ],
+                default="complete",
+                help_text="Provisioning status of nsc operations queued in NatsNscOperation",
+                max_length=16,
+            ),
+        ),
+        migrations.AddField(
+            model_name="natsrobotaccount",
+            name="nsc_status",
+            field=models.CharField(
+                choices=[
+                    ("pending", "nsc provisioning pending"),
+                    ("running", "nsc provisioning running"),
+                    ("complete", "nsc provisioning complete"),
+                    ("failed", "nsc provisioning failed"),
+                ],
+                default="complete",
+                help_text="Provisioning status of nsc operations queued in NatsNscOperation",
+                max_length=16,
+            ),
+        ),
+        migrations.AddField(
+            model_name="natsrobotapp",
+            name="nsc_status",
+            field=models.CharField(
+                choices=[
+                    ("pending", "nsc provisioning pending"),
+                    ("running", "nsc provisioning running"),
+                    ("complete", "nsc provisioning complete"),
+                    ("failed", "nsc provisioning failed"),
+                ],
+                default="complete",
+                help_text="Provisioning status of nsc operations queued in NatsNscOperation",
+                max_length=16,
+            ),
+        ),
+        migrations.CreateModel(
+            name="NatsNscOperation",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "operation",
+                    models.CharField(
+                        choices=[
+                            (
+                                "add_account",
+                                "nsc add account (and enable JetStream, if needed)",
+                            ),
+                            ("jetstream_update", "nsc edit account --js-*"),
+                            ("add_app", "nsc add user"),
+                            ("bearer_auth_enable", "nsc edit user --bearer"),
+                            ("add_export", "nsc add export (and imports)"),
+                        ],
+                        max_length=32,
+                    ),
+                ),
+                (
+                    "model",
+                    models.CharField(
+                        help_text="app_label.ModelName of the provisioned object",
+                        max_length=255,
+                    ),
+                ),
+                ("object_id", models.CharField(max_length=255)),
+                (
+                    "account_name",
+                    models.CharField(
+                        help_text="NATS account modified by this operation",
+                        max_length=255,
+                    ),
+                ),
+                ("payload", models.JSONField(default=dict)),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("pending", "nsc provisioning pending"),
+                            ("running", "nsc provisioning running"),
+                            ("complete", "nsc provisioning complete"),
+                            ("failed", "nsc provisioning failed"),
+                        ],
+                        default="pending",
+                        max_length=16,
+                    ),
+                ),
+                ("attempts", models.PositiveIntegerField(default=0)),
+                ("last_error", models.TextField(blank=True, default="")),
+                (
+                    "next_attempt_at",
+                    models.DateTimeField(default=django.utils.timezone.now),
+                ),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["status", "next_attempt_at"],
+                        name="django_nats_status_1cb14a_idx",
+                    ),
+                    models.Index(
+                        fields=["account_name", "status"],
+                        name="django_nats_account_a9a3ec_idx",
+                    ),
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,109 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("django_nats_nkeys", "0011_nscoperation_nsc_status"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="natsmessageexport",
+            name="nsc_reconciled_version",
+            field=models.PositiveIntegerField(
+                default=0,
+                help_text="nsc_version last reconciled with the nsc store by `manage.py nsc_reconcile`",
+            ),
+        ),
+        migrations.AddField(
+            model_name="natsmessageexport",
+            name="nsc_version",
+            field=models.PositiveIntegerField(
+                default=1,
+                help_text="Incremented whenever the row changes, see `manage.py nsc_reconcile`",
+            ),
+        ),
+        migrations.AddField(
+            model_name="natsorganization",
+            name="nsc_reconciled_version",
+            field=models.PositiveIntegerField(
+                default=0,
+                help_text="nsc_version last reconciled with the nsc store by `manage.py nsc_reconcile`",
+            ),
+        ),
+        migrations.AddField(
+            model_name="natsorganization",
+            name="nsc_version",
+            field=models.PositiveIntegerField(
+                default=1,
+                help_text="Incremented whenever the row changes, see `manage.py nsc_reconcile`",
+            ),
+        ),
+        migrations.AddField(
+            model_name="natsorganizationapp",
+            name="nsc_reconciled_version",
+            field=models.PositiveIntegerField(
+                default=0,
+                help_text="nsc_version last reconciled with the nsc store by `manage.py nsc_reconcile`",
+            ),
+        ),
+        migrations.AddField(
+            model_name="natsorganizationapp",
+            name="nsc_version",
+            field=models.PositiveIntegerField(
+                default=1,
+                help_text="Incremented whenever the row changes, see `manage.py nsc_reconcile`",
+            ),
+        ),
+        migrations.AddField(
+            model_name="natsorganizationuser",
+            name="nsc_reconciled_version",
+            field=models.PositiveIntegerField(
+                default=0,
+                help_text="nsc_version last reconciled with the nsc store by `manage.py nsc_reconcile`",
+            ),
+        ),
+        migrations.AddField(
+            model_name="natsorganizationuser",
+            name="nsc_version",
+            field=models.PositiveIntegerField(
+                default=1,
+                help_text="Incremented whenever the row changes, see `manage.py nsc_reconcile`",
+            ),
+        ),
+        migrations.AddField(
+            model_name="natsrobotaccount",
+            name="nsc_reconciled_version",
+            field=models.PositiveIntegerField(
+                default=0,
+                help_text="nsc_version last reconciled with the nsc store by `manage.py nsc_reconcile`",
+            ),
+        ),
+        migrations.AddField(
+            model_name="natsrobotaccount",
+            name="nsc_version",
+            field=models.PositiveIntegerField(
+                default=1,
+                help_text="Incremented whenever the row changes, see `manage.py nsc_reconcile`",
+            ),
+        ),
+        migrations.AddField(
+            model_name="natsrobotapp",
+            name="nsc_reconciled_version",
+            field=models.PositiveIntegerField(
+                default=0,
+                help_text="nsc_version last reconciled with the nsc store by `manage.py nsc_reconcile`",
+            ),
+        ),
+        migrations.AddField(
+            model_name="natsrobotapp",
+            name="nsc_version",
+            field=models.PositiveIntegerField(
+                default=1,
+                help_text="Incremented whenever the row changes, see `manage.py nsc_reconcile`",
+            ),
+        ),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("django_nats_nkeys", "0012_nsc_version"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="NatsPooledAccount",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "name",
+                    models.CharField(
+                        help_text="nsc account name, becomes the organization's name",
+                        max_length=255,
+                        unique=True,
+                    ),
+                ),
+                (
+                    "app_name",
+                    models.CharField(
+                        help_text="nsc user name, becomes the organization user's app_name",
+                        max_length=255,
+                    ),
+                ),
+                ("jetstream_enabled", models.BooleanField(default=True)),
+                (
+                    "json",
+                    models.JSONField(
+                        default=dict, help_text="Output of `nsc describe account`"
+                    ),
+                ),
+                (
+                    "app_json",
+                    models.JSONField(
+                        default=dict, help_text="Output of `nsc describe user`"
+                    ),
+                ),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+    ]
@@ -1,8 +1,9 @@
-import zipfile
-import io
 from dataclasses import dataclass
 from typing import Tuple
+from django.core.exceptions import ValidationError
 from django.db import models
+from django.db.models import F
+from django.utils import timezone
 
 from organizations.abstract import (
     AbstractOrganization,
@@ -12,8 +13,6 @@ from organizations.abstract import (
 )
 from organizations.managers import OrgManager, ActiveOrgManager
 
-from coolname import generate_slug
-
 
 # ref: https://django-organizations.readthedocs.io/en/latest/cookbook.html#multiple-organizations-with-simple-inheritance
 
@@ -29,24 +28,143 @@ class NatsMessageExportType(models.TextChoices):
     )
 
 
-class NatsMessageExport(models.Model):
+# saving only these fields doesn't change what should be in the nsc store
+NSC_VERSION_IGNORED_FIELDS = frozenset(
+    ("json", "nsc_status", "nsc_version", "nsc_reconciled_version")
+)
+
+
+class NscVersionedMixin:
+    """
+    Increments nsc_version in the same UPDATE as save(), see signals.nsc_version_pre_save
+    """
+
+    def save(self, *args, update_fields=None, **kwargs):
+        if not self._state.adding:
+            if update_fields is not None:
+                update_fields = set(update_fields)
+                if update_fields - NSC_VERSION_IGNORED_FIELDS:
+                    self.nsc_version = F("nsc_version") + 1
+                    update_fields.add("nsc_version")
+            elif "nsc_version" not in self.__dict__:
+                # deferred since the last save, keep this a full save including the bump
+                self.nsc_version = F("nsc_version") + 1
+        super().save(*args, update_fields=update_fields, **kwargs)
+
+
+class NatsMessageExport(NscVersionedMixin, models.Model):
     name = models.CharField(unique=True, max_length=255)
     subject_pattern = models.CharField(unique=True, max_length=255)
     public = models.BooleanField()
     export_type = models.CharField(max_length=8, choices=NatsMessageExportType.choices)
 
+    nsc_version = models.PositiveIntegerField(
+        default=1,
+        help_text="Incremented whenever the row changes, see `manage.py nsc_reconcile`",
+    )
+    nsc_reconciled_version = models.PositiveIntegerField(
+        default=0,
+        help_text="nsc_version last reconciled with the nsc store by `manage.py nsc_reconcile`",
+    )
+
+    def clean(self):
+        from django_nats_nkeys.subjects import validate_subject_pattern
+
+        try:
+            validate_subject_pattern(self.subject_pattern)
+        except ValueError as e:
+            raise ValidationError({"subject_pattern": str(e)})
+
+
+class NatsNscStatus(models.TextChoices):
+    PENDING = "pending", "nsc provisioning pending"
+    RUNNING = "running", "nsc provisioning running"
+    COMPLETE = "complete", "nsc provisioning complete"
+    FAILED = "failed", "nsc provisioning failed"
+
+
+class NatsNscOperationType(models.TextChoices):
+    ADD_ACCOUNT = "add_account", "nsc add account (and enable JetStream, if needed)"
+    JETSTREAM_UPDATE = "jetstream_update", "nsc edit account --js-*"
+    ADD_APP = "add_app", "nsc add user"
+    BEARER_AUTH_ENABLE = "bearer_auth_enable", "nsc edit user --bearer"
+    ADD_EXPORT = "add_export", "nsc add export (and imports)"
+
+
+class NatsNscOperation(models.Model):
+    """
+    Outbox of nsc operations, written in the same transaction as the row being provisioned and drained by `manage.py nsc_worker`
+    Operations are applied in order per account, and in parallel across accounts
+    """
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["status", "next_attempt_at"]),
+            models.Index(fields=["account_name", "status"]),
+        ]
+
+    operation = models.CharField(max_length=32, choices=NatsNscOperationType.choices)
+    model = models.CharField(
+        max_length=255, help_text="app_label.ModelName of the provisioned object"
+    )
+    object_id = models.CharField(max_length=255)
+    account_name = models.CharField(
+        max_length=255, help_text="NATS account modified by this operation"
+    )
+    payload = models.JSONField(default=dict)
+    status = models.CharField(
+        max_length=16, choices=NatsNscStatus.choices, default=NatsNscStatus.PENDING
+    )
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True, default="")
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+
+class NatsPooledAccount(models.Model):
+    """
+    nsc account (with a signing key, JetStream limits and one user) added and pushed ahead of signup by `manage.py nsc_account_pool`
+    Claimed at signup, where it becomes a NatsOrganization and organization user without running nsc
+    """
+
+    name = models.CharField(
+        unique=True,
+        max_length=255,
+        help_text="nsc account name, becomes the organization's name",
+    )
+    app_name = models.CharField(
+        max_length=255,
+        help_text="nsc user name, becomes the organization user's app_name",
+    )
+    jetstream_enabled = models.BooleanField(default=True)
+    json = models.JSONField(help_text="Output of `nsc describe account`", default=dict)
+    app_json = models.JSONField(help_text="Output of `nsc describe user`", default=dict)
+    created_at = models.DateTimeField(auto_now_add=True)
+
 
 class NatsOrganizationManager(OrgManager):
     def create_nsc(self, **kwargs):
-        from django_nats_nkeys.services import nsc_add_account, nsc_jetstream_update
+        from django_nats_nkeys.outbox import create_nsc_deferred, nsc_deferred
+
+        if nsc_deferred():
+            return create_nsc_deferred(self, NatsNscOperationType.ADD_ACCOUNT, **kwargs)
+
+        from django_nats_nkeys.services import (
+            nsc_add_account,
+            nsc_batch,
+            nsc_jetstream_update,
+        )
 
         # create django model
         org = self.create(**kwargs)
-        # try create nsc account
-        org = nsc_add_account(org)
-        # should we enable jetstream?
-        if org.jetstream_enabled:
-            return nsc_jetstream_update(org)
+        # push account and refresh json once, after all edits are applied
+        with nsc_batch():
+            # try create nsc account
+            org = nsc_add_account(org)
+            # should we enable jetstream?
+            if org.jetstream_enabled:
+                nsc_jetstream_update(org)
         return org
 
 
@@ -55,10 +173,12 @@ class ActiveNatsOrganizationManager(NatsOrganizationManager, ActiveOrgManager):
 
 
 def _default_name():
+    from coolname import generate_slug
+
     return generate_slug(3)
 
 
-class NatsOrganization(AbstractOrganization):
+class NatsOrganization(NscVersionedMixin, AbstractOrganization):
     objects = NatsOrganizationManager()
     active = ActiveNatsOrganizationManager()
 
@@ -99,13 +219,29 @@ class NatsOrganization(AbstractOrganization):
         help_text="JetStream max number of consumers (shared across all users/apps beloning to NatsOrganization account)",
     )
 
+    nsc_status = models.CharField(
+        max_length=16,
+        choices=NatsNscStatus.choices,
+        default=NatsNscStatus.COMPLETE,
+        help_text="Provisioning status of nsc operations queued in NatsNscOperation",
+    )
+
+    nsc_version = models.PositiveIntegerField(
+        default=1,
+        help_text="Incremented whenever the row changes, see `manage.py nsc_reconcile`",
+    )
+    nsc_reconciled_version = models.PositiveIntegerField(
+        default=0,
+        help_text="nsc_version last reconciled with the nsc store by `manage.py nsc_reconcile`",
+    )
+
     def nsc_validate(self):
         from .services import nsc_validate
 
         return nsc_validate(account_name=self.name)
 
 
-class AbstractNatsApp(models.Model):
+class AbstractNatsApp(NscVersionedMixin, models.Model):
     """
     Corresponds to a NATS user/client within an Account group, intended for use by application
     https://docs.nats.io/running-a-nats-service/configuration/securing_nats/accounts
@@ -156,14 +292,73 @@ class AbstractNatsApp(models.Model):
         help_text="deny subscribe permissions, comma separated list. equivalent to `nsc add user ... --deny-sub=<permissions>`",
     )
 
+    nsc_status = models.CharField(
+        max_length=16,
+        choices=NatsNscStatus.choices,
+        default=NatsNscStatus.COMPLETE,
+        help_text="Provisioning status of nsc operations queued in NatsNscOperation",
+    )
+
+    nsc_version = models.PositiveIntegerField(
+        default=1,
+        help_text="Incremented whenever the row changes, see `manage.py nsc_reconcile`",
+    )
+    nsc_reconciled_version = models.PositiveIntegerField(
+        default=0,
+        help_text="nsc_version last reconciled with the nsc store by `manage.py nsc_reconcile`",
+    )
+
+    @property
+    def nats_permissions(self):
+        """
+        Compiled allow/deny permissions, see django_nats_nkeys.permissions.NatsPermissions
+        Cached on the instance and compiled again once the permission fields change (e.g. on save or refresh_from_db)
+        """
+        from django_nats_nkeys.permissions import compile_permissions, permissions_key
+
+        key = permissions_key(self)
+        cached = getattr(self, "_nats_permissions", None)
+        if cached is None or cached[0] != key:
+            cached = (key, compile_permissions(self))
+            self._nats_permissions = cached
+        return cached[1]
+
+    def can_publish(self, subject: str) -> bool:
+        return self.nats_permissions.can_publish(subject)
+
+    def can_subscribe(self, subject: str) -> bool:
+        return self.nats_permissions.can_subscribe(subject)
+
 
 class NatsOrganizationAppManager(models.Manager):
     def create_nsc(self, **kwargs):
+        from django_nats_nkeys.outbox import create_nsc_deferred, nsc_deferred
+
+        if nsc_deferred():
+            return create_nsc_deferred(self, NatsNscOperationType.ADD_APP, **kwargs)
+
         from django_nats_nkeys.services import nsc_add_app
 
         obj = self.create(**kwargs)
         return nsc_add_app(obj.organization.name, obj.app_name, obj)
 
+    def bulk_create_nsc(self, objs, batch_size=None):
+        """
+        bulk_create() objs and add their nsc users in parallel
+        Returns NscBulkResult, listing objs whose nsc user could not be added in NscBulkResult.failed
+        """
+        from django_nats_nkeys.outbox import bulk_create_nsc_deferred, nsc_deferred
+        from django_nats_nkeys.services import NscBulkResult, nsc_bulk_add_apps
+
+        if nsc_deferred():
+            objs = bulk_create_nsc_deferred(
+                self, NatsNscOperationType.ADD_APP, objs, batch_size=batch_size
+            )
+            return NscBulkResult(succeeded=objs, failed=[])
+
+        objs = self.bulk_create(objs, batch_size=batch_size)
+        return nsc_bulk_add_apps(objs, batch_size=batch_size)
+
 
 class NatsOrganizationUser(AbstractOrganizationUser, AbstractNatsApp):
     """
@@ -221,11 +416,9 @@ class AbstractNatsOrganizationApp(AbstractNatsApp):
         Extracts base64-encoded JWT string from nkey credential
         Intended for use as bearer auth token in MQTT client
         """
-        creds = self.generate_creds()
-        parts = creds.split("\n")
-        if len(parts) > 2:
-            return creds.split("\n")[1]
-        return creds
+        from django_nats_nkeys.creds_cache import creds_cache
+
+        return creds_cache.get_jwt(self.organization.name, self.app_name)
 
     def generate_creds(self) -> str:
         """
@@ -246,9 +439,9 @@ class AbstractNatsOrganizationApp(AbstractNatsApp):
         *************************************************************
 
         """
-        from django_nats_nkeys.services import nsc_generate_creds
+        from django_nats_nkeys.creds_cache import creds_cache
 
-        return nsc_generate_creds(self.organization.name, self.app_name)
+        return creds_cache.get_creds(self.organization.name, self.app_name).creds
 
     def generate_creds_zip(
         self, creds_filename="nats.creds", jwt_filename="nats.jwt"
@@ -256,8 +449,14 @@ class AbstractNatsOrganizationApp(AbstractNatsApp):
         """
         Returns a Tuple of (filename, compressed bytes)
         """
-        creds = self.generate_creds()
-        jwt = self.generate_jwt()
+        import io
+        import zipfile
+
+        from django_nats_nkeys.creds_cache import creds_cache
+
+        parsed = creds_cache.get_creds(self.organization.name, self.app_name)
+        creds = parsed.creds
+        jwt = parsed.jwt
         # do not write sensitive credentials to disk
         # instead, write to memory buffer
         zip_buffer = io.BytesIO()
@@ -294,6 +493,11 @@ class NatsAccountInvitation(AbstractOrganizationInvitation):
 
 class NatsRobotAccountManager(models.Manager):
     def create_nsc(self, **kwargs):
+        from django_nats_nkeys.outbox import create_nsc_deferred, nsc_deferred
+
+        if nsc_deferred():
+            return create_nsc_deferred(self, NatsNscOperationType.ADD_ACCOUNT, **kwargs)
+
         from django_nats_nkeys.services import nsc_add_account
 
         # create django model
@@ -305,7 +509,7 @@ class NatsRobotAccountManager(models.Manager):
         return nsc_add_account(obj)
 
 
-class AbstractNatsRobotAccount(models.Model):
+class AbstractNatsRobotAccount(NscVersionedMixin, models.Model):
     objects = NatsRobotAccountManager()
 
     class Meta:
@@ -322,6 +526,22 @@ class AbstractNatsRobotAccount(models.Model):
         NatsMessageExport, related_name="nats_robot_exports"
     )
 
+    nsc_status = models.CharField(
+        max_length=16,
+        choices=NatsNscStatus.choices,
+        default=NatsNscStatus.COMPLETE,
+        help_text="Provisioning status of nsc operations queued in NatsNscOperation",
+    )
+
+    nsc_version = models.PositiveIntegerField(
+        default=1,
+        help_text="Incremented whenever the row changes, see `manage.py nsc_reconcile`",
+    )
+    nsc_reconciled_version = models.PositiveIntegerField(
+        default=0,
+        help_text="nsc_version last reconciled with the nsc store by `manage.py nsc_reconcile`",
+    )
+
     def nsc_validate(self):
         from .services import nsc_validate
 
@@ -334,11 +554,33 @@ class NatsRobotAccount(AbstractNatsRobotAccount):
 
 class NatsRobotAppManager(models.Manager):
     def create_nsc(self, **kwargs):
+        from django_nats_nkeys.outbox import create_nsc_deferred, nsc_deferred
+
+        if nsc_deferred():
+            return create_nsc_deferred(self, NatsNscOperationType.ADD_APP, **kwargs)
+
         from django_nats_nkeys.services import nsc_add_app
 
         obj = self.create(**kwargs)
         return nsc_add_app(obj.account.name, obj.app_name, obj)
 
+    def bulk_create_nsc(self, objs, batch_size=None):
+        """
+        bulk_create() objs and add their nsc users in parallel
+        Returns NscBulkResult, listing objs whose nsc user could not be added in NscBulkResult.failed
+        """
+        from django_nats_nkeys.outbox import bulk_create_nsc_deferred, nsc_deferred
+        from django_nats_nkeys.services import NscBulkResult, nsc_bulk_add_apps
+
+        if nsc_deferred():
+            objs = bulk_create_nsc_deferred(
+                self, NatsNscOperationType.ADD_APP, objs, batch_size=batch_size
+            )
+            return NscBulkResult(succeeded=objs, failed=[])
+
+        objs = self.bulk_create(objs, batch_size=batch_size)
+        return nsc_bulk_add_apps(objs, batch_size=batch_size)
+
 
 class NatsRobotApp(AbstractNatsApp):
     class Meta:
@@ -0,0 +1,358 @@
+import csv
+import itertools
+import json
+import logging
+import os
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set, Tuple
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.utils.text import slugify
+
+from django_nats_nkeys.executor import nsc_executor
+from django_nats_nkeys.models import NatsNscStatus
+from django_nats_nkeys.settings import nats_nkeys_settings
+
+logger = logging.getLogger(__name__)
+
+
+def read_records(path: str) -> Iterator[Dict[str, Any]]:
+    """
+    Yields one dict per CSV row (with header) or JSONL line
+    """
+    with open(path, "r", newline="") as f:
+        if path.endswith((".jsonl", ".ndjson")):
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+        else:
+            yield from csv.DictReader(f)
+
+
+@dataclass(init=True, repr=True)
+class OnboardCheckpoint:
+    """
+    Progress of a bulk onboarding run, written after every batch so an interrupted run resumes after the last finished batch
+    """
+
+    path: Optional[str]
+    offset: int = 0
+    created: int = 0
+    failed: int = 0
+    failed_keys: List[str] = field(default_factory=list)
+    # error of the final push of every account, None once it succeeded
+    push_error: Optional[str] = None
+
+    @classmethod
+    def load(cls, path: Optional[str]) -> "OnboardCheckpoint":
+        if path is None or not os.path.exists(path):
+            return cls(path=path)
+        with open(path, "r") as f:
+            return cls(path=path, **json.load(f))
+
+    def save(self) -> None:
+        if self.path is None:
+            return
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(
+                {
+                    "offset": self.offset,
+                    "created": self.created,
+                    "failed": self.failed,
+                    "failed_keys": self.failed_keys,
+                    "push_error": self.push_error,
+                },
+                f,
+            )
+        # atomic, a crash never leaves a truncated checkpoint
+        os.replace(tmp, self.path)
+
+
+class BulkOnboarder:
+    """
+    Creates a User (if needed), NatsOrganization, owner and organization user per record, like get_or_create_org_owner_units_for_authenticated_user(), in batches
+
+    Rows of each batch are inserted with bulk_create, then nsc accounts and users are added in parallel across accounts on nsc_executor. Accounts are pushed once, when the run finishes.
+    Users that already belong to an organization are skipped, unless that organization's nsc provisioning didn't complete, in which case it is retried.
+    """
+
+    def __init__(
+        self,
+        org_defaults: Optional[Dict[str, Any]] = None,
+        org_user_defaults: Optional[Dict[str, Any]] = None,
+        batch_size: int = 500,
+        checkpoint: Optional[str] = None,
+        progress: Optional[Callable[[str], None]] = None,
+    ) -> None:
+        self.org_defaults = org_defaults or {}
+        self.org_user_defaults = org_user_defaults or {"is_admin": True}
+        self.batch_size = batch_size
+        self.checkpoint = OnboardCheckpoint.load(checkpoint)
+        self.progress = progress or logger.info
+        self.user_model = get_user_model()
+        self.org_model = nats_nkeys_settings.get_nats_account_model()
+        self.org_user_model = nats_nkeys_settings.get_nats_user_model()
+        self.org_owner_model = nats_nkeys_settings.get_nats_organization_owner_model()
+
+    def _user_key(self, record: Dict[str, Any]) -> str:
+        return record[self.user_model.USERNAME_FIELD]
+
+    def _get_or_create_users(self, records: List[Dict[str, Any]]) -> Dict[str, Any]:
+        username_field = self.user_model.USERNAME_FIELD
+        user_fields = {f.name for f in self.user_model._meta.concrete_fields}
+        keys = [self._user_key(r) for r in records]
+        users = {
+            getattr(u, username_field): u
+            for u in self.user_model.objects.filter(**{f"{username_field}__in": keys})
+        }
+        new_users = []
+        for record in records:
+            key = self._user_key(record)
+            if key in users:
+                continue
+            user = self.user_model(
+                **{k: v for k, v in record.items() if k in user_fields}
+            )
+            user.set_unusable_password()
+            users[key] = user
+            new_users.append(user)
+        self.user_model.objects.bulk_create(new_users, batch_size=self.batch_size)
+        if new_users and new_users[0].pk is None:
+            # backend doesn't return primary keys from bulk_create
+            users.update(
+                {
+                    getattr(u, username_field): u
+                    for u in self.user_model.objects.filter(
+                        **{
+                            f"{username_field}__in": [
+                                self._user_key(r) for r in records
+                            ]
+                        }
+                    )
+                }
+            )
+        return users
+
+    def _taken(self, names: List[str], slugs: List[str]) -> Tuple[Set[str], Set[str]]:
+        """
+        Returns which of names (organizations or pooled accounts) and slugs are already used
+        """
+        from django_nats_nkeys.models import NatsPooledAccount
+
+        manager = self.org_model._base_manager
+        taken_names = set(manager.filter(name__in=names).values_list("name", flat=True))
+        taken_names.update(
+            NatsPooledAccount.objects.filter(name__in=names).values_list(
+                "name", flat=True
+            )
+        )
+        taken_slugs = set(manager.filter(slug__in=slugs).values_list("slug", flat=True))
+        return taken_names, taken_slugs
+
+    def _org_names(
+        self, records: List[Dict[str, Any]]
+    ) -> List[Optional[Tuple[str, str]]]:
+        """
+        Returns (name, slug) of the organization of each record, or None if its org_name/org_slug is already used
+        Generated names that collide are generated again, like pool._unique_account_name()
+        """
+        from coolname import generate_slug
+
+        wanted = [(r.get("org_name"), r.get("org_slug")) for r in records]
+        names = [name or generate_slug(3) for name, _ in wanted]
+        slugs = [slug or slugify(name) for (_, slug), name in zip(wanted, names)]
+        result: List[Optional[Tuple[str, str]]] = [None] * len(records)
+        used_names: Set[str] = set()
+        used_slugs: Set[str] = set()
+        todo = list(range(len(records)))
+        while todo:
+            taken_names, taken_slugs = self._taken(
+                [names[i] for i in todo], [slugs[i] for i in todo]
+            )
+            retry = []
+            for i in todo:
+                name_taken = names[i] in taken_names or names[i] in used_names
+                slug_taken = slugs[i] in taken_slugs or slugs[i] in used_slugs
+                if not name_taken and not slug_taken:
+                    used_names.add(names[i])
+                    used_slugs.add(slugs[i])
+                    result[i] = (names[i], slugs[i])
+                elif wanted[i][0] is None and (wanted[i][1] is None or not slug_taken):
+                    names[i] = generate_slug(3)
+                    slugs[i] = wanted[i][1] or slugify(names[i])
+                    retry.append(i)
+            todo = retry
+        return result
+
+    def _create_rows(self, records: List[Dict[str, Any]]) -> List[Tuple[str, Any, Any]]:
+        """
+        Returns (user key, organization, organization user) for every record that needs nsc provisioning
+        """
+        with transaction.atomic():
+            users = self._get_or_create_users(records)
+            existing = {
+                org_user.user_id: org_user
+                for org_user in self.org_user_model.objects.filter(
+                    user__in=list(users.values())
+                ).select_related("organization")
+            }
+            units = []
+            new_records = []
+            seen = set()
+            for record in records:
+                key = self._user_key(record)
+                if key in seen:
+                    # one organization per user, the first record wins
+                    continue
+                seen.add(key)
+                org_user = existing.get(users[key].pk)
+                if org_user is not None:
+                    if org_user.organization.nsc_status != NatsNscStatus.COMPLETE:
+                        units.append((key, org_user.organization, org_user))
+                    continue
+                new_records.append(record)
+
+            new_units = []
+            for record, org_name in zip(new_records, self._org_names(new_records)):
+                key = self._user_key(record)
+                if org_name is None:
+                    # an IntegrityError would abort the whole batch
+                    logger.error(
+                        "Onboarding %s failed: organization name %r or slug %r is taken",
+                        key,
+                        record.get("org_name"),
+                        record.get("org_slug"),
+                    )
+                    self.checkpoint.failed += 1
+                    self.checkpoint.failed_keys.append(key)
+                    continue
+                name, slug = org_name
+                org = self.org_model(
+                    **{
+                        **self.org_defaults,
+                        "name": name,
+                        "slug": slug,
+                        "nsc_status": NatsNscStatus.PENDING,
+                    }
+                )
+                org_user = self.org_user_model(
+                    **self.org_user_defaults,
+                    user=users[key],
+                    nsc_status=NatsNscStatus.PENDING,
+                )
+                new_units.append((key, org, org_user))
+
+            orgs = self.org_model.objects.bulk_create([org for _, org, _ in new_units])
+            if orgs and orgs[0].pk is None:
+                # backend doesn't return primary keys from bulk_create
+                saved = self.org_model.objects.in_bulk(
+                    [org.slug for org in orgs], field_name="slug"
+                )
+                orgs = [saved[org.slug] for org in orgs]
+            for (_, _, org_user), org in zip(new_units, orgs):
+                org_user.organization = org
+            org_users = self.org_user_model.objects.bulk_create(
+                [org_user for _, _, org_user in new_units]
+            )
+            if org_users and org_users[0].pk is None:
+                saved = {
+                    org_user.organization_id: org_user
+                    for org_user in self.org_user_model.objects.filter(
+                        organization__in=orgs
+                    )
+                }
+                org_users = [saved[org.pk] for org in orgs]
+                for org_user, org in zip(org_users, orgs):
+                    org_user.organization = org
+            new_units = [
+                (key, org, org_user)
+                for (key, _, _), org, org_user in zip(new_units, orgs, org_users)
+            ]
+            self.org_owner_model.objects.bulk_create(
+                [
+                    self.org_owner_model(organization=org, organization_user=org_user)
+                    for _, org, org_user in new_units
+                ]
+            )
+        return units + new_units
+
+    def _provision(self, org, org_user) -> None:
+        from django_nats_nkeys.services import (
+            nsc_add_account_local,
+            nsc_add_app_local,
+            nsc_describe_json,
+            nsc_jetstream_update_cmd,
+            run_nsc_and_log_output,
+        )
+
+        nsc_add_account_local(org)
+        if org.jetstream_enabled:
+            run_nsc_and_log_output(nsc_jetstream_update_cmd(org))
+        org.json = nsc_describe_json(org.name)
+        nsc_add_app_local(org_user)
+
+    def _provision_batch(self, units: List[Tuple[str, Any, Any]]) -> int:
+        futures = [
+            (key, org, org_user, nsc_executor.submit(self._provision, org, org_user))
+            for key, org, org_user in units
+        ]
+        failed = 0
+        for key, org, org_user, future in futures:
+            try:
+                future.result()
+            except Exception as e:
+                logger.error("Onboarding %s (account=%s) failed: %s", key, org.name, e)
+                status = NatsNscStatus.FAILED
+                failed += 1
+                self.checkpoint.failed_keys.append(key)
+            else:
+                status = NatsNscStatus.COMPLETE
+            org.nsc_status = status
+            org_user.nsc_status = status
+        self.org_model.objects.bulk_update(
+            [org for _, org, _ in units], ["json", "nsc_status"]
+        )
+        self.org_user_model.objects.bulk_update(
+            [org_user for _, _, org_user in units], ["json", "nsc_status"]
+        )
+        return failed
+
+    def run(self, records: Iterator[Dict[str, Any]]) -> OnboardCheckpoint:
+        from django_nats_nkeys.services import nsc_push
+
+        checkpoint = self.checkpoint
+        records = itertools.islice(records, checkpoint.offset, None)
+        if checkpoint.offset:
+            self.progress(f"Resuming after {checkpoint.offset} records")
+        start = time.monotonic()
+        processed = 0
+        while True:
+            batch = list(itertools.islice(records, self.batch_size))
+            if not batch:
+                break
+            units = self._create_rows(batch)
+            failed = self._provision_batch(units)
+            processed += len(batch)
+            checkpoint.offset += len(batch)
+            checkpoint.created += len(units) - failed
+            checkpoint.failed += failed
+            checkpoint.save()
+            elapsed = time.monotonic() - start
+            self.progress(
+                f"{checkpoint.offset} records processed ({checkpoint.created} provisioned, {checkpoint.failed} failed), "
+                f"{processed / elapsed:.1f} records/s"
+            )
+        if checkpoint.created:
+            # one push of every account, instead of one per organization
+            try:
+                nsc_push()
+            except Exception as e:
+                logger.error("nsc push after onboarding failed: %s", e)
+                checkpoint.push_error = str(e)
+            else:
+                checkpoint.push_error = None
+            checkpoint.save()
+        return checkpoint
@@ -0,0 +1,419 @@
+import json
+import logging
+import threading
+import time
+from datetime import timedelta
+from typing import Any, Callable, Dict, List, Optional
+
+from django.apps import apps as django_apps
+from django.db import close_old_connections, transaction
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from django_nats_nkeys.models import (
+    NatsMessageExport,
+    NatsNscOperation,
+    NatsNscOperationType,
+    NatsNscStatus,
+)
+from django_nats_nkeys.settings import NatsNscProvisioningMode, nats_nkeys_settings
+
+logger = logging.getLogger(__name__)
+
+
+def nsc_deferred() -> bool:
+    """
+    True if nsc operations should be queued in NatsNscOperation instead of run in-process
+    """
+    return nats_nkeys_settings.NATS_NSC_PROVISIONING_MODE in (
+        NatsNscProvisioningMode.OUTBOX,
+        NatsNscProvisioningMode.ON_COMMIT,
+    )
+
+
+# ids of operations queued by this thread, applied once their transaction commits
+_committed = threading.local()
+
+
+def _run_on_commit(ops: List[NatsNscOperation]) -> None:
+    if (
+        nats_nkeys_settings.NATS_NSC_PROVISIONING_MODE
+        != NatsNscProvisioningMode.ON_COMMIT
+    ):
+        return
+    pending = _committed.__dict__.setdefault("op_ids", [])
+    pending.extend(op.id for op in ops)
+    # every callback drains all ids queued so far, so callbacks after the first are no-ops
+    transaction.on_commit(run_committed_operations, using=NatsNscOperation.objects.db)
+
+
+def run_committed_operations() -> None:
+    """
+    Applies operations queued by this thread in ON_COMMIT provisioning mode, see NscOutboxWorker.run_committed()
+    Runs as a transaction.on_commit() callback. Ids left behind by a rolled back transaction are drained by the next commit, and skipped if their rows don't exist.
+    """
+    op_ids = getattr(_committed, "op_ids", None)
+    if not op_ids:
+        return
+    _committed.op_ids = []
+    NscOutboxWorker().run_committed(op_ids)
+
+
+def enqueue_nsc_operation(
+    operation: NatsNscOperationType, obj, payload: Optional[Dict[str, Any]] = None
+) -> NatsNscOperation:
+    """
+    Records a pending nsc operation for obj and marks obj's nsc_status pending
+    Call inside the transaction that writes obj, so the row and the operation commit (or roll back) together
+    """
+    from django_nats_nkeys.services import nsc_account_name
+
+    op = NatsNscOperation.objects.create(
+        operation=operation,
+        model=obj._meta.label,
+        object_id=str(obj.pk),
+        account_name=nsc_account_name(obj),
+        payload=payload or {},
+    )
+    if obj.nsc_status != NatsNscStatus.PENDING:
+        # queryset update() does not fire post_save, so signal handlers won't re-run
+        type(obj)._default_manager.filter(pk=obj.pk).update(
+            nsc_status=NatsNscStatus.PENDING
+        )
+        obj.nsc_status = NatsNscStatus.PENDING
+    _run_on_commit([op])
+    return op
+
+
+def create_nsc_deferred(manager, operation: NatsNscOperationType, **kwargs):
+    """
+    Outbox variant of Manager.create_nsc(): creates row and queues operation in one transaction
+    """
+    with transaction.atomic(using=manager.db):
+        obj = manager.create(nsc_status=NatsNscStatus.PENDING, **kwargs)
+        enqueue_nsc_operation(operation, obj)
+    return obj
+
+
+def bulk_create_nsc_deferred(
+    manager, operation: NatsNscOperationType, objs, batch_size: Optional[int] = None
+):
+    """
+    Outbox variant of Manager.bulk_create_nsc(): creates rows and queues one operation per row in one transaction
+    """
+    from django_nats_nkeys.services import nsc_account_name
+
+    for obj in objs:
+        obj.nsc_status = NatsNscStatus.PENDING
+    with transaction.atomic(using=manager.db):
+        objs = manager.bulk_create(objs, batch_size=batch_size)
+        ops = NatsNscOperation.objects.bulk_create(
+            [
+                NatsNscOperation(
+                    operation=operation,
+                    model=obj._meta.label,
+                    object_id=str(obj.pk),
+                    account_name=nsc_account_name(obj),
+                    payload={},
+                )
+                for obj in objs
+            ],
+            batch_size=batch_size,
+        )
+        _run_on_commit(ops)
+    return objs
+
+
+def _add_account(obj, payload):
+    from django_nats_nkeys.services import (
+        nsc_add_account,
+        nsc_batch,
+        nsc_jetstream_update,
+    )
+
+    # a failed add is compensated by removing the account, so only push it once every edit applied
+    with nsc_batch(flush_on_error=False):
+        nsc_add_account(obj)
+        if getattr(obj, "jetstream_enabled", False):
+            nsc_jetstream_update(obj)
+
+
+def _jetstream_update(obj, payload):
+    from django_nats_nkeys.services import nsc_jetstream_update
+
+    nsc_jetstream_update(obj)
+
+
+def _add_app(obj, payload):
+    from django_nats_nkeys.services import nsc_account_name, nsc_add_app
+
+    nsc_add_app(nsc_account_name(obj), obj.app_name, obj)
+
+
+def _bearer_auth_enable(obj, payload):
+    from django_nats_nkeys.services import nsc_bearer_auth_enable
+
+    nsc_bearer_auth_enable(obj)
+
+
+def _add_export(obj, payload):
+    from django_nats_nkeys.services import nsc_add_exports
+
+    # "export_id": operations queued before multi-export adds were batched
+    export_ids = payload.get("export_ids") or [payload["export_id"]]
+    result = nsc_add_exports(
+        obj, NatsMessageExport.objects.filter(pk__in=export_ids).order_by("pk")
+    )
+    if result.failed:
+        raise result.failed[0][1]
+
+
+NSC_OPERATIONS: Dict[str, Callable[[Any, Dict[str, Any]], None]] = {
+    NatsNscOperationType.ADD_ACCOUNT: _add_account,
+    NatsNscOperationType.JETSTREAM_UPDATE: _jetstream_update,
+    NatsNscOperationType.ADD_APP: _add_app,
+    NatsNscOperationType.BEARER_AUTH_ENABLE: _bearer_auth_enable,
+    NatsNscOperationType.ADD_EXPORT: _add_export,
+}
+
+
+def _undo_add_account(obj) -> Optional[Callable[[], None]]:
+    from django_nats_nkeys.services import nsc_delete_account
+    from django_nats_nkeys.store_index import store_index
+
+    if store_index.has_account(obj.name):
+        # never delete an account this operation didn't add
+        return None
+
+    def undo():
+        if store_index.has_account(obj.name):
+            nsc_delete_account(obj.name)
+
+    return undo
+
+
+def _undo_add_app(obj) -> Optional[Callable[[], None]]:
+    from django_nats_nkeys.services import nsc_account_name, nsc_delete_app
+    from django_nats_nkeys.store_index import store_index
+
+    account_name = nsc_account_name(obj)
+    if store_index.has_user(account_name, obj.app_name):
+        return None
+
+    def undo():
+        if store_index.has_user(account_name, obj.app_name):
+            nsc_delete_app(account_name, obj.app_name)
+
+    return undo
+
+
+# called before an operation runs, return a callable removing what the operation added to the local nsc store if it fails
+NSC_COMPENSATIONS: Dict[str, Callable[[Any], Optional[Callable[[], None]]]] = {
+    NatsNscOperationType.ADD_ACCOUNT: _undo_add_account,
+    NatsNscOperationType.ADD_APP: _undo_add_app,
+}
+
+
+class NscOutboxWorker:
+    """
+    Drains NatsNscOperation
+
+    Only the oldest unfinished operation of each account is runnable, so operations apply in order per account; runnable operations of different accounts run in parallel on nsc_executor.
+    Failed operations are retried with exponential backoff, up to NATS_NSC_OUTBOX_MAX_ATTEMPTS.
+    """
+
+    def __init__(self, batch_size: Optional[int] = None, stale_after: int = 600):
+        self.batch_size = batch_size or nats_nkeys_settings.NATS_NSC_MAX_WORKERS
+        self.stale_after = stale_after
+
+    def requeue_stale(self) -> int:
+        """
+        Returns RUNNING operations abandoned by a crashed worker to PENDING
+        """
+        cutoff = timezone.now() - timedelta(seconds=self.stale_after)
+        return NatsNscOperation.objects.filter(
+            status=NatsNscStatus.RUNNING, updated_at__lt=cutoff
+        ).update(status=NatsNscStatus.PENDING)
+
+    def claim(self) -> List[NatsNscOperation]:
+        unfinished = (NatsNscStatus.PENDING, NatsNscStatus.RUNNING)
+        earlier_unfinished = NatsNscOperation.objects.filter(
+            account_name=OuterRef("account_name"),
+            id__lt=OuterRef("id"),
+            status__in=unfinished,
+        )
+        with transaction.atomic():
+            ops = list(
+                NatsNscOperation.objects.select_for_update(skip_locked=True)
+                .filter(
+                    status=NatsNscStatus.PENDING, next_attempt_at__lte=timezone.now()
+                )
+                .exclude(Exists(earlier_unfinished))
+                .order_by("id")[: self.batch_size]
+            )
+            NatsNscOperation.objects.filter(id__in=[op.id for op in ops]).update(
+                status=NatsNscStatus.RUNNING, updated_at=timezone.now()
+            )
+        return ops
+
+    def _set_object_status(self, op: NatsNscOperation, obj) -> None:
+        if op.status == NatsNscStatus.FAILED:
+            status = NatsNscStatus.FAILED
+        elif (
+            NatsNscOperation.objects.filter(
+                model=op.model,
+                object_id=op.object_id,
+                status__in=(NatsNscStatus.PENDING, NatsNscStatus.RUNNING),
+            )
+            .exclude(id=op.id)
+            .exists()
+        ):
+            return
+        else:
+            status = NatsNscStatus.COMPLETE
+        type(obj)._default_manager.filter(pk=obj.pk).update(nsc_status=status)
+
+    def run_operation(self, op: NatsNscOperation, compensate: bool = False) -> bool:
+        """
+        Applies op, returning True on success
+        With compensate=True, a failed ADD_ACCOUNT/ADD_APP removes the account/user it partially added to the local nsc store, so the retry starts from a clean store (and doesn't conflict in STRICT retry mode)
+        """
+        close_old_connections()
+        try:
+            model = django_apps.get_model(op.model)
+            try:
+                obj = model._default_manager.get(pk=op.object_id)
+            except model.DoesNotExist:
+                logger.warning("Skipping %s, %s was deleted", op.operation, op.model)
+                op.status = NatsNscStatus.COMPLETE
+                op.last_error = "Object deleted before operation ran"
+                op.save(update_fields=["status", "last_error", "updated_at"])
+                return True
+            undo = None
+            if compensate and op.operation in NSC_COMPENSATIONS:
+                undo = NSC_COMPENSATIONS[op.operation](obj)
+            try:
+                NSC_OPERATIONS[op.operation](obj, op.payload)
+            except Exception as e:
+                logger.exception("nsc operation %s id=%s failed", op.operation, op.id)
+                if undo is not None:
+                    try:
+                        undo()
+                    except Exception:
+                        logger.exception(
+                            "Cleanup of nsc operation %s id=%s failed",
+                            op.operation,
+                            op.id,
+                        )
+                op.attempts += 1
+                op.last_error = str(e)
+                if op.attempts >= nats_nkeys_settings.NATS_NSC_OUTBOX_MAX_ATTEMPTS:
+                    op.status = NatsNscStatus.FAILED
+                else:
+                    op.status = NatsNscStatus.PENDING
+                    backoff = min(
+                        2**op.attempts,
+                        nats_nkeys_settings.NATS_NSC_OUTBOX_MAX_BACKOFF,
+                    )
+                    op.next_attempt_at = timezone.now() + timedelta(seconds=backoff)
+                op.save()
+                self._set_object_status(op, obj)
+                return False
+            op.status = NatsNscStatus.COMPLETE
+            op.last_error = ""
+            op.save()
+            self._set_object_status(op, obj)
+            return True
+        finally:
+            close_old_connections()
+
+    def claim_ids(self, op_ids: List[int]) -> List[NatsNscOperation]:
+        """
+        Claims pending operations among op_ids, except those queued behind unfinished operations outside op_ids (left to the worker)
+        """
+        unfinished = (NatsNscStatus.PENDING, NatsNscStatus.RUNNING)
+        earlier_unfinished = NatsNscOperation.objects.filter(
+            account_name=OuterRef("account_name"),
+            id__lt=OuterRef("id"),
+            status__in=unfinished,
+        ).exclude(id__in=op_ids)
+        with transaction.atomic():
+            ops = list(
+                NatsNscOperation.objects.select_for_update(skip_locked=True)
+                .filter(id__in=op_ids, status=NatsNscStatus.PENDING)
+                .exclude(Exists(earlier_unfinished))
+                .order_by("id")
+            )
+            NatsNscOperation.objects.filter(id__in=[op.id for op in ops]).update(
+                status=NatsNscStatus.RUNNING, updated_at=timezone.now()
+            )
+        return ops
+
+    def _run_account(self, ops: List[NatsNscOperation]) -> None:
+        """
+        Applies one account's operations in order, stopping at the first failure
+        Repeated operations (same operation, object and payload) run once
+        """
+        done = set()
+        for i, op in enumerate(ops):
+            key = (
+                op.operation,
+                op.model,
+                op.object_id,
+                json.dumps(op.payload, sort_keys=True),
+            )
+            if key in done:
+                op.status = NatsNscStatus.COMPLETE
+                op.last_error = ""
+                op.save(update_fields=["status", "last_error", "updated_at"])
+                continue
+            if not self.run_operation(op, compensate=True):
+                # keep per-account order, the worker picks up the rest after op
+                NatsNscOperation.objects.filter(
+                    id__in=[later.id for later in ops[i + 1 :]]
+                ).update(status=NatsNscStatus.PENDING, updated_at=timezone.now())
+                return
+            done.add(key)
+
+    def run_committed(self, op_ids: List[int]) -> int:
+        """
+        Applies operations just committed in ON_COMMIT provisioning mode, returning the number of operations claimed
+        Operations run in order per account, and in parallel across accounts on nsc_executor. Failed operations stay in the outbox, retried by `manage.py nsc_worker`.
+        """
+        from django_nats_nkeys.executor import nsc_executor
+
+        ops = self.claim_ids(op_ids)
+        by_account: Dict[str, List[NatsNscOperation]] = {}
+        for op in ops:
+            by_account.setdefault(op.account_name, []).append(op)
+        futures = [
+            nsc_executor.submit(self._run_account, account_ops)
+            for account_ops in by_account.values()
+        ]
+        for future in futures:
+            future.result()
+        return len(ops)
+
+    def drain_once(self) -> int:
+        """
+        Claims and applies one batch of operations, returning the number of operations claimed
+        """
+        from django_nats_nkeys.executor import nsc_executor
+
+        ops = self.claim()
+        # compensated like ON_COMMIT, so a retry after a partial add doesn't conflict in STRICT retry mode
+        futures = [
+            nsc_executor.submit(self.run_operation, op, compensate=True) for op in ops
+        ]
+        for future in futures:
+            future.result()
+        return len(ops)
+
+    def run(self, sleep: float = 1.0, once=False) -> None:
+        self.requeue_stale()
+        while True:
+            count = self.drain_once()
+            if count == 0:
+                if once:
+                    return
+                time.sleep(sleep)
@@ -0,0 +1,141 @@
+from functools import lru_cache
+from types import SimpleNamespace
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from django_nats_nkeys.subjects import SubjectTrie
+
+PUB = "pub"
+SUB = "sub"
+
+PERMISSION_FIELDS = (
+    "allow_pub",
+    "allow_pubsub",
+    "allow_sub",
+    "deny_pub",
+    "deny_pubsub",
+    "deny_sub",
+)
+
+# values of PERMISSION_FIELDS, in order
+PermissionsKey = Tuple[Optional[str], ...]
+
+
+def _split(value: Optional[str]) -> Set[str]:
+    if not value:
+        return set()
+    return {subject.strip() for subject in value.split(",") if subject.strip()}
+
+
+def app_permissions(obj) -> Dict[str, Set[str]]:
+    """
+    Subjects obj's --allow-*/--deny-* permissions add to its user JWT, keyed by "pub.allow", "pub.deny", "sub.allow", "sub.deny"
+    """
+    allow_pubsub = _split(getattr(obj, "allow_pubsub", None))
+    deny_pubsub = _split(getattr(obj, "deny_pubsub", None))
+    return {
+        "pub.allow": _split(getattr(obj, "allow_pub", None)) | allow_pubsub,
+        "pub.deny": _split(getattr(obj, "deny_pub", None)) | deny_pubsub,
+        "sub.allow": _split(getattr(obj, "allow_sub", None)) | allow_pubsub,
+        "sub.deny": _split(getattr(obj, "deny_sub", None)) | deny_pubsub,
+    }
+
+
+def permissions_key(obj) -> PermissionsKey:
+    return tuple(getattr(obj, name, None) for name in PERMISSION_FIELDS)
+
+
+def _trie(subjects: Iterable[str]) -> SubjectTrie:
+    trie = SubjectTrie()
+    for subject in subjects:
+        trie.insert(subject, subject)
+    return trie
+
+
+class NatsPermissions:
+    """
+    An app's publish/subscribe permissions, compiled into one SubjectTrie per direction and kind
+
+    Follows the NATS server: a direction without allow subjects allows everything, otherwise a subject must be covered by an allow subject, and a subject covered by a deny subject is denied even if allowed.
+    A wildcard subscription only partially covered by a deny subject is allowed, the server drops the denied messages on delivery.
+    """
+
+    def __init__(self, permissions: Dict[str, Set[str]]):
+        self.permissions = permissions
+        self._allow = {
+            direction: (
+                _trie(permissions[f"{direction}.allow"])
+                if permissions[f"{direction}.allow"]
+                else None
+            )
+            for direction in (PUB, SUB)
+        }
+        self._deny = {
+            direction: _trie(permissions[f"{direction}.deny"])
+            for direction in (PUB, SUB)
+        }
+
+    def allowed(self, direction: str, subject: str) -> bool:
+        allow = self._allow[direction]
+        if allow is not None and not allow.match(subject):
+            return False
+        return not self._deny[direction].match(subject)
+
+    def can_publish(self, subject: str) -> bool:
+        return self.allowed(PUB, subject)
+
+    def can_subscribe(self, subject: str) -> bool:
+        return self.allowed(SUB, subject)
+
+
+@lru_cache(maxsize=4096)
+def _compile(key: PermissionsKey) -> NatsPermissions:
+    return NatsPermissions(
+        app_permissions(SimpleNamespace(**dict(zip(PERMISSION_FIELDS, key))))
+    )
+
+
+def compile_permissions(obj) -> NatsPermissions:
+    """
+    Returns obj's compiled permissions, shared between apps with identical permission fields
+    """
+    return _compile(permissions_key(obj))
+
+
+class NatsPermissionsIndex:
+    """
+    Evaluates one subject against the permissions of many apps at once
+
+    Every allow/deny subject of every app goes into one SubjectTrie per direction and kind, mapping it to the apps granting/denying it, so a lookup costs one trie walk per direction instead of one per app.
+    """
+
+    def __init__(self, apps: Iterable[Any]):
+        self.apps: List[Any] = list(apps)
+        self._allow = {PUB: SubjectTrie(), SUB: SubjectTrie()}
+        self._deny = {PUB: SubjectTrie(), SUB: SubjectTrie()}
+        # apps without allow subjects, allowed anything not denied
+        self._allow_all: Dict[str, Set[int]] = {PUB: set(), SUB: set()}
+        for i, app in enumerate(self.apps):
+            permissions = compile_permissions(app).permissions
+            for direction in (PUB, SUB):
+                allow = permissions[f"{direction}.allow"]
+                if not allow:
+                    self._allow_all[direction].add(i)
+                for subject in allow:
+                    self._allow[direction].insert(subject, i)
+                for subject in permissions[f"{direction}.deny"]:
+                    self._deny[direction].insert(subject, i)
+
+    def allowed(self, direction: str, subject: str) -> List[Any]:
+        """
+        Apps allowed to publish (direction="pub") or subscribe (direction="sub") to subject, in the order they were given
+        """
+        allowed = (
+            self._allow_all[direction] | self._allow[direction].match(subject)
+        ) - self._deny[direction].match(subject)
+        return [self.apps[i] for i in sorted(allowed)]
+
+    def can_publish(self, subject: str) -> List[Any]:
+        return self.allowed(PUB, subject)
+
+    def can_subscribe(self, subject: str) -> List[Any]:
+        return self.allowed(SUB, subject)
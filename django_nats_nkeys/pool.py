@@ -0,0 +1,148 @@
+import logging
+from typing import Any, Dict, Optional, Tuple
+
+from django.db import transaction
+from organizations.utils import model_field_names
+
+from django_nats_nkeys.executor import nsc_executor
+from django_nats_nkeys.models import NatsPooledAccount
+from django_nats_nkeys.settings import nats_nkeys_settings
+
+logger = logging.getLogger(__name__)
+
+
+def _unique_account_name() -> str:
+    from coolname import generate_slug
+
+    org_model = nats_nkeys_settings.get_nats_account_model()
+    while True:
+        name = generate_slug(3)
+        if (
+            not org_model._base_manager.filter(name=name).exists()
+            and not NatsPooledAccount.objects.filter(name=name).exists()
+        ):
+            return name
+
+
+def nsc_pool_provision(name: str) -> NatsPooledAccount:
+    """
+    Adds account name with a signing key, JetStream limits (model defaults) and one user to the local nsc store
+    Returns an unsaved NatsPooledAccount, push the account before saving it
+    """
+    from django_nats_nkeys.services import (
+        nsc_add_account_local,
+        nsc_add_app_local,
+        nsc_describe_json,
+        nsc_jetstream_update_cmd,
+        run_nsc_and_log_output,
+    )
+
+    org_model = nats_nkeys_settings.get_nats_account_model()
+    org_user_model = nats_nkeys_settings.get_nats_user_model()
+    # unsaved instances, so account and user match what signup would provision
+    org = org_model(name=name, jetstream_enabled=True)
+    org_user = org_user_model(organization=org)
+    nsc_add_account_local(org)
+    run_nsc_and_log_output(nsc_jetstream_update_cmd(org))
+    nsc_add_app_local(org_user)
+    return NatsPooledAccount(
+        name=name,
+        app_name=org_user.app_name,
+        jetstream_enabled=True,
+        json=nsc_describe_json(name),
+        app_json=org_user.json,
+    )
+
+
+def _discard(name: str) -> None:
+    from django_nats_nkeys.services import nsc_delete_account
+    from django_nats_nkeys.store_index import store_index
+
+    if store_index.has_account(name):
+        try:
+            nsc_delete_account(name)
+        except Exception as e:
+            logger.error("Removing pooled account %s failed: %s", name, e)
+
+
+def nsc_pool_top_up(size: Optional[int] = None) -> int:
+    """
+    Provisions pooled accounts until NATS_NSC_ACCOUNT_POOL_SIZE (or size) are unclaimed, returning the number added
+
+    Accounts are added in parallel on nsc_executor and pushed before their rows are saved, so a claimed account is always known to the resolver. Accounts that failed to provision or push are removed from the local nsc store.
+    """
+    from django_nats_nkeys.services import nsc_push_accounts
+
+    if size is None:
+        size = nats_nkeys_settings.NATS_NSC_ACCOUNT_POOL_SIZE
+    missing = size - NatsPooledAccount.objects.count()
+    if missing <= 0:
+        return 0
+
+    names = [_unique_account_name() for _ in range(missing)]
+    futures = [(name, nsc_executor.submit(nsc_pool_provision, name)) for name in names]
+    pooled = []
+    for name, future in futures:
+        try:
+            pooled.append(future.result())
+        except Exception as e:
+            logger.error("Provisioning pooled account %s failed: %s", name, e)
+            _discard(name)
+    if not pooled:
+        return 0
+    push_failed = {
+        name for name, _ in nsc_push_accounts([entry.name for entry in pooled])
+    }
+    for entry in pooled:
+        if entry.name in push_failed:
+            logger.error("Pushing pooled account %s failed", entry.name)
+            _discard(entry.name)
+    pooled = [entry for entry in pooled if entry.name not in push_failed]
+    NatsPooledAccount.objects.bulk_create(pooled)
+    return len(pooled)
+
+
+def claim_pooled_account(
+    user, org_user_defaults: Optional[Dict[str, Any]] = None
+) -> Optional[Tuple[Any, Any, Any]]:
+    """
+    Turns the oldest unclaimed pooled account into user's organization, owner and organization user, returning them
+    Returns None if the pool is empty. Claiming only writes rows, no nsc command runs; concurrent claims never block each other (select_for_update(skip_locked=True)).
+    """
+    org_model = nats_nkeys_settings.get_nats_account_model()
+    org_user_model = nats_nkeys_settings.get_nats_user_model()
+    org_owner_model = nats_nkeys_settings.get_nats_organization_owner_model()
+
+    if org_user_defaults is None:
+        if "is_admin" in model_field_names(org_user_model):
+            org_user_defaults = {"is_admin": True}
+        else:
+            org_user_defaults = {}
+
+    with transaction.atomic():
+        entry = (
+            NatsPooledAccount.objects.select_for_update(skip_locked=True)
+            .order_by("pk")
+            .first()
+        )
+        if entry is None:
+            return None
+        # objects.create (not create_nsc), the account and user already exist
+        org = org_model.objects.create(
+            name=entry.name,
+            jetstream_enabled=entry.jetstream_enabled,
+            json=entry.json,
+        )
+        org_user = org_user_model.objects.create(
+            **org_user_defaults,
+            organization=org,
+            user=user,
+            app_name=entry.app_name,
+            json=entry.app_json,
+        )
+        org_owner = org_owner_model.objects.create(
+            organization=org, organization_user=org_user
+        )
+        entry.delete()
+    logger.info("Claimed pooled account %s for user=%s", org.name, user)
+    return (org, org_owner, org_user)
@@ -0,0 +1,163 @@
+import atexit
+import concurrent.futures.thread  # registers the pool's exit hook before ours, see below
+import logging
+import threading
+import time
+from concurrent.futures import Future
+from typing import Dict, Optional, Tuple
+
+from django_nats_nkeys.settings import nats_nkeys_settings
+
+logger = logging.getLogger(__name__)
+
+
+class PushScheduler:
+    """
+    Coalesces nsc push per account
+
+    The first push scheduled for an account opens a window of NATS_NSC_PUSH_DEBOUNCE seconds; every push scheduled for that account before the window closes shares one nsc push, issued when the window closes.
+    schedule() returns a Future resolved with the push result, so callers needing read-after-write can block on it (or call flush()).
+    A failed push fails its Future and marks the account pending again, retried with exponential backoff up to NATS_NSC_PUSH_MAX_ATTEMPTS, so fire-and-forget pushes aren't lost.
+    """
+
+    def __init__(self) -> None:
+        self._cond = threading.Condition()
+        self._pending: Dict[str, Tuple[float, Future]] = {}
+        # account -> consecutive failed pushes
+        self._attempts: Dict[str, int] = {}
+        self._thread: Optional[threading.Thread] = None
+        self._metrics = {
+            "requested": 0,
+            "issued": 0,
+            "coalesced": 0,
+            "failed": 0,
+            "retried": 0,
+        }
+
+    def _ensure_thread(self) -> None:
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(
+                target=self._loop, name="nsc-push-scheduler", daemon=True
+            )
+            self._thread.start()
+
+    def schedule(self, account: str, debounce: Optional[float] = None) -> Future:
+        if debounce is None:
+            debounce = nats_nkeys_settings.NATS_NSC_PUSH_DEBOUNCE
+        with self._cond:
+            self._metrics["requested"] += 1
+            if account in self._pending:
+                self._metrics["coalesced"] += 1
+                return self._pending[account][1]
+            future: Future = Future()
+            self._pending[account] = (time.monotonic() + debounce, future)
+            self._ensure_thread()
+            self._cond.notify()
+            return future
+
+    def _take_due(self, now: float) -> Dict[str, Future]:
+        due = {
+            account: future
+            for account, (deadline, future) in self._pending.items()
+            if deadline <= now
+        }
+        for account in due:
+            del self._pending[account]
+        return due
+
+    def _loop(self) -> None:
+        while True:
+            with self._cond:
+                while not self._pending:
+                    self._cond.wait()
+                now = time.monotonic()
+                due = self._take_due(now)
+                if not due:
+                    next_deadline = min(d for d, _ in self._pending.values())
+                    self._cond.wait(timeout=next_deadline - now)
+                    continue
+            self._dispatch(due)
+
+    def _dispatch(self, due: Dict[str, Future]) -> None:
+        from django_nats_nkeys.executor import nsc_executor
+
+        for account, future in due.items():
+            nsc_executor.submit(self._push, account, future)
+
+    def _push(self, account: str, future: Future) -> None:
+        from django_nats_nkeys.services import nsc_push_now
+
+        with self._cond:
+            self._metrics["issued"] += 1
+        try:
+            result = nsc_push_now(account=account)
+        except BaseException as e:
+            retry_in = self._retry(account)
+            if retry_in is None:
+                logger.exception(
+                    "Coalesced nsc push of account %s failed, giving up", account
+                )
+            else:
+                logger.exception(
+                    "Coalesced nsc push of account %s failed, retrying in %.1fs",
+                    account,
+                    retry_in,
+                )
+            future.set_exception(e)
+        else:
+            with self._cond:
+                self._attempts.pop(account, None)
+            future.set_result(result)
+
+    def _retry(self, account: str) -> Optional[float]:
+        """
+        Marks account pending again after a failed push, returning the delay, or None once NATS_NSC_PUSH_MAX_ATTEMPTS is reached
+        """
+        with self._cond:
+            self._metrics["failed"] += 1
+            attempts = self._attempts.get(account, 0) + 1
+            if attempts >= nats_nkeys_settings.NATS_NSC_PUSH_MAX_ATTEMPTS:
+                self._attempts.pop(account, None)
+                return None
+            self._attempts[account] = attempts
+            if account in self._pending:
+                # already scheduled again, that push picks up the failed changes
+                return max(self._pending[account][0] - time.monotonic(), 0.0)
+            delay = max(nats_nkeys_settings.NATS_NSC_PUSH_DEBOUNCE, 1.0) * 2 ** (
+                attempts - 1
+            )
+            self._metrics["retried"] += 1
+            self._pending[account] = (time.monotonic() + delay, Future())
+            self._ensure_thread()
+            self._cond.notify()
+            return delay
+
+    def flush(self, account: Optional[str] = None) -> None:
+        """
+        Issues pending pushes now (for one account, or all) and waits for them to finish
+        """
+        with self._cond:
+            if account is None:
+                due = dict((a, f) for a, (_, f) in self._pending.items())
+                self._pending.clear()
+            elif account in self._pending:
+                due = {account: self._pending.pop(account)[1]}
+            else:
+                due = {}
+        for acct, future in due.items():
+            self._push(acct, future)
+
+    def metrics(self) -> Dict[str, int]:
+        with self._cond:
+            return dict(self._metrics, pending=len(self._pending))
+
+    def reset_metrics(self) -> None:
+        with self._cond:
+            for key in self._metrics:
+                self._metrics[key] = 0
+
+
+push_scheduler = PushScheduler()
+# threading exit hooks run in reverse order of registration, so this flush runs before the one
+# registered by concurrent.futures.thread shuts down nsc_executor's pool (atexit hooks run after)
+getattr(threading, "_register_atexit", atexit.register)(push_scheduler.flush)
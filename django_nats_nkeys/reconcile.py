@@ -0,0 +1,609 @@
+import enum
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from django.db.models import F, Model, QuerySet
+
+from django_nats_nkeys import store
+from django_nats_nkeys.executor import nsc_executor
+from django_nats_nkeys.permissions import app_permissions
+from django_nats_nkeys.settings import nats_nkeys_settings
+from django_nats_nkeys.store_index import store_index
+
+logger = logging.getLogger(__name__)
+
+
+class NscReconcileOperation(enum.Enum):
+    ADD_ACCOUNT = "add account"
+    EDIT_ACCOUNT = "edit account"
+    ADD_USER = "add user"
+    EDIT_USER = "edit user"
+    ADD_EXPORT = "add export"
+    ADD_IMPORT = "add import"
+    DELETE_IMPORT = "delete import"
+    DELETE_USER = "delete user"
+    DELETE_EXPORT = "delete export"
+    DELETE_ACCOUNT = "delete account"
+
+
+# actions run phase by phase, in parallel within a phase
+# accounts must exist before their users and exports, and exports before the imports that reference them
+RECONCILE_PHASES = (
+    (NscReconcileOperation.ADD_ACCOUNT,),
+    (
+        NscReconcileOperation.EDIT_ACCOUNT,
+        NscReconcileOperation.ADD_USER,
+        NscReconcileOperation.EDIT_USER,
+        NscReconcileOperation.ADD_EXPORT,
+    ),
+    (NscReconcileOperation.ADD_IMPORT,),
+    (NscReconcileOperation.DELETE_IMPORT, NscReconcileOperation.DELETE_USER),
+    (NscReconcileOperation.DELETE_EXPORT,),
+    (NscReconcileOperation.DELETE_ACCOUNT,),
+)
+
+
+def nsc_version_bump(queryset: QuerySet) -> int:
+    """
+    Marks rows of queryset as changed since they were last reconciled
+    """
+    return queryset.update(nsc_version=F("nsc_version") + 1)
+
+
+@dataclass(init=True, repr=True)
+class NscReconcileAction:
+    operation: NscReconcileOperation
+    account_name: str
+    # user name, or export/import subject
+    name: Optional[str] = None
+    # nsc commands applying the action, run in order
+    cmds: List[List[str]] = field(default_factory=list)
+    # account or app whose json is refreshed once the action is applied
+    obj: Any = None
+    # ADD_IMPORT only
+    src_account_name: Optional[str] = None
+    msg_export: Any = None
+
+    def __str__(self) -> str:
+        target = self.account_name
+        if self.name is not None:
+            target = f"{target}/{self.name}"
+        if self.src_account_name is not None:
+            target = f"{target} from {self.src_account_name}"
+        return f"{self.operation.value} {target}"
+
+
+@dataclass(init=True, repr=True)
+class NscReconcilePlan:
+    actions: List[NscReconcileAction] = field(default_factory=list)
+    # (row, names of the accounts it was diffed against)
+    # rows are marked reconciled when none of their accounts failed
+    rows: List[Tuple[Model, Set[str]]] = field(default_factory=list)
+
+    def add(self, operation: NscReconcileOperation, account_name: str, **kwargs):
+        action = NscReconcileAction(
+            operation=operation, account_name=account_name, **kwargs
+        )
+        self.actions.append(action)
+        return action
+
+    def __str__(self) -> str:
+        return "\n".join(str(action) for action in self.actions)
+
+
+@dataclass(init=True, repr=True)
+class NscReconcileResult:
+    plan: NscReconcilePlan
+    applied: List[NscReconcileAction] = field(default_factory=list)
+    failed: List[Tuple[NscReconcileAction, Exception]] = field(default_factory=list)
+    pushed: List[str] = field(default_factory=list)
+    push_failed: List[Tuple[str, Exception]] = field(default_factory=list)
+    # rows marked reconciled
+    reconciled: int = 0
+    duration: float = 0.0
+
+    def ok(self) -> bool:
+        return not self.failed and not self.push_failed
+
+
+def claims_permissions(claims: Dict[str, Any]) -> Dict[str, Set[str]]:
+    """
+    Subjects in a user JWT's permissions, keyed like app_permissions()
+    """
+    nats = claims.get("nats", {})
+    permissions = {}
+    for direction in ("pub", "sub"):
+        for kind in ("allow", "deny"):
+            subjects = (nats.get(direction) or {}).get(kind) or []
+            permissions[f"{direction}.{kind}"] = set(subjects)
+    return permissions
+
+
+def nsc_edit_user_cmds(
+    account_name: str, obj, claims: Dict[str, Any]
+) -> List[List[str]]:
+    """
+    Returns `nsc edit user` commands bringing a user JWT (claims) in line with obj's permissions and bearer flag, or [] if it already is
+    """
+    from django_nats_nkeys.services import nsc_app_permissions_args
+
+    edit_user = [
+        "nsc",
+        "edit",
+        "user",
+        "--account",
+        account_name,
+        "--name",
+        obj.app_name,
+    ]
+    wanted = app_permissions(obj)
+    current = claims_permissions(claims)
+    extra = set().union(*(current[key] - wanted[key] for key in current))
+    missing = any(wanted[key] - current[key] for key in wanted)
+
+    cmds = []
+    if extra:
+        # --rm drops a subject from every list, so it runs before the permissions are re-added
+        cmds.append(edit_user + ["--rm", ",".join(sorted(extra))])
+    args = nsc_app_permissions_args(obj) if extra or missing else []
+    bearer = bool(claims.get("nats", {}).get("bearer_token", False))
+    if bool(obj.bearer) != bearer:
+        args.append("--bearer" if obj.bearer else "--bearer=false")
+    if args:
+        cmds.append(edit_user + args)
+    return cmds
+
+
+# nsc accepts both decimal and binary units (1M, 1MB, 1MiB)
+SIZE_UNITS = {"": 0, "K": 1, "M": 2, "G": 3, "T": 4}
+
+
+def size_values(value: str) -> Set[int]:
+    """
+    Byte values a JetStream size limit like "5M" may be stored as in an account JWT
+    """
+    value = value.strip().upper()
+    for suffix in ("IB", "B"):
+        if value.endswith(suffix):
+            value = value[: -len(suffix)]
+            break
+    unit = value[-1:] if value[-1:] in SIZE_UNITS else ""
+    number = float(value[: len(value) - len(unit)])
+    exponent = SIZE_UNITS[unit]
+    return {int(number * 1000**exponent), int(number * 1024**exponent)}
+
+
+def jetstream_matches(org, claims: Dict[str, Any]) -> bool:
+    """
+    True if an account JWT (claims) has org's JetStream limits
+    """
+    limits = claims.get("nats", {}).get("limits", {})
+    try:
+        mem = size_values(org.jetstream_max_mem)
+        disk = size_values(org.jetstream_max_file)
+    except ValueError:
+        # let nsc report the invalid limit
+        return False
+    return (
+        limits.get("mem_storage") in mem
+        and limits.get("disk_storage") in disk
+        and limits.get("streams") == org.jetstream_max_streams
+        and limits.get("consumer") == org.jetstream_max_consumers
+    )
+
+
+def _claims(account_name: str, user_name: Optional[str] = None) -> Dict[str, Any]:
+    try:
+        return store.describe_json(account_name, user_name=user_name)
+    except (OSError, ValueError) as e:
+        logger.warning(
+            "Could not read JWT for account=%s user=%s: %s", account_name, user_name, e
+        )
+        return {}
+
+
+def _account_field(model) -> str:
+    if any(f.name == "organization" for f in model._meta.get_fields()):
+        return "organization"
+    return "account"
+
+
+def reconcile_account_models() -> List[Model]:
+    return [
+        nats_nkeys_settings.get_nats_account_model(),
+        nats_nkeys_settings.get_nats_robot_account_model(),
+    ]
+
+
+def reconcile_app_models() -> List[Model]:
+    """
+    Models of NATS users: organization users and every model in get_nats_app_models()
+    """
+    models = [nats_nkeys_settings.get_nats_user_model()]
+    for model in nats_nkeys_settings.get_nats_app_models():
+        if model not in models:
+            models.append(model)
+    return models
+
+
+class NscReconciler:
+    """
+    Diffs organizations, robot accounts, their users/apps and message exports against the nsc store, and applies the difference
+
+    Every row carries nsc_version, bumped by signals whenever it (or its imports/exports) changes, and nsc_reconciled_version, the nsc_version last reconciled. Only rows where nsc_version > nsc_reconciled_version are diffed, unless full=True.
+    Accounts, users, exports and imports missing from the store are added, and users/JetStream limits that differ are edited. With prune=True, accounts, users, exports and imports that exist only in the store are deleted.
+    The plan is applied in parallel on nsc_executor, and every modified account is pushed once.
+    """
+
+    def __init__(self, full: bool = False, prune: bool = False) -> None:
+        self.full = full
+        self.prune = prune
+
+    def changed(self, model) -> QuerySet:
+        queryset = model._base_manager.all()
+        if not self.full:
+            queryset = queryset.filter(nsc_version__gt=F("nsc_reconciled_version"))
+        return queryset
+
+    def plan(self) -> NscReconcilePlan:
+        from django_nats_nkeys.models import NatsMessageExport
+
+        store_index.refresh(force=True)
+        plan = NscReconcilePlan()
+
+        # accounts exporting or importing a changed export are diffed too
+        export_accounts: Set[str] = set()
+        for msg_export in self.changed(NatsMessageExport).prefetch_related(
+            "nats_organization_exports",
+            "nats_organization_imports",
+            "nats_robot_exports",
+            "nats_robot_imports",
+        ):
+            names = {
+                account.name
+                for related in (
+                    msg_export.nats_organization_exports,
+                    msg_export.nats_organization_imports,
+                    msg_export.nats_robot_exports,
+                    msg_export.nats_robot_imports,
+                )
+                for account in related.all()
+            }
+            export_accounts |= names
+            plan.rows.append((msg_export, names))
+
+        accounts = {}
+        prefetch = (
+            "exports",
+            "imports__nats_organization_exports",
+            "imports__nats_robot_exports",
+        )
+        for model in reconcile_account_models():
+            for obj in self.changed(model).prefetch_related(*prefetch):
+                accounts[obj.name] = obj
+                plan.rows.append((obj, {obj.name}))
+            unchanged = export_accounts - set(accounts)
+            if unchanged:
+                for obj in model._base_manager.filter(
+                    name__in=unchanged
+                ).prefetch_related(*prefetch):
+                    accounts[obj.name] = obj
+                    plan.rows.append((obj, {obj.name}))
+        for obj in accounts.values():
+            self._plan_account(plan, obj)
+
+        for model in reconcile_app_models():
+            account_field = _account_field(model)
+            for obj in self.changed(model).select_related(account_field):
+                account_name = getattr(obj, account_field).name
+                self._plan_app(plan, account_name, obj)
+                plan.rows.append((obj, {account_name}))
+
+        if self.prune:
+            self._plan_prune_users(plan, list(accounts))
+            self._plan_prune_accounts(plan)
+        return plan
+
+    def _plan_account(self, plan: NscReconcilePlan, obj) -> None:
+        from django_nats_nkeys.services import (
+            nsc_add_export_cmd,
+            nsc_jetstream_update_cmd,
+        )
+
+        name = obj.name
+        if store_index.account(name) is None:
+            plan.add(NscReconcileOperation.ADD_ACCOUNT, name, obj=obj)
+            claims = {}
+        else:
+            claims = _claims(name)
+        nats = claims.get("nats", {})
+
+        if getattr(obj, "jetstream_enabled", False) and not jetstream_matches(
+            obj, claims
+        ):
+            plan.add(
+                NscReconcileOperation.EDIT_ACCOUNT,
+                name,
+                cmds=[nsc_jetstream_update_cmd(obj)],
+                obj=obj,
+            )
+
+        current_exports = {
+            export.get("subject") for export in nats.get("exports") or []
+        }
+        wanted_exports = set()
+        for msg_export in obj.exports.all():
+            wanted_exports.add(msg_export.subject_pattern)
+            if msg_export.subject_pattern not in current_exports:
+                plan.add(
+                    NscReconcileOperation.ADD_EXPORT,
+                    name,
+                    name=msg_export.subject_pattern,
+                    cmds=[nsc_add_export_cmd(name, msg_export)],
+                    obj=obj,
+                )
+
+        current_imports = {
+            (imported.get("account"), imported.get("subject"))
+            for imported in nats.get("imports") or []
+        }
+        wanted_imports = set()
+        for msg_export in obj.imports.all():
+            sources = list(msg_export.nats_organization_exports.all()) + list(
+                msg_export.nats_robot_exports.all()
+            )
+            for src in sources:
+                if src.name == name:
+                    continue
+                wanted_imports.add(msg_export.subject_pattern)
+                src_entry = store_index.account(src.name)
+                if (
+                    src_entry is None
+                    or (src_entry.public_key, msg_export.subject_pattern)
+                    not in current_imports
+                ):
+                    plan.add(
+                        NscReconcileOperation.ADD_IMPORT,
+                        name,
+                        name=msg_export.subject_pattern,
+                        obj=obj,
+                        src_account_name=src.name,
+                        msg_export=msg_export,
+                    )
+
+        if self.prune:
+            for subject in sorted(current_exports - wanted_exports):
+                plan.add(
+                    NscReconcileOperation.DELETE_EXPORT,
+                    name,
+                    name=subject,
+                    cmds=[
+                        [
+                            "nsc",
+                            "delete",
+                            "export",
+                            "--account",
+                            name,
+                            "--subject",
+                            subject,
+                        ]
+                    ],
+                    obj=obj,
+                )
+            for subject in sorted(
+                {subject for _, subject in current_imports} - wanted_imports
+            ):
+                plan.add(
+                    NscReconcileOperation.DELETE_IMPORT,
+                    name,
+                    name=subject,
+                    cmds=[
+                        [
+                            "nsc",
+                            "delete",
+                            "import",
+                            "--account",
+                            name,
+                            "--subject",
+                            subject,
+                        ]
+                    ],
+                    obj=obj,
+                )
+
+    def _plan_app(self, plan: NscReconcilePlan, account_name: str, obj) -> None:
+        from django_nats_nkeys.services import nsc_app_permissions_args
+
+        if store_index.user(account_name, obj.app_name) is None:
+            cmd = [
+                "nsc",
+                "add",
+                "user",
+                "--account",
+                account_name,
+                "--name",
+                obj.app_name,
+            ] + nsc_app_permissions_args(obj)
+            if obj.bearer:
+                cmd.append("--bearer")
+            plan.add(
+                NscReconcileOperation.ADD_USER,
+                account_name,
+                name=obj.app_name,
+                cmds=[cmd],
+                obj=obj,
+            )
+            return
+        cmds = nsc_edit_user_cmds(
+            account_name, obj, _claims(account_name, obj.app_name)
+        )
+        if cmds:
+            plan.add(
+                NscReconcileOperation.EDIT_USER,
+                account_name,
+                name=obj.app_name,
+                cmds=cmds,
+                obj=obj,
+            )
+
+    def _plan_prune_users(
+        self, plan: NscReconcilePlan, account_names: List[str]
+    ) -> None:
+        account_names = [name for name in account_names if store_index.account(name)]
+        if not account_names:
+            return
+        app_names: Set[Tuple[str, str]] = set()
+        for model in reconcile_app_models():
+            account_field = _account_field(model)
+            app_names.update(
+                model._base_manager.filter(
+                    **{f"{account_field}__name__in": account_names}
+                ).values_list(f"{account_field}__name", "app_name")
+            )
+        for account_name in account_names:
+            for user_name in store_index.user_names(account_name):
+                if (account_name, user_name) not in app_names:
+                    plan.add(
+                        NscReconcileOperation.DELETE_USER,
+                        account_name,
+                        name=user_name,
+                        cmds=[
+                            [
+                                "nsc",
+                                "delete",
+                                "user",
+                                "--account",
+                                account_name,
+                                "--name",
+                                user_name,
+                            ]
+                        ],
+                    )
+
+    def _plan_prune_accounts(self, plan: NscReconcilePlan) -> None:
+        from django_nats_nkeys.models import NatsPooledAccount
+
+        names = {nats_nkeys_settings.NATS_NSC_SYSTEM_ACCOUNT}
+        for model in reconcile_account_models() + [NatsPooledAccount]:
+            names.update(model._base_manager.values_list("name", flat=True))
+        for account_name in store_index.account_names():
+            if account_name not in names:
+                plan.add(NscReconcileOperation.DELETE_ACCOUNT, account_name)
+
+    def _apply_action(self, action: NscReconcileAction) -> None:
+        from django_nats_nkeys.creds_cache import creds_cache
+        from django_nats_nkeys.services import (
+            nsc_add_account_local,
+            nsc_add_import,
+            nsc_delete_account,
+            run_nsc_and_log_output,
+        )
+
+        if action.operation == NscReconcileOperation.ADD_ACCOUNT:
+            nsc_add_account_local(action.obj)
+        elif action.operation == NscReconcileOperation.ADD_IMPORT:
+            nsc_add_import(
+                action.src_account_name,
+                action.account_name,
+                action.msg_export.subject_pattern,
+                public=action.msg_export.public,
+            )
+        elif action.operation == NscReconcileOperation.DELETE_ACCOUNT:
+            nsc_delete_account(action.account_name)
+        else:
+            for cmd in action.cmds:
+                run_nsc_and_log_output(cmd)
+        if action.operation in (
+            NscReconcileOperation.ADD_USER,
+            NscReconcileOperation.EDIT_USER,
+            NscReconcileOperation.DELETE_USER,
+        ):
+            creds_cache.invalidate(action.account_name, action.name)
+
+    def _describe(self, obj) -> None:
+        from django_nats_nkeys.services import nsc_account_name, nsc_describe_json
+
+        account_name = nsc_account_name(obj)
+        try:
+            obj.json = nsc_describe_json(
+                account_name, app_name=getattr(obj, "app_name", None)
+            )
+        except Exception as e:
+            logger.warning("nsc describe failed for account=%s: %s", account_name, e)
+
+    def apply(self, plan: NscReconcilePlan) -> NscReconcileResult:
+        from django_nats_nkeys.services import nsc_push_accounts
+
+        start = time.monotonic()
+        result = NscReconcileResult(plan=plan)
+        failed_accounts: Set[str] = set()
+        for phase in RECONCILE_PHASES:
+            futures = [
+                (action, nsc_executor.submit(self._apply_action, action))
+                for action in plan.actions
+                if action.operation in phase
+                and action.account_name not in failed_accounts
+            ]
+            for action, future in futures:
+                try:
+                    future.result()
+                except Exception as e:
+                    logger.error("nsc reconcile failed to %s: %s", action, e)
+                    result.failed.append((action, e))
+                    failed_accounts.add(action.account_name)
+                else:
+                    result.applied.append(action)
+
+        # one push per modified account
+        deleted = {
+            action.account_name
+            for action in result.applied
+            if action.operation == NscReconcileOperation.DELETE_ACCOUNT
+        }
+        to_push = sorted({action.account_name for action in result.applied} - deleted)
+        # waits for coalesced pushes too (NATS_NSC_PUSH_DEBOUNCE), so their rows stay unreconciled if they fail
+        result.push_failed = nsc_push_accounts(to_push)
+        push_failed = {account_name for account_name, _ in result.push_failed}
+        failed_accounts |= push_failed
+        result.pushed = [name for name in to_push if name not in push_failed]
+
+        described = set()
+        for action in result.applied:
+            if action.obj is not None and id(action.obj) not in described:
+                described.add(id(action.obj))
+                self._describe(action.obj)
+
+        updates: Dict[Tuple[Model, Tuple[str, ...]], List[Model]] = {}
+        for obj, account_names in plan.rows:
+            if account_names & failed_accounts:
+                continue
+            obj.nsc_reconciled_version = obj.nsc_version
+            fields = ("nsc_reconciled_version",)
+            if id(obj) in described:
+                fields += ("json",)
+            updates.setdefault((type(obj), fields), []).append(obj)
+        for (model, fields), objs in updates.items():
+            # bulk_update doesn't send pre_save/post_save, so nsc_version is left alone
+            model._base_manager.bulk_update(objs, list(fields))
+            result.reconciled += len(objs)
+        result.duration = time.monotonic() - start
+        return result
+
+    def run(self) -> NscReconcileResult:
+        return self.apply(self.plan())
+
+
+def nsc_reconcile(
+    full: bool = False, prune: bool = False, dry_run: bool = False
+) -> NscReconcileResult:
+    """
+    Brings the nsc store in line with changed rows, see NscReconciler
+    With dry_run=True, the plan is returned in NscReconcileResult.plan without being applied
+    """
+    reconciler = NscReconciler(full=full, prune=prune)
+    plan = reconciler.plan()
+    if dry_run:
+        return NscReconcileResult(plan=plan)
+    return reconciler.apply(plan)
@@ -0,0 +1,166 @@
+import asyncio
+import atexit
+import base64
+import json
+import logging
+import threading
+from concurrent.futures import Future
+from typing import TYPE_CHECKING, Any, Dict, List, Optional
+
+from django_nats_nkeys import store
+from django_nats_nkeys.errors import NatsResolverError
+from django_nats_nkeys.executor import NscStoreLock
+from django_nats_nkeys.jwt import decode_jwt, keypair_from_seed
+from django_nats_nkeys.settings import nats_nkeys_settings
+
+if TYPE_CHECKING:
+    import nats.aio.client
+
+logger = logging.getLogger(__name__)
+
+# full nats-based resolver
+# ref: https://docs.nats.io/running-a-nats-service/configuration/securing_nats/auth_intro/jwt/resolver#nats-based-resolver
+CLAIMS_UPDATE_SUBJECT = "$SYS.REQ.CLAIMS.UPDATE"
+
+
+def parse_claims_update_reply(account: str, data: bytes) -> Dict[str, Any]:
+    """
+    Parses the server's reply to a claims update
+
+    {"server": {...}, "data": {"account": "<pubkey>", "code": 200, "message": "jwt updated"}}
+    {"server": {...}, "error": {"account": "<pubkey>", "code": 500, "description": "..."}}
+    """
+    try:
+        reply = json.loads(data)
+    except ValueError:
+        raise NatsResolverError(account, 0, f"Invalid resolver reply: {data!r}")
+    if "error" in reply:
+        error = reply["error"]
+        raise NatsResolverError(
+            account, error.get("code", 0), error.get("description", "")
+        )
+    ack = reply.get("data", {})
+    if ack.get("code") != 200:
+        raise NatsResolverError(account, ack.get("code", 0), ack.get("message", ""))
+    return ack
+
+
+class NatsResolverPusher:
+    """
+    Publishes account JWTs to the account resolver over a long-lived connection
+
+    Equivalent to `nsc push`, without a process and connection handshake per push. The connection authenticates as NATS_NSC_SYSTEM_USER of NATS_NSC_SYSTEM_ACCOUNT (created by `nsc add operator --sys`) and is owned by an event loop on a daemon thread, so sync and async callers share it. A dropped connection is re-established on the next push.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._nc: Optional["nats.aio.client.Client"] = None
+        self._connect_lock: Optional[asyncio.Lock] = None
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                threading.Thread(
+                    target=self._loop.run_forever,
+                    name="nats-resolver-push",
+                    daemon=True,
+                ).start()
+            return self._loop
+
+    def _system_credentials(self):
+        account = nats_nkeys_settings.NATS_NSC_SYSTEM_ACCOUNT
+        jwt = store.read_user_jwt(account, nats_nkeys_settings.NATS_NSC_SYSTEM_USER)
+        _, claims, _ = decode_jwt(jwt)
+        return jwt, keypair_from_seed(store.read_seed(claims["sub"]))
+
+    async def connection(self) -> "nats.aio.client.Client":
+        # imported on first push, nats-py is slow to import and unused by most processes
+        import nats
+
+        if self._connect_lock is None:
+            self._connect_lock = asyncio.Lock()
+        async with self._connect_lock:
+            if self._nc is None or self._nc.is_closed:
+                jwt, kp = self._system_credentials()
+                self._nc = await nats.connect(
+                    nats_nkeys_settings.NATS_SERVER_URI,
+                    name="django-nats-nkeys",
+                    user_jwt_cb=lambda: jwt.encode(),
+                    signature_cb=lambda nonce: base64.b64encode(
+                        kp.sign(nonce.encode())
+                    ),
+                )
+            return self._nc
+
+    def read_account_jwts(self, account: Optional[str] = None) -> Dict[str, str]:
+        """
+        Reads account JWT(s) from the nsc store; account=None reads every account, like `nsc push --all`
+        """
+        accounts = store.account_names() if account is None else [account]
+        jwts = {}
+        for name in accounts:
+            with NscStoreLock(name, shared=True):
+                jwts[name] = store.read_account_jwt(name)
+        return jwts
+
+    async def _publish(self, account: str, jwt: str) -> Dict[str, Any]:
+        import nats.errors
+
+        nc = await self.connection()
+        try:
+            msg = await nc.request(
+                CLAIMS_UPDATE_SUBJECT,
+                jwt.encode(),
+                timeout=nats_nkeys_settings.NATS_NSC_PUSH_TIMEOUT,
+            )
+        except (nats.errors.TimeoutError, nats.errors.NoRespondersError) as e:
+            raise NatsResolverError(
+                account, 0, f"No acknowledgement from resolver: {e!r}"
+            ) from e
+        ack = parse_claims_update_reply(account, msg.data)
+        logger.debug("Pushed account %s: %s", account, ack.get("message"))
+        return ack
+
+    async def _publish_all(self, jwts: Dict[str, str]) -> List[Dict[str, Any]]:
+        return list(
+            await asyncio.gather(
+                *[self._publish(account, jwt) for account, jwt in jwts.items()]
+            )
+        )
+
+    def submit(self, account: Optional[str] = None) -> Future:
+        jwts = self.read_account_jwts(account)
+        return asyncio.run_coroutine_threadsafe(self._publish_all(jwts), self.loop)
+
+    def push(self, account: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Pushes account JWT(s) and returns the resolver's acknowledgements
+        Raises NatsResolverError if the resolver rejects a JWT
+        """
+        return self.submit(account).result()
+
+    async def apush(self, account: Optional[str] = None) -> List[Dict[str, Any]]:
+        jwts = await asyncio.get_running_loop().run_in_executor(
+            None, self.read_account_jwts, account
+        )
+        return await asyncio.wrap_future(
+            asyncio.run_coroutine_threadsafe(self._publish_all(jwts), self.loop)
+        )
+
+    async def _close(self) -> None:
+        if self._nc is not None and not self._nc.is_closed:
+            await self._nc.close()
+        self._nc = None
+
+    def close(self) -> None:
+        with self._lock:
+            loop = self._loop
+        if loop is not None:
+            asyncio.run_coroutine_threadsafe(self._close(), loop).result()
+
+
+resolver_pusher = NatsResolverPusher()
+atexit.register(resolver_pusher.close)
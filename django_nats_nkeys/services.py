@@ -1,96 +1,197 @@
+from __future__ import annotations
+
 import subprocess
-import tempfile
-from typing import List, Optional, Union, Tuple, Dict, Any
+from contextlib import contextmanager, nullcontext
+from dataclasses import dataclass
+from contextvars import ContextVar
+from typing import List, Optional, Union, Tuple, Dict, Any, Iterator
 import logging
 import json
 import os
 from organizations.utils import model_field_names
 from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import prefetch_related_objects
 from django_nats_nkeys.errors import (
     NscConflict,
     NscError,
     NscStreamExportConflict,
 )
-from django_nats_nkeys.settings import NatsNscRetryMode, nats_nkeys_settings
-from coolname import generate_slug
+from django_nats_nkeys import store
+from django_nats_nkeys.activation_cache import activation_cache, token_file
+from django_nats_nkeys.creds import creds_engine
+from django_nats_nkeys.creds_cache import NatsCreds, creds_cache
+from django_nats_nkeys.describe_cache import describe_cache
+from django_nats_nkeys.executor import (
+    nsc_cmd_account,
+    nsc_cmd_readonly,
+    nsc_cmd_user,
+    nsc_executor,
+)
+from django_nats_nkeys.models import NatsNscStatus
+from django_nats_nkeys.outbox import nsc_deferred
+from django_nats_nkeys.push import push_scheduler
+from django_nats_nkeys.resolver import resolver_pusher
+from django_nats_nkeys.store_index import store_index
+from django_nats_nkeys.subjects import export_index
+from django_nats_nkeys.settings import (
+    NatsNscPushBackend,
+    NatsNscRetryMode,
+    nats_nkeys_settings,
+)
 
 logger = logging.getLogger(__name__)
 
-User = get_user_model()
-NatsOrganization = nats_nkeys_settings.get_nats_account_model()
-NatsOrganizationUser = nats_nkeys_settings.get_nats_user_model()
-NatsOrganizationOwner = nats_nkeys_settings.get_nats_organization_owner_model()
-NatsOrganizationApp = nats_nkeys_settings.get_nats_organization_app_model()
-NatsRobotAccountModel = nats_nkeys_settings.get_nats_robot_account_model()
-NatsRobotAppModel = nats_nkeys_settings.get_nats_robot_app_model()
+# swappable models are resolved on first use instead of at import time, module attributes are kept for existing imports (see __getattr__)
+MODEL_GETTERS = {
+    "User": get_user_model,
+    "NatsOrganization": nats_nkeys_settings.get_nats_account_model,
+    "NatsOrganizationUser": nats_nkeys_settings.get_nats_user_model,
+    "NatsOrganizationOwner": nats_nkeys_settings.get_nats_organization_owner_model,
+    "NatsOrganizationApp": nats_nkeys_settings.get_nats_organization_app_model,
+    "NatsRobotAccountModel": nats_nkeys_settings.get_nats_robot_account_model,
+    "NatsRobotAppModel": nats_nkeys_settings.get_nats_robot_app_model,
+}
 
 
-def create_org_owner_units_for_authenticated_user(
+def __getattr__(name: str) -> Any:
+    if name in MODEL_GETTERS:
+        return MODEL_GETTERS[name]()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def _create_org_owner_units(
     user: User,
-) -> Tuple[NatsOrganization, NatsOrganizationOwner, NatsOrganizationUser]:
-    org_name = generate_slug(3)
+) -> Tuple[Tuple[NatsOrganization, NatsOrganizationOwner, NatsOrganizationUser], bool]:
+    """
+    Claims a pooled account or creates a new organization, owner and organization user for user
+    Returns (units, pending), pending is True if the rows were created without their nsc account and user (SYNC provisioning mode), add them with nsc_provision_organization() once the rows commit
+    """
+    if nats_nkeys_settings.NATS_NSC_ACCOUNT_POOL_SIZE > 0:
+        from django_nats_nkeys.pool import claim_pooled_account
+
+        units = claim_pooled_account(user)
+        if units is not None:
+            return (units, False)
+        logger.warning("nsc account pool is empty, creating account for user=%s", user)
+    from coolname import generate_slug
+
+    # deferred modes queue the nsc operations with the rows, otherwise nsc runs after commit
+    pending = not nsc_deferred()
     org = create_organization(
         user,
-        org_name,
+        generate_slug(3),
         org_user_defaults={"is_admin": True},
         org_defaults={"jetstream_enabled": True},
+        provision=not pending,
     )
     logger.info("Created organization %s", org)
-    org_user = NatsOrganizationUser.objects.get(user=user)
-    org_owner = NatsOrganizationOwner.objects.get(organization=org)
-    return (org, org_owner, org_user)
+    org_user = nats_nkeys_settings.get_nats_user_model().objects.get(user=user)
+    org_owner = nats_nkeys_settings.get_nats_organization_owner_model().objects.get(
+        organization=org
+    )
+    return ((org, org_owner, org_user), pending)
 
 
-def get_or_create_org_owner_units_for_authenticated_user(
+def create_org_owner_units_for_authenticated_user(
     user: User,
-) -> Tuple[bool, Tuple[NatsOrganization, NatsOrganizationOwner, NatsOrganizationUser]]:
+) -> Tuple[NatsOrganization, NatsOrganizationOwner, NatsOrganizationUser]:
     """
-    Given an authenticated user, User model determined by django.contrib.auth.get_user_model()
-    Gets or creates the following model instances:
-    Org model - configured via NATS_ORGANIZATION_MODEL (default: NatsOrganization)
-    Org owner model - configured via NATS_ORGANIZATION_OWNER_MODEL (default: NatsOrganizationOwner)
-    Org user model - configured via NATS_ORGANIZATION_USER_MODEL (default: NatsOrganizationUser)
+    In SYNC provisioning mode, the nsc account and user are added once the rows commit (transaction.on_commit), so locks held by the caller's transaction aren't held across nsc and the resolver push
     """
-    # is this user part of any organizations?
-    organization_users = NatsOrganizationUser.objects.filter(user=user).all()
-    org_user_model_str = nats_nkeys_settings.get_nats_user_model_string()
-    org_owner_model_str = nats_nkeys_settings.get_nats_organization_owner_model_string()
-    org_model_str = nats_nkeys_settings.get_nats_account_model_string()
+    units, pending = _create_org_owner_units(user)
+    if pending:
+        org, _, org_user = units
+        transaction.on_commit(lambda: nsc_provision_organization(org, org_user))
+    return units
 
-    logger.info(
-        "Found %s %s instances for user=%s",
-        organization_users.count(),
-        org_user_model_str,
-        user,
-    )
-    if organization_users.count() == 0:
-        logger.info(
-            "Creating new %s, %s, %s for user=%s",
-            org_model_str,
-            org_owner_model_str,
-            org_user_model_str,
-            user,
-        )
-        return (True, create_org_owner_units_for_authenticated_user(user))
 
-    first_org_user = organization_users.first()
-    if organization_users.count() > 1:
+def get_org_owner_units(
+    user: User,
+) -> Optional[Tuple[NatsOrganization, NatsOrganizationOwner, NatsOrganizationUser]]:
+    """
+    Returns user's (organization, owner, organization user), or None if user isn't part of any organization
+    Resolved in one query, joining organization and owner
+    """
+    org_users = list(
+        nats_nkeys_settings.get_nats_user_model()
+        .objects.filter(user=user)
+        .select_related("organization", "organization__owner")
+        .order_by("pk")[:2]
+    )
+    if not org_users:
+        return None
+    first_org_user = org_users[0]
+    if len(org_users) > 1:
         # we'll need to extend this pattern to support a user that belongs to multiple organizations, but let's cross that bridge (and get paid a toll) only when we need this
         logger.warning(
             "More than 1 %s instance found for user %s. django_nats_nkeys does not fully support a multi-organization model. Returning first org user found: %s",
-            org_user_model_str,
+            nats_nkeys_settings.get_nats_user_model_string(),
+            user,
             first_org_user,
         )
     return (
-        False,
-        (
-            first_org_user.organization,
-            first_org_user.organization.owner,
-            first_org_user,
-        ),
+        first_org_user.organization,
+        first_org_user.organization.owner,
+        first_org_user,
     )
 
 
+def _get_or_create_org_owner_units_locked(
+    user: User,
+) -> Tuple[
+    bool, Tuple[NatsOrganization, NatsOrganizationOwner, NatsOrganizationUser], bool
+]:
+    """
+    Returns (created, units, pending), see _create_org_owner_units()
+    Locks user's row with select_for_update, so concurrent first logins create one organization. The lock is released when the rows commit, before any nsc command runs.
+    """
+    with transaction.atomic():
+        get_user_model().objects.select_for_update().filter(pk=user.pk).first()
+        # another request may have created the units while we waited for the lock
+        units = get_org_owner_units(user)
+        if units is not None:
+            return (False, units, False)
+        logger.info(
+            "Creating new %s, %s, %s for user=%s",
+            nats_nkeys_settings.get_nats_account_model_string(),
+            nats_nkeys_settings.get_nats_organization_owner_model_string(),
+            nats_nkeys_settings.get_nats_user_model_string(),
+            user,
+        )
+        units, pending = _create_org_owner_units(user)
+        return (True, units, pending)
+
+
+def get_or_create_org_owner_units_for_authenticated_user(
+    user: User, refresh: bool = False
+) -> Tuple[bool, Tuple[NatsOrganization, NatsOrganizationOwner, NatsOrganizationUser]]:
+    """
+    Given an authenticated user, User model determined by django.contrib.auth.get_user_model()
+    Gets or creates the following model instances:
+    Org model - configured via NATS_ORGANIZATION_MODEL (default: NatsOrganization)
+    Org owner model - configured via NATS_ORGANIZATION_OWNER_MODEL (default: NatsOrganizationOwner)
+    Org user model - configured via NATS_ORGANIZATION_USER_MODEL (default: NatsOrganizationUser)
+
+    Existing units are resolved in one query and memoized on user (i.e. per request, for request.user), pass refresh=True to query them again.
+    First-time creation locks user's row with select_for_update, so concurrent first logins create one organization. The lock only covers the row writes, nsc runs after they commit.
+    """
+    units = None if refresh else getattr(user, "_nats_org_owner_units", None)
+    if units is not None:
+        return (False, units)
+
+    created = False
+    units = get_org_owner_units(user)
+    if units is None:
+        created, units, pending = _get_or_create_org_owner_units_locked(user)
+        if pending:
+            org, _, org_user = units
+            # runs now, unless the caller's transaction is still open
+            transaction.on_commit(lambda: nsc_provision_organization(org, org_user))
+    user._nats_org_owner_units = units
+    return (created, units)
+
+
 def create_organization(
     user: User,
     name,
@@ -98,9 +199,11 @@ def create_organization(
     is_active=None,
     org_defaults=None,
     org_user_defaults=None,
+    provision=True,
 ):
     """
     Extends organizations.utils.create_organization to call create_nsc method
+    With provision=False, only the rows are created (nsc_status pending), add the nsc account and user with nsc_provision_organization()
     """
     org_model = nats_nkeys_settings.get_nats_account_model()
 
@@ -121,17 +224,66 @@ def create_organization(
         org_defaults.update({"is_active": is_active})
 
     org_defaults.update({"name": name})
-    organization = org_model.objects.create_nsc(**org_defaults)
-
-    org_user_defaults.update({"organization": organization, "user": user})
-    new_user = org_user_model.objects.create_nsc(**org_user_defaults)
 
-    org_owner_model.objects.create(
-        organization=organization, organization_user=new_user
-    )
+    if not provision:
+        with transaction.atomic():
+            organization = org_model.objects.create(
+                **org_defaults, nsc_status=NatsNscStatus.PENDING
+            )
+            new_user = org_user_model.objects.create(
+                **org_user_defaults,
+                organization=organization,
+                user=user,
+                nsc_status=NatsNscStatus.PENDING,
+            )
+            org_owner_model.objects.create(
+                organization=organization, organization_user=new_user
+            )
+        return organization
+
+    # queued nsc operations commit (and, in ON_COMMIT mode, run) together with all three rows
+    with transaction.atomic() if nsc_deferred() else nullcontext():
+        organization = org_model.objects.create_nsc(**org_defaults)
+
+        org_user_defaults.update({"organization": organization, "user": user})
+        new_user = org_user_model.objects.create_nsc(**org_user_defaults)
+
+        org_owner_model.objects.create(
+            organization=organization, organization_user=new_user
+        )
     return organization
 
 
+def nsc_provision_organization(
+    org: NatsOrganization, org_user: NatsOrganizationUser
+) -> None:
+    """
+    Adds the nsc account and user of rows created with create_organization(provision=False), and marks them complete
+    If nsc fails, the rows are deleted (like a failed create_organization), so the next attempt starts over
+    """
+    try:
+        # the rows are deleted on failure, don't push an account nothing refers to
+        with nsc_batch(flush_on_error=False):
+            nsc_add_account(org)
+            if org.jetstream_enabled:
+                nsc_jetstream_update(org)
+        nsc_add_app(org.name, org_user.app_name, org_user)
+    except Exception:
+        logger.exception("Provisioning organization %s failed, deleting it", org)
+        org.delete()
+        raise
+    set_nsc_complete(org, org_user)
+
+
+def set_nsc_complete(*objs) -> None:
+    for obj in objs:
+        # queryset update() does not fire post_save, so signal handlers won't re-run
+        type(obj)._default_manager.filter(pk=obj.pk).update(
+            nsc_status=NatsNscStatus.COMPLETE
+        )
+        obj.nsc_status = NatsNscStatus.COMPLETE
+
+
 def nsc_bearer_auth_enable(app: NatsOrganizationApp):
     run_nsc_and_log_output(
         [
@@ -145,30 +297,33 @@ def nsc_bearer_auth_enable(app: NatsOrganizationApp):
             "--bearer",
         ]
     )
+    creds_cache.invalidate(app.organization.name, app.app_name)
     # push local changes to remote NATs resolver
     nsc_push(account=app.organization.name)
     # describe the account and update organization's json representation
     save_describe_json(app.organization.name, app, app_name=app.app_name)
 
 
+def nsc_jetstream_update_cmd(org: NatsOrganization) -> List[str]:
+    return [
+        "nsc",
+        "edit",
+        "account",
+        "--name",
+        org.name,
+        "--js-mem-storage",
+        org.jetstream_max_mem,
+        "--js-disk-storage",
+        org.jetstream_max_file,
+        "--js-streams",
+        str(org.jetstream_max_streams),
+        "--js-consumer",
+        str(org.jetstream_max_consumers),
+    ]
+
+
 def nsc_jetstream_update(org: NatsOrganization):
-    run_nsc_and_log_output(
-        [
-            "nsc",
-            "edit",
-            "account",
-            "--name",
-            org.name,
-            "--js-mem-storage",
-            org.jetstream_max_mem,
-            "--js-disk-storage",
-            org.jetstream_max_file,
-            "--js-streams",
-            str(org.jetstream_max_streams),
-            "--js-consumer",
-            str(org.jetstream_max_consumers),
-        ]
-    )
+    run_nsc_and_log_output(nsc_jetstream_update_cmd(org))
     # push local changes to remote NATs resolver
     nsc_push(account=org.name)
 
@@ -177,14 +332,9 @@ def nsc_jetstream_update(org: NatsOrganization):
 
 
 def nsc_add_account(
-    obj: Union[NatsOrganization, NatsRobotAccountModel]
+    obj: Union[NatsOrganization, NatsRobotAccountModel],
 ) -> Union[NatsOrganization, NatsRobotAccountModel]:
-    # try create nsc account
-    run_nsc_and_log_output(["nsc", "add", "account", "--name", obj.name])
-    # generate a signing key for account
-    run_nsc_and_log_output(
-        ["nsc", "edit", "account", "--name", obj.name, "--sk", "generate"]
-    )
+    nsc_add_account_local(obj)
     # push local changes to remote NATs resolver
     nsc_push(account=obj.name)
 
@@ -192,7 +342,20 @@ def nsc_add_account(
     return save_describe_json(obj.name, obj)
 
 
-def nsc_pull(account=None, force=False) -> subprocess.CompletedProcess:
+def nsc_add_account_local(obj: Union[NatsOrganization, NatsRobotAccountModel]) -> None:
+    """
+    Adds obj's account (with a signing key) to the local nsc store, without pushing it
+    """
+    # try create nsc account
+    if not nsc_skip_add(obj.name):
+        run_nsc_and_log_output(["nsc", "add", "account", "--name", obj.name])
+    # generate a signing key for account
+    run_nsc_and_log_output(
+        ["nsc", "edit", "account", "--name", obj.name, "--sk", "generate"]
+    )
+
+
+def nsc_pull_cmd(account=None, force=False) -> List[str]:
     cmd = ["nsc", "pull"]
     if account is None:
         cmd.append("--all")
@@ -202,36 +365,126 @@ def nsc_pull(account=None, force=False) -> subprocess.CompletedProcess:
 
     if force is True:
         cmd.append("--overwrite-newer")
-    result = run_nsc_and_log_output(cmd)
+    return cmd
+
+
+def nsc_pull(account=None, force=False) -> subprocess.CompletedProcess:
+    result = run_nsc_and_log_output(nsc_pull_cmd(account=account, force=force))
     return result
 
 
-def nsc_push(account=None, force=False) -> subprocess.CompletedProcess:
+class NscBatch:
+    """
+    Unit of work collected by nsc_batch()
+    Tracks accounts that need to be pushed and objects whose json needs to be refreshed from `nsc describe`
+    """
+
+    def __init__(self) -> None:
+        # account name -> force
+        self.accounts: Dict[str, bool] = {}
+        # (model label, pk) -> (account_name, obj, app_name)
+        self.describes: Dict[Tuple[str, Any], Tuple[str, Any, Optional[str]]] = {}
+
+    def push(self, account: str, force=False) -> None:
+        self.accounts[account] = self.accounts.get(account, False) or force
+
+    def describe(self, account_name: str, obj, app_name: Optional[str] = None) -> None:
+        self.describes[(obj._meta.label, obj.pk)] = (account_name, obj, app_name)
+
+    def flush(self) -> None:
+        accounts, self.accounts = self.accounts, {}
+        describes, self.describes = self.describes, {}
+        for account, force in accounts.items():
+            nsc_push(account=account, force=force)
+        for account_name, obj, app_name in describes.values():
+            save_describe_json(account_name, obj, app_name=app_name)
+
+
+_nsc_batch: ContextVar[Optional[NscBatch]] = ContextVar("nsc_batch", default=None)
+
+
+@contextmanager
+def nsc_batch(flush_on_error: bool = True) -> Iterator[NscBatch]:
+    """
+    Apply nsc edits locally and defer pushes/describes until the block exits
+    On exit, each touched account is pushed exactly once and each touched object's json is refreshed exactly once
+    Nested nsc_batch() blocks join the outermost batch
+
+    If the block raises, touched accounts are still pushed, since the local nsc store already has their edits. Pass flush_on_error=False when the caller removes a partially added account instead, so it never reaches the resolver.
+
+    with nsc_batch():
+        for org in queryset:
+            nsc_jetstream_update(org)
+    """
+    batch = _nsc_batch.get()
+    if batch is not None:
+        yield batch
+        return
+    batch = NscBatch()
+    token = _nsc_batch.set(batch)
+    try:
+        yield batch
+    except BaseException:
+        _nsc_batch.reset(token)
+        if flush_on_error:
+            batch.flush()
+        raise
+    _nsc_batch.reset(token)
+    batch.flush()
+
+
+def nsc_push(
+    account=None, force=False, wait=False
+) -> Optional[Union[subprocess.CompletedProcess, List[Dict[str, Any]]]]:
+    """
+    Push local account JWT(s) to the account resolver
+
+    Inside nsc_batch(), the push is deferred until the batch exits.
+    If NATS_NSC_PUSH_DEBOUNCE > 0, the push is coalesced with other pushes to the same account by push_scheduler, which retries it if it fails. Pass wait=True to block until the coalesced push completes (read-after-write), raising if it failed.
+    Returns None whenever the push is deferred (to the batch or push_scheduler)
+    """
+    batch = _nsc_batch.get()
+    if batch is not None and account is not None:
+        batch.push(account, force=force)
+        return None
+
+    if account is not None and nats_nkeys_settings.NATS_NSC_PUSH_DEBOUNCE > 0:
+        future = push_scheduler.schedule(account)
+        if wait is True:
+            return future.result()
+        return None
+    return nsc_push_now(account=account)
+
+
+def nsc_push_now(
+    account=None,
+) -> Union[subprocess.CompletedProcess, List[Dict[str, Any]]]:
+    """
+    Pushes immediately, bypassing nsc_batch() and push_scheduler
+
+    With NATS_NSC_PUSH_BACKEND = "NATS", returns the resolver's acknowledgements instead of the nsc process result
+    """
+    if nats_nkeys_settings.NATS_NSC_PUSH_BACKEND == NatsNscPushBackend.NATS:
+        return resolver_pusher.push(account=account)
+    cmd = nsc_push_cmd(account=account)
+    result = nsc_executor.run(cmd, account=account)
+    log_nsc_output(result)
+    result.check_returncode()
+    return result
+
+
+def nsc_push_cmd(account=None) -> List[str]:
     cmd = ["nsc", "push"]
     if account is None:
         cmd.append("--all")
     else:
         cmd.append("--account")
         cmd.append(account)
-    extra_args = [
-        "--keystore-dir",
-        nats_nkeys_settings.NATS_NSC_KEYSTORE_DIR,
-        "--config-dir",
-        nats_nkeys_settings.NATS_NSC_CONFIG_DIR,
-        "--data-dir",
-        nats_nkeys_settings.NATS_NSC_DATA_DIR,
+    extra_args = nsc_dir_args() + [
         "--account-jwt-server-url",
         nats_nkeys_settings.NATS_SERVER_URI,
     ]
-    cmd = cmd + extra_args
-    result = subprocess.run(cmd, capture_output=True, encoding="utf8")
-    if result.stdout:
-        logger.info(result.stdout)
-
-    if result.stderr:
-        logger.error(result.stderr)
-    result.check_returncode()
-    return result
+    return cmd + extra_args
 
 
 class NSCValidator:
@@ -243,12 +496,13 @@ class NSCValidator:
     def ok(self) -> bool:
         return self.result.returncode == 0
 
-    def run(self):
+    def cmd(self) -> List[str]:
         if self.account_name is None:
-            cmd = ["nsc", "validate", "--all-accounts"]
-        else:
-            cmd = ["nsc", "validate", "--account", self.account_name]
-        result = run_nsc_and_log_output(cmd, check=False)
+            return ["nsc", "validate", "--all-accounts"]
+        return ["nsc", "validate", "--account", self.account_name]
+
+    def run(self):
+        result = run_nsc_and_log_output(self.cmd(), check=False)
         self.result = result
 
 
@@ -259,14 +513,52 @@ def nsc_validate(account_name: Optional[str] = None) -> NSCValidator:
 
 
 def run_nsc_and_log_output(
-    cmd: List[str], stdout=True, stderr=True, check=True
+    cmd: List[str], stdout=True, stderr=True, check=True, pass_fds=()
 ) -> subprocess.CompletedProcess:
     if "nsc" not in cmd:
         raise ValueError(
             "run_nsc_and_log_output is a wrapper for nsc and not intended for general-purpose commands. Received command: %s",
             cmd,
         )
-    extra_args = [
+    modified_cmd = cmd + nsc_dir_args()
+    logger.info("Running cmd: %s", modified_cmd)
+    result = nsc_executor.run(
+        modified_cmd,
+        account=nsc_cmd_account(cmd),
+        user=nsc_cmd_user(cmd),
+        shared=nsc_cmd_readonly(cmd),
+        pass_fds=pass_fds,
+    )
+    store_index.nsc_command_ran(cmd)
+    log_nsc_output(result, stdout=stdout, stderr=stderr)
+
+    if check is True:
+        check_nsc_returncode(cmd, result)
+    return result
+
+
+def nsc_skip_add(account_name: str, user_name: Optional[str] = None) -> bool:
+    """
+    True if `nsc add account|user` would fail with "already exists" in NatsNscRetryMode.IDEMPOTENT, where the conflict is only logged
+    Checked against store_index, so the doomed nsc process is never started
+    """
+    if nats_nkeys_settings.NATS_NSC_RETRY_MODE != NatsNscRetryMode.IDEMPOTENT:
+        return False
+    if user_name is None:
+        exists = store_index.has_account(account_name)
+    else:
+        exists = store_index.has_user(account_name, user_name)
+    if exists:
+        logger.warning(
+            "Skipping nsc add, account=%s user=%s already exists",
+            account_name,
+            user_name,
+        )
+    return exists
+
+
+def nsc_dir_args() -> List[str]:
+    return [
         "--keystore-dir",
         nats_nkeys_settings.NATS_NSC_KEYSTORE_DIR,
         "--config-dir",
@@ -274,49 +566,53 @@ def run_nsc_and_log_output(
         "--data-dir",
         nats_nkeys_settings.NATS_NSC_DATA_DIR,
     ]
-    modified_cmd = cmd + extra_args
-    logger.info("Running cmd: %s", modified_cmd)
-    result = subprocess.run(modified_cmd, capture_output=True, encoding="utf8")
+
+
+def log_nsc_output(result: subprocess.CompletedProcess, stdout=True, stderr=True):
     if result.stdout and stdout:
         logger.info(result.stdout)
 
     if result.stderr and stderr:
         logger.error(result.stderr)
 
-    if check is True:
-        try:
-            result.check_returncode()
-        except subprocess.CalledProcessError as e:
-            # try to convert generic subprocess.CalledProcessError to NscError, or log warning if running in idempotent mode
-            if (
-                all(el in cmd for el in ["nsc", "add", "export"])
-                and "already exports" in result.stderr
-            ):
-                if nats_nkeys_settings.NATS_NSC_RETRY_MODE == NatsNscRetryMode.STRICT:
-                    raise NscStreamExportConflict("Export already exists", e)
-                else:
-                    logger.warning(
-                        "Command %s returned error code %s. Stream export %s already exists.",
-                        cmd,
-                        e.returncode,
-                        e.stderr,
-                    )
-            elif (
-                all(el in cmd for el in ["nsc", "add"])
-                and "already exists" in result.stderr
-            ):
-                if nats_nkeys_settings.NATS_NSC_RETRY_MODE == NatsNscRetryMode.STRICT:
-                    raise NscConflict("Account already exists", e)
-                else:
-                    logger.warning(
-                        "Command %s returned error code %s. Resource already exists. %s",
-                        cmd,
-                        e.returncode,
-                        e.stderr,
-                    )
+
+def check_nsc_returncode(cmd: List[str], result: subprocess.CompletedProcess):
+    """
+    Raises NscError (or subclass) if nsc exited with non-zero code
+    Conflicts are logged instead of raised in NatsNscRetryMode.IDEMPOTENT
+    """
+    try:
+        result.check_returncode()
+    except subprocess.CalledProcessError as e:
+        # try to convert generic subprocess.CalledProcessError to NscError, or log warning if running in idempotent mode
+        if (
+            all(el in cmd for el in ["nsc", "add", "export"])
+            and "already exports" in result.stderr
+        ):
+            if nats_nkeys_settings.NATS_NSC_RETRY_MODE == NatsNscRetryMode.STRICT:
+                raise NscStreamExportConflict("Export already exists", e)
             else:
-                raise NscError("nsc command exited with non-zero error code", e)
-    return result
+                logger.warning(
+                    "Command %s returned error code %s. Stream export %s already exists.",
+                    cmd,
+                    e.returncode,
+                    e.stderr,
+                )
+        elif (
+            all(el in cmd for el in ["nsc", "add"])
+            and "already exists" in result.stderr
+        ):
+            if nats_nkeys_settings.NATS_NSC_RETRY_MODE == NatsNscRetryMode.STRICT:
+                raise NscConflict("Account already exists", e)
+            else:
+                logger.warning(
+                    "Command %s returned error code %s. Resource already exists. %s",
+                    cmd,
+                    e.returncode,
+                    e.stderr,
+                )
+        else:
+            raise NscError("nsc command exited with non-zero error code", e)
 
 
 def nsc_export(dirname: str, force=False) -> subprocess.CompletedProcess:
@@ -386,20 +682,40 @@ def create_nats_sk_service(
             signing_key,
         ]
     )
-    # re-run describe to output public signing key fingerprint, public key, claims
-    result = run_nsc_and_log_output(
-        ["nsc", "describe", "account", account_name, "--json"]
-    )
-    describe_account = json.loads(result.stdout)
     # push to remote
-    nsc_push(account_name=account_name)
-    obj.json = describe_account
-    obj.save()
-    return obj
+    nsc_push(account=account_name)
+    # re-run describe to output public signing key fingerprint, public key, claims
+    return save_describe_json(account_name, obj)
 
 
 def nsc_describe_json(
     account_name: str, app_name: Optional[str] = None
+) -> Dict[Any, Any]:
+    return describe_cache.get_or_load(
+        account_name,
+        app_name,
+        lambda: _nsc_describe_json(account_name, app_name=app_name),
+    )
+
+
+def _nsc_describe_json(
+    account_name: str, app_name: Optional[str] = None
+) -> Dict[Any, Any]:
+    if nats_nkeys_settings.NATS_NSC_NATIVE_DESCRIBE:
+        try:
+            return store.describe_json(account_name, user_name=app_name)
+        except (OSError, ValueError) as e:
+            logger.warning(
+                "Native describe unavailable for account=%s app=%s, falling back to nsc: %s",
+                account_name,
+                app_name,
+                e,
+            )
+    return nsc_describe_json_subprocess(account_name, app_name=app_name)
+
+
+def nsc_describe_json_subprocess(
+    account_name: str, app_name: Optional[str] = None
 ) -> Dict[Any, Any]:
     if app_name is None:
         result = run_nsc_and_log_output(
@@ -427,8 +743,12 @@ def save_describe_json(
     obj: Union[NatsOrganization, NatsRobotAccountModel, NatsOrganizationUser],
     app_name: Optional[str] = None,
 ) -> Union[NatsOrganization, NatsRobotAccountModel]:
+    batch = _nsc_batch.get()
+    if batch is not None:
+        batch.describe(account_name, obj, app_name=app_name)
+        return obj
     obj.json = nsc_describe_json(account_name, app_name=app_name)
-    obj.save()
+    obj.save(update_fields=["json"])
     return obj
 
 
@@ -437,47 +757,187 @@ def nsc_add_app(
     app_name: str,
     obj: Union[NatsOrganizationApp, NatsRobotAppModel],
 ) -> Union[NatsOrganizationApp, NatsRobotAppModel]:
-    run_nsc_and_log_output(
-        [
-            "nsc",
-            "add",
-            "user",
-            "--account",
-            account_name,
-            "--name",
-            app_name,
-        ]
-    )
+    if not nsc_skip_add(account_name, user_name=app_name):
+        run_nsc_and_log_output(
+            [
+                "nsc",
+                "add",
+                "user",
+                "--account",
+                account_name,
+                "--name",
+                app_name,
+            ]
+        )
 
     # update app permissions (if needed)
-    base_cmd = ["nsc", "edit", "user", "--account", account_name, "--name", app_name]
-    cmd = base_cmd.copy()
+    cmd = nsc_app_permissions_cmd(account_name, app_name, obj)
+    if cmd is not None:
+        run_nsc_and_log_output(cmd)
+    creds_cache.invalidate(account_name, app_name)
+    return save_describe_json(account_name, obj, app_name=app_name)
+
+
+def nsc_app_permissions_args(
+    obj: Union[NatsOrganizationApp, NatsRobotAppModel],
+) -> List[str]:
+    """
+    Returns --allow-*/--deny-* flags for obj's permissions, accepted by both `nsc add user` and `nsc edit user`
+    """
+    args = []
     # --allow-pub
     if getattr(obj, "allow_pub", None) is not None:
-        cmd += ["--allow-pub", obj.allow_pub]
+        args += ["--allow-pub", obj.allow_pub]
     # --allow-pubsub
     if getattr(obj, "allow_pubsub", None) is not None:
-        cmd += ["--allow-pubsub", obj.allow_pubsub]
+        args += ["--allow-pubsub", obj.allow_pubsub]
     # --allow-sub
     if getattr(obj, "allow_sub", None) is not None:
-        cmd += ["--allow-sub", obj.allow_sub]
+        args += ["--allow-sub", obj.allow_sub]
     # --deny-pub
     if getattr(obj, "deny_pub", None) is not None:
-        cmd += ["--deny-pub", obj.deny_pub]
+        args += ["--deny-pub", obj.deny_pub]
     # --deny-pubsub
     if getattr(obj, "deny_pubsub", None) is not None:
-        cmd += ["--deny-pubsub", obj.deny_pubsub]
+        args += ["--deny-pubsub", obj.deny_pubsub]
     # --deny-sub
     if getattr(obj, "deny_sub", None) is not None:
-        cmd += ["--deny-sub", obj.deny_pubsub]
+        args += ["--deny-sub", obj.deny_sub]
+    return args
+
+
+def nsc_app_permissions_cmd(
+    account_name: str,
+    app_name: str,
+    obj: Union[NatsOrganizationApp, NatsRobotAppModel],
+) -> Optional[List[str]]:
+    """
+    Returns `nsc edit user` command to apply obj's permissions, or None if obj has no permissions set
+    """
+    args = nsc_app_permissions_args(obj)
+    # run edit command if obj has permissions set
+    if args:
+        return [
+            "nsc",
+            "edit",
+            "user",
+            "--account",
+            account_name,
+            "--name",
+            app_name,
+        ] + args
+    return None
+
+
+@dataclass(init=True, repr=True)
+class NscBulkResult:
+    succeeded: List[Any]
+    failed: List[Tuple[Any, Exception]]
+
+
+def nsc_add_app_local(obj: Union[NatsOrganizationApp, NatsRobotAppModel]):
+    """
+    Adds obj's user with its permissions to the local nsc store and sets obj.json, without saving obj
+    """
+    account_name = nsc_account_name(obj)
+    if nsc_skip_add(account_name, user_name=obj.app_name):
+        cmd = nsc_app_permissions_cmd(account_name, obj.app_name, obj)
+        if cmd is not None:
+            run_nsc_and_log_output(cmd)
+    else:
+        # permissions are applied by nsc add user, saving an nsc edit user per app
+        run_nsc_and_log_output(
+            [
+                "nsc",
+                "add",
+                "user",
+                "--account",
+                account_name,
+                "--name",
+                obj.app_name,
+            ]
+            + nsc_app_permissions_args(obj)
+        )
+    creds_cache.invalidate(account_name, obj.app_name)
+    obj.json = nsc_describe_json(account_name, app_name=obj.app_name)
+    return obj
 
-    # run edit command if base_cmd has been modified
-    if cmd != base_cmd:
-        run_nsc_and_log_output(cmd)
-    return save_describe_json(account_name, obj, app_name=app_name)
+
+def nsc_bulk_add_apps(
+    objs: List[Union[NatsOrganizationApp, NatsRobotAppModel]],
+    batch_size: Optional[int] = None,
+) -> NscBulkResult:
+    """
+    nsc_add_app() for many saved apps
+
+    nsc users are added in parallel on nsc_executor, json is saved with one bulk_update, and each account with a new user is pushed once with nsc_push_accounts().
+    A failure is recorded in NscBulkResult.failed (and the app's nsc_status set to failed) instead of aborting the other apps.
+    """
+    if objs:
+        # one query for the accounts, instead of one per app on the worker threads
+        account_field = (
+            "organization" if hasattr(type(objs[0]), "organization") else "account"
+        )
+        prefetch_related_objects(objs, account_field)
+    futures = [(obj, nsc_executor.submit(nsc_add_app_local, obj)) for obj in objs]
+    result = NscBulkResult(succeeded=[], failed=[])
+    for obj, future in futures:
+        try:
+            future.result()
+        except Exception as e:
+            logger.error("nsc add user failed for app=%s: %s", obj.app_name, e)
+            obj.nsc_status = NatsNscStatus.FAILED
+            result.failed.append((obj, e))
+        else:
+            obj.nsc_status = NatsNscStatus.COMPLETE
+            result.succeeded.append(obj)
+
+    if objs:
+        type(objs[0])._default_manager.bulk_update(
+            objs, ["json", "nsc_status"], batch_size=batch_size
+        )
+    by_account: Dict[str, List[Any]] = {}
+    for obj in result.succeeded:
+        by_account.setdefault(nsc_account_name(obj), []).append(obj)
+    for account_name, e in nsc_push_accounts(list(by_account)):
+        account_objs = by_account[account_name]
+        result.succeeded = [o for o in result.succeeded if o not in account_objs]
+        result.failed += [(o, e) for o in account_objs]
+    return result
 
 
 def nsc_generate_creds(account_name: str, app_name: str) -> str:
+    if nats_nkeys_settings.NATS_NSC_NATIVE_CREDS:
+        try:
+            return creds_engine.generate_creds(account_name, app_name)
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(
+                "Native creds unavailable for account=%s app=%s, falling back to nsc: %s",
+                account_name,
+                app_name,
+                e,
+            )
+    return nsc_generate_creds_subprocess(account_name, app_name)
+
+
+def nsc_generate_jwt(account_name: str, app_name: str) -> str:
+    """
+    Returns the user JWT of app_name, without reading its seed when NATS_NSC_NATIVE_CREDS is enabled
+    """
+    if nats_nkeys_settings.NATS_NSC_NATIVE_CREDS:
+        try:
+            return store.read_user_jwt(account_name, app_name)
+        except OSError as e:
+            logger.warning(
+                "Native JWT unavailable for account=%s app=%s, falling back to nsc: %s",
+                account_name,
+                app_name,
+                e,
+            )
+    return NatsCreds(nsc_generate_creds_subprocess(account_name, app_name)).jwt
+
+
+def nsc_generate_creds_subprocess(account_name: str, app_name: str) -> str:
     result = run_nsc_and_log_output(
         ["nsc", "generate", "creds", "--account", account_name, "--name", app_name],
         stdout=False,  # do not log sensitive credentials to attached stdout logger, just capture and store in memory
@@ -486,7 +946,60 @@ def nsc_generate_creds(account_name: str, app_name: str) -> str:
 
 
 def nsc_delete_account(account_name: str) -> subprocess.CompletedProcess:
-    return run_nsc_and_log_output(["nsc", "delete", "account", account_name])
+    result = run_nsc_and_log_output(["nsc", "delete", "account", account_name])
+    creds_cache.invalidate(account_name)
+    activation_cache.invalidate(account_name)
+    return result
+
+
+def nsc_delete_app(account_name: str, app_name: str) -> subprocess.CompletedProcess:
+    result = run_nsc_and_log_output(
+        ["nsc", "delete", "user", "--account", account_name, "--name", app_name]
+    )
+    creds_cache.invalidate(account_name, app_name)
+    return result
+
+
+def nsc_generate_activation_cmd(
+    src_account_name: str, dest_account_name: str, subject_pattern: str
+) -> List[str]:
+    return [
+        "nsc",
+        "generate",
+        "activation",
+        "--account",
+        src_account_name,
+        "--target-account",
+        dest_account_name,
+        "--subject",
+        subject_pattern,
+    ]
+
+
+def nsc_generate_activation(
+    src_account_name: str, dest_account_name: str, subject_pattern: str
+) -> str:
+    """
+    Mints a new activation token, see activation_cache for cached tokens
+    """
+    cmd = nsc_generate_activation_cmd(
+        src_account_name, dest_account_name, subject_pattern
+    )
+    # do not log sensitive token to stdout/stderr loggers
+    result = run_nsc_and_log_output(cmd, stdout=False, stderr=False)
+    return result.stdout
+
+
+def nsc_add_import_token_cmd(dest_account_name: str, token_path: str) -> List[str]:
+    return [
+        "nsc",
+        "add",
+        "import",
+        "--account",
+        dest_account_name,
+        "--token",
+        token_path,
+    ]
 
 
 def nsc_add_import(
@@ -507,38 +1020,200 @@ def nsc_add_import(
         ]
         # add import subject into robot account
         return run_nsc_and_log_output(cmd)
-        # for a private export, we must generate an activation token
+    # for a private export, we must use an activation token, reused from activation_cache if still valid
+    activation_token = activation_cache.get(
+        src_account_name, dest_account_name, subject_pattern
+    )
+    # pass the token through an in-memory file descriptor instead of a file on disk
+    # again, do not log sensitive token stdout/stderr loggers
+    with token_file(activation_token) as (path, pass_fds):
+        return run_nsc_and_log_output(
+            nsc_add_import_token_cmd(dest_account_name, path),
+            stdout=False,
+            stderr=False,
+            pass_fds=pass_fds,
+        )
+
+
+def nsc_account_name(obj) -> str:
+    """
+    Returns name of the NATS account an organization, robot account or app belongs to
+    """
+    if hasattr(obj, "organization"):
+        return obj.organization.name
+    if hasattr(obj, "account"):
+        return obj.account.name
+    return obj.name
+
+
+def nsc_add_export_cmd(account_name: str, msg_export) -> List[str]:
+    from django_nats_nkeys.models import NatsMessageExportType
+
+    cmd = [
+        "nsc",
+        "add",
+        "export",
+        "--account",
+        account_name,
+        "--subject",
+        msg_export.subject_pattern,
+        "--name",
+        msg_export.name,
+    ]
+
+    # is export private?
+    if msg_export.public is False:
+        cmd += ["--private"]
+
+    # is export a service?
+    if msg_export.export_type == NatsMessageExportType.SERVICE:
+        cmd += ["--service"]
+    return cmd
+
+
+def nsc_export_importers(msg_exports: List[Any]) -> List[Tuple[Any, Any]]:
+    """
+    Returns (account, msg_export) for every organization and robot account importing one of msg_exports, with one query per account model
+    """
+    exports_by_id = {msg_export.pk: msg_export for msg_export in msg_exports}
+    importers = []
+    for account_model in (
+        nats_nkeys_settings.get_nats_account_model(),
+        nats_nkeys_settings.get_nats_robot_account_model(),
+    ):
+        m2m_field = account_model.imports.field
+        account_field = m2m_field.m2m_field_name()
+        export_field = m2m_field.m2m_reverse_field_name()
+        rows = account_model.imports.through.objects.filter(
+            **{f"{export_field}_id__in": list(exports_by_id)}
+        ).select_related(account_field)
+        for row in rows:
+            importers.append(
+                (
+                    getattr(row, account_field),
+                    exports_by_id[getattr(row, f"{export_field}_id")],
+                )
+            )
+    return importers
+
+
+def nsc_push_accounts(account_names: List[str]) -> List[Tuple[str, Exception]]:
+    """
+    nsc_push() each account once, in parallel on nsc_executor
+    Inside nsc_batch(), the pushes are deferred to the batch instead. With NATS_NSC_PUSH_DEBOUNCE > 0, waits for the coalesced pushes, so their failures are returned too
+    Returns (account name, exception) for each failed push
+    """
+    account_names = list(dict.fromkeys(account_names))
+    batch = _nsc_batch.get()
+    if batch is not None:
+        for account_name in account_names:
+            batch.push(account_name)
+        return []
+    if nats_nkeys_settings.NATS_NSC_PUSH_DEBOUNCE > 0:
+        # wait for the coalesced pushes here, not on nsc_executor where push_scheduler runs them
+        futures = [
+            (account_name, push_scheduler.schedule(account_name))
+            for account_name in account_names
+        ]
     else:
-        cmd = [
-            "nsc",
-            "generate",
-            "activation",
-            "--account",
+        futures = [
+            (account_name, nsc_executor.submit(nsc_push, account=account_name))
+            for account_name in account_names
+        ]
+    failed = []
+    for account_name, future in futures:
+        try:
+            future.result()
+        except Exception as e:
+            logger.error("nsc push failed for account=%s: %s", account_name, e)
+            failed.append((account_name, e))
+    return failed
+
+
+def _nsc_add_imports_local(
+    src_account_name: str, dest_account_name: str, msg_exports: List[Any]
+) -> None:
+    for msg_export in msg_exports:
+        nsc_add_import(
             src_account_name,
-            "--target-account",
             dest_account_name,
-            "--subject",
-            subject_pattern,
-        ]
-        # do not log sensitive token to stdout/stderr loggers
-        result = run_nsc_and_log_output(cmd, stdout=False, stderr=False)
-        activation_token = result.stdout
-
-        # write activation token to NamedTemporaryFile
-        with tempfile.NamedTemporaryFile("w+") as f:
-            f.write(activation_token)
-            f.flush()
-
-            # now, import the stream using the activation token
-            # tempfile will automatically be deleted afterwards
-            # again, do not log sensitive token stdout/stderr loggers
-            cmd = [
-                "nsc",
-                "add",
-                "import",
-                "--account",
-                dest_account_name,
-                "--token",
-                f.name,
-            ]
-            run_nsc_and_log_output(cmd, stdout=False, stderr=False)
+            msg_export.subject_pattern,
+            public=msg_export.public,
+        )
+
+
+def nsc_add_exports(
+    obj: Union[NatsOrganization, NatsRobotAccountModel], msg_exports: List[Any]
+) -> NscBulkResult:
+    """
+    Adds msg_exports to obj's account, and imports them into every organization/robot account importing them
+
+    Importers are fetched in one query per account model, and imports are added in parallel across importing accounts on nsc_executor (one account's imports run in order). obj's account and every importing account are then pushed once, in parallel, and their json refreshed once.
+    Returns NscBulkResult of importing accounts. An account whose imports or push failed is listed in NscBulkResult.failed, without aborting the other accounts.
+    Raises NatsSubjectOverlap, before running nsc, if msg_exports overlap each other or obj's other exports
+    """
+    msg_exports = list(msg_exports)
+    # nsc rejects exports overlapping the account's other exports, fail before running it
+    export_index.check_overlaps(obj.name, msg_exports)
+    for msg_export in msg_exports:
+        # add export to account associated with NatsOrganization
+        run_nsc_and_log_output(nsc_add_export_cmd(obj.name, msg_export))
+
+    importers: Dict[str, Tuple[Any, List[Any]]] = {}
+    for account, msg_export in nsc_export_importers(msg_exports):
+        if account.name != obj.name:
+            importers.setdefault(account.name, (account, []))[1].append(msg_export)
+    # mint activation tokens of private exports in one parallel pass, imports below reuse them
+    activations = [
+        (obj.name, account.name, msg_export.subject_pattern)
+        for account, account_exports in importers.values()
+        for msg_export in account_exports
+        if msg_export.public is False
+    ]
+    if activations:
+        try:
+            activation_cache.get_many(activations)
+        except Exception as e:
+            # retried (and reported) per account by the imports below
+            logger.warning("nsc generate activation failed: %s", e)
+    futures = [
+        (
+            account,
+            nsc_executor.submit(
+                _nsc_add_imports_local, obj.name, account.name, account_exports
+            ),
+        )
+        for account, account_exports in importers.values()
+    ]
+    result = NscBulkResult(succeeded=[], failed=[])
+    for account, future in futures:
+        try:
+            future.result()
+        except Exception as e:
+            logger.error("nsc add import failed for account=%s: %s", account.name, e)
+            result.failed.append((account, e))
+        else:
+            result.succeeded.append(account)
+
+    accounts = [obj] + result.succeeded
+    push_failed = dict(nsc_push_accounts([account.name for account in accounts]))
+    for account in accounts:
+        if account.name in push_failed:
+            result.failed.append((account, push_failed[account.name]))
+            if account is not obj:
+                result.succeeded.remove(account)
+        save_describe_json(account.name, account)
+    return result
+
+
+def nsc_add_export(
+    obj: Union[NatsOrganization, NatsRobotAccountModel], msg_export
+) -> Union[NatsOrganization, NatsRobotAccountModel]:
+    """
+    Adds msg_export to obj's account, and imports it into every organization/robot account importing msg_export
+    Raises the first failure after the other importing accounts are pushed, see nsc_add_exports()
+    """
+    result = nsc_add_exports(obj, [msg_export])
+    if result.failed:
+        raise result.failed[0][1]
+    return obj
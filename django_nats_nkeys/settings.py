@@ -1,9 +1,11 @@
 import os
 import enum
-from typing import List
+from functools import wraps
+from typing import Any, Callable, Dict, List, Optional
 from django.apps import apps as django_apps
 from django.conf import settings
 from django.core.exceptions import ImproperlyConfigured
+from django.core.signals import setting_changed
 from django.db.models import Model
 
 
@@ -12,12 +14,219 @@ class NatsNscRetryMode(enum.Enum):
     STRICT = "STRICT"
 
 
+class NatsNscProvisioningMode(enum.Enum):
+    SYNC = "SYNC"
+    OUTBOX = "OUTBOX"
+    ON_COMMIT = "ON_COMMIT"
+
+
+class NatsNscPushBackend(enum.Enum):
+    NSC = "NSC"
+    NATS = "NATS"
+
+
+class cached_setting:
+    """
+    Property computed once per DjangoNatsNkeySettings instance, until DjangoNatsNkeySettings.clear()
+    """
+
+    def __init__(self, fget: Callable[[Any], Any]):
+        self.fget = fget
+        self.name = fget.__name__
+        self.__doc__ = fget.__doc__
+
+    def __get__(self, instance, owner=None):
+        if instance is None:
+            return self
+        try:
+            return instance._cache[self.name]
+        except KeyError:
+            value = self.fget(instance)
+            instance._cache[self.name] = value
+            return value
+
+
+def memoized(method: Callable[[Any], Any]) -> Callable[[Any], Any]:
+    """
+    Memoizes a DjangoNatsNkeySettings method without arguments, until DjangoNatsNkeySettings.clear()
+    Lists are copied, so callers can't modify the cached value
+    """
+    key = f"{method.__name__}()"
+
+    @wraps(method)
+    def wrapper(self):
+        try:
+            value = self._cache[key]
+        except KeyError:
+            value = method(self)
+            self._cache[key] = value
+        return list(value) if isinstance(value, list) else value
+
+    return wrapper
+
+
 class DjangoNatsNkeySettings:
-    @property
+    """
+    Settings and swappable models of django_nats_nkeys, read from django.conf.settings
+
+    Values and resolved models are cached after first use, and dropped when Django sends setting_changed (override_settings). Call clear() after changing settings (or the NSC_STORE/NSC_HOME/NKEYS_PATH environment defaults) any other way.
+    """
+
+    def __init__(self) -> None:
+        self._cache: Dict[str, Any] = {}
+
+    def clear(self) -> None:
+        self._cache.clear()
+
+    @cached_setting
     def NATS_NSC_RETRY_MODE(self) -> NatsNscRetryMode:
         return NatsNscRetryMode(getattr(settings, "NATS_NSC_RETRY_MODE", "STRICT"))
 
-    @property
+    @cached_setting
+    def NATS_NSC_PROVISIONING_MODE(self) -> NatsNscProvisioningMode:
+        return NatsNscProvisioningMode(
+            getattr(settings, "NATS_NSC_PROVISIONING_MODE", "SYNC")
+        )
+
+    @cached_setting
+    def NATS_NSC_OUTBOX_MAX_ATTEMPTS(self) -> int:
+        return getattr(settings, "NATS_NSC_OUTBOX_MAX_ATTEMPTS", 10)
+
+    @cached_setting
+    def NATS_NSC_OUTBOX_MAX_BACKOFF(self) -> int:
+        """
+        Upper bound (seconds) of exponential backoff between outbox retries
+        """
+        return getattr(settings, "NATS_NSC_OUTBOX_MAX_BACKOFF", 300)
+
+    @cached_setting
+    def NATS_NSC_NATIVE_CREDS(self) -> bool:
+        """
+        Generate creds in-process from nsc store/keystore instead of running `nsc generate creds`
+        Falls back to nsc if the user JWT or seed can't be found
+        """
+        return getattr(settings, "NATS_NSC_NATIVE_CREDS", True)
+
+    @cached_setting
+    def NATS_NSC_NATIVE_DESCRIBE(self) -> bool:
+        """
+        Decode account/user JWTs from nsc store instead of running `nsc describe --json`
+        Falls back to nsc if the JWT can't be found
+        """
+        return getattr(settings, "NATS_NSC_NATIVE_DESCRIBE", True)
+
+    @cached_setting
+    def NATS_NSC_STORE_INDEX_POLL_INTERVAL(self) -> float:
+        """
+        Min seconds between checks of the nsc store for changes made by other processes, see django_nats_nkeys.store_index
+        """
+        return getattr(settings, "NATS_NSC_STORE_INDEX_POLL_INTERVAL", 1.0)
+
+    @cached_setting
+    def NATS_NSC_CREDS_CACHE_TTL(self) -> float:
+        """
+        Max seconds generated creds/JWTs are cached per app, see django_nats_nkeys.creds_cache
+        0 disables the cache
+        """
+        return getattr(settings, "NATS_NSC_CREDS_CACHE_TTL", 60)
+
+    @cached_setting
+    def NATS_NSC_DESCRIBE_CACHE_SIZE(self) -> int:
+        """
+        Max describe JSON entries cached in-process, see django_nats_nkeys.describe_cache
+        0 disables the in-process cache
+        """
+        return getattr(settings, "NATS_NSC_DESCRIBE_CACHE_SIZE", 1024)
+
+    @cached_setting
+    def NATS_NSC_DESCRIBE_CACHE(self) -> Optional[str]:
+        """
+        Optional Django cache alias used to share describe JSON between processes
+        """
+        return getattr(settings, "NATS_NSC_DESCRIBE_CACHE", None)
+
+    @cached_setting
+    def NATS_NSC_ACTIVATION_CACHE(self) -> Optional[str]:
+        """
+        Optional Django cache alias used to share activation tokens between processes, see django_nats_nkeys.activation_cache
+        """
+        return getattr(settings, "NATS_NSC_ACTIVATION_CACHE", None)
+
+    @cached_setting
+    def NATS_NSC_EXPORT_INDEX_TTL(self) -> float:
+        """
+        Max seconds the in-process index of export subjects is reused before it's rebuilt, see django_nats_nkeys.subjects
+        Changes made in this process rebuild it immediately
+        """
+        return getattr(settings, "NATS_NSC_EXPORT_INDEX_TTL", 60)
+
+    @cached_setting
+    def NATS_NSC_ACCOUNT_POOL_SIZE(self) -> int:
+        """
+        Unclaimed accounts `manage.py nsc_account_pool` keeps provisioned for signup, see django_nats_nkeys.pool
+        0 disables the pool
+        """
+        return getattr(settings, "NATS_NSC_ACCOUNT_POOL_SIZE", 0)
+
+    @cached_setting
+    def NATS_NSC_ASYNC_CONCURRENCY(self) -> int:
+        """
+        Max number of nsc subprocesses run concurrently by django_nats_nkeys.async_services
+        """
+        return getattr(settings, "NATS_NSC_ASYNC_CONCURRENCY", 10)
+
+    @cached_setting
+    def NATS_NSC_MAX_WORKERS(self) -> int:
+        """
+        Size of the worker pool running nsc subprocesses, see django_nats_nkeys.executor
+        """
+        return getattr(settings, "NATS_NSC_MAX_WORKERS", os.cpu_count() or 1)
+
+    @cached_setting
+    def NATS_NSC_LOCK_DIR(self) -> str:
+        """
+        Directory of per-account/operator lock files shared by all processes editing the nsc store
+        Defaults to <NATS_NSC_DATA_DIR>/.locks
+        """
+        default = os.path.join(self.NATS_NSC_DATA_DIR, ".locks")
+        return getattr(settings, "NATS_NSC_LOCK_DIR", default)
+
+    @cached_setting
+    def NATS_NSC_PUSH_DEBOUNCE(self) -> float:
+        """
+        Seconds to coalesce pushes to the same account, see django_nats_nkeys.push
+        0 (default) pushes immediately
+        """
+        return getattr(settings, "NATS_NSC_PUSH_DEBOUNCE", 0)
+
+    @cached_setting
+    def NATS_NSC_PUSH_MAX_ATTEMPTS(self) -> int:
+        """
+        Attempts of a coalesced push before push_scheduler gives up on the account, see django_nats_nkeys.push
+        """
+        return getattr(settings, "NATS_NSC_PUSH_MAX_ATTEMPTS", 5)
+
+    @cached_setting
+    def NATS_NSC_PUSH_BACKEND(self) -> NatsNscPushBackend:
+        """
+        NSC: spawn `nsc push`
+        NATS: publish account JWTs to the resolver over a long-lived system account connection, see django_nats_nkeys.resolver
+        """
+        return NatsNscPushBackend(getattr(settings, "NATS_NSC_PUSH_BACKEND", "NSC"))
+
+    @cached_setting
+    def NATS_NSC_PUSH_TIMEOUT(self) -> float:
+        return getattr(settings, "NATS_NSC_PUSH_TIMEOUT", 5.0)
+
+    @cached_setting
+    def NATS_NSC_SYSTEM_ACCOUNT(self) -> str:
+        return getattr(settings, "NATS_NSC_SYSTEM_ACCOUNT", "SYS")
+
+    @cached_setting
+    def NATS_NSC_SYSTEM_USER(self) -> str:
+        return getattr(settings, "NATS_NSC_SYSTEM_USER", "sys")
+
+    @cached_setting
     def NATS_NSC_DATA_DIR(self) -> str:
         """
         Defaults to $NSC_STORE
@@ -26,7 +235,7 @@ class DjangoNatsNkeySettings:
         default = os.environ.get("NSC_STORE", "/var/lib/nats/nsc/stores")
         return getattr(settings, "NATS_NSC_DATA_DIR", default)
 
-    @property
+    @cached_setting
     def NATS_NSC_CONFIG_DIR(self) -> str:
         """
         Defaults to $NSC_HOME
@@ -35,7 +244,7 @@ class DjangoNatsNkeySettings:
         default = os.environ.get("NSC_HOME", "/var/lib/nats/nsc/config")
         return getattr(settings, "NATS_NSC_CONFIG_DIR", default)
 
-    @property
+    @cached_setting
     def NATS_NSC_KEYSTORE_DIR(self) -> str:
         """
         Defaults to $NKEYS_PATH
@@ -44,22 +253,23 @@ class DjangoNatsNkeySettings:
         default = os.environ.get("NKEYS_PATH", "/var/lib/nats/nsc/keys")
         return getattr(settings, "NATS_NSC_KEYSTORE_DIR", default)
 
-    @property
+    @cached_setting
     def NATS_NKEYS_IMPORT_DIR(self) -> str:
         return getattr(settings, "NATS_NKEYS_IMPORT_DIR", ".nats/")
 
-    @property
+    @cached_setting
     def NATS_NKEYS_EXPORT_DIR(self) -> str:
         return getattr(settings, "NATS_NKEYS_EXPORT_DIR", ".nats/")
 
-    @property
+    @cached_setting
     def NATS_SERVER_URI(self) -> str:
         return getattr(settings, "NATS_SERVER_URI", "nats://nats:4223")
 
-    @property
+    @cached_setting
     def NATS_NKEYS_OPERATOR_NAME(self) -> str:
         return getattr(settings, "NATS_NKEYS_OPERATOR_NAME", "DjangoOperator")
 
+    @memoized
     def get_nats_robot_account_model_string(self) -> str:
         return getattr(
             settings,
@@ -67,6 +277,7 @@ class DjangoNatsNkeySettings:
             "django_nats_nkeys.NatsRobotAccount",
         )
 
+    @memoized
     def get_nats_robot_account_model(self) -> Model:
         model_name = self.get_nats_robot_account_model_string()
         try:
@@ -88,6 +299,7 @@ class DjangoNatsNkeySettings:
             )
         return model
 
+    @memoized
     def get_nats_robot_app_model_string(self) -> str:
         return getattr(
             settings,
@@ -95,6 +307,7 @@ class DjangoNatsNkeySettings:
             "django_nats_nkeys.NatsRobotApp",
         )
 
+    @memoized
     def get_nats_robot_app_model(self) -> Model:
         model_name = self.get_nats_robot_app_model_string()
         try:
@@ -116,6 +329,7 @@ class DjangoNatsNkeySettings:
             )
         return model
 
+    @memoized
     def get_nats_organization_owner_model_string(self) -> str:
         return getattr(
             settings,
@@ -123,6 +337,7 @@ class DjangoNatsNkeySettings:
             "django_nats_nkeys.NatsOrganizationOwner",
         )
 
+    @memoized
     def get_nats_organization_owner_model(self) -> Model:
         model_name = self.get_nats_organization_owner_model_string()
         try:
@@ -144,6 +359,7 @@ class DjangoNatsNkeySettings:
             )
         return nats_app_model
 
+    @memoized
     def get_nats_organization_app_model_string(self) -> str:
         return getattr(
             settings,
@@ -151,6 +367,7 @@ class DjangoNatsNkeySettings:
             "django_nats_nkeys.NatsOrganizationApp",
         )
 
+    @memoized
     def get_nats_organization_app_model(self) -> Model:
         model_name = self.get_nats_organization_app_model_string()
         try:
@@ -172,12 +389,14 @@ class DjangoNatsNkeySettings:
             )
         return nats_app_model
 
+    @memoized
     def get_nats_account_model_string(self) -> str:
         """Get the configured subscriber model as a module path string."""
         return getattr(
             settings, "NATS_ORGANIZATION_MODEL", "django_nats_nkeys.NatsOrganization"
         )
 
+    @memoized
     def get_nats_account_model(self) -> Model:
         """
         Attempt to read settings.NATS_ORGANIZATION_MODEL
@@ -205,6 +424,7 @@ class DjangoNatsNkeySettings:
             )
         return nats_account_model
 
+    @memoized
     def get_nats_user_model_string(self) -> str:
         """Get the configured subscriber model as a module path string."""
         return getattr(
@@ -213,6 +433,7 @@ class DjangoNatsNkeySettings:
             "django_nats_nkeys.NatsOrganizationUser",
         )
 
+    @memoized
     def get_nats_user_model(self) -> Model:
         """
         Attempt to read settings.NATS_ORGANIZATION_USER_MODEL
@@ -243,6 +464,7 @@ class DjangoNatsNkeySettings:
     def get_nats_app_models_string(self) -> str:
         pass
 
+    @memoized
     def get_nats_app_models(self) -> List[Model]:
         model_strings = getattr(
             settings,
@@ -271,3 +493,12 @@ class DjangoNatsNkeySettings:
 
 
 nats_nkeys_settings = DjangoNatsNkeySettings()
+
+
+def nats_nkeys_setting_changed(**kwargs):
+    nats_nkeys_settings.clear()
+
+
+setting_changed.connect(
+    nats_nkeys_setting_changed, dispatch_uid="nats_nkeys_setting_changed"
+)
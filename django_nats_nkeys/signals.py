@@ -1,18 +1,219 @@
+from django.core.exceptions import ObjectDoesNotExist
 from django.dispatch import receiver
-from django.db.models.signals import m2m_changed, post_save
-
-from .services import (
-    nsc_add_import,
-    nsc_bearer_auth_enable,
-    run_nsc_and_log_output,
-    save_describe_json,
-    nsc_jetstream_update,
+from django.db.models import F, Q
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_save,
+    pre_delete,
+    pre_save,
+)
+
+from .creds_cache import creds_cache
+from .models import (
+    NSC_VERSION_IGNORED_FIELDS,
+    NatsMessageExport,
+    NatsNscOperationType,
+)
+from .outbox import enqueue_nsc_operation, nsc_deferred
+from .reconcile import (
+    nsc_version_bump,
+    reconcile_account_models,
+    reconcile_app_models,
 )
-from .models import NatsMessageExportType
 from .settings import nats_nkeys_settings
+from .subjects import export_index
 
 NatsOrganization = nats_nkeys_settings.get_nats_account_model()
 NatsOrganizationApp = nats_nkeys_settings.get_nats_organization_app_model()
+NatsAppModels = nats_nkeys_settings.get_nats_app_models()
+
+
+def nats_app_creds_invalidate(sender, instance, **kwargs):
+    """
+    Drops cached creds/JWT when an app's permissions or bearer flag are saved, or the app is deleted
+    """
+    # services (and the nsc/NATS clients it pulls in) are imported on first use, not in AppConfig.ready()
+    from .services import nsc_account_name
+
+    try:
+        account_name = nsc_account_name(instance)
+    except ObjectDoesNotExist:
+        # account deleted in the same cascade
+        creds_cache.clear()
+        return
+    creds_cache.invalidate(account_name, instance.app_name)
+
+
+for app_model in NatsAppModels:
+    post_save.connect(
+        nats_app_creds_invalidate,
+        sender=app_model,
+        dispatch_uid=f"nats_app_creds_invalidate_save_{app_model._meta.label}",
+    )
+    post_delete.connect(
+        nats_app_creds_invalidate,
+        sender=app_model,
+        dispatch_uid=f"nats_app_creds_invalidate_delete_{app_model._meta.label}",
+    )
+
+
+def nsc_version_pre_save(sender, instance, raw=False, update_fields=None, **kwargs):
+    """
+    Increments nsc_version in the UPDATE itself, so a stale instance never writes back an older version
+    """
+    if raw or instance._state.adding or update_fields is not None:
+        return
+    instance.nsc_version = F("nsc_version") + 1
+
+
+def nsc_version_post_save(
+    sender, instance, created, raw=False, update_fields=None, **kwargs
+):
+    if raw or created:
+        return
+    if update_fields is not None and "nsc_version" not in update_fields:
+        if not set(update_fields) - NSC_VERSION_IGNORED_FIELDS:
+            return
+        # models without NscVersionedMixin bump in a second UPDATE
+        nsc_version_bump(sender._base_manager.filter(pk=instance.pk))
+    # drop the F() expression (or stale value), the saved version is loaded by refresh_from_db() on next access
+    instance.__dict__.pop("nsc_version", None)
+
+
+def nsc_version_app_deleted(sender, instance, **kwargs):
+    """
+    Marks the app's account as changed, so `nsc_reconcile --prune` deletes the user
+    """
+    if hasattr(instance, "organization_id"):
+        account_model = NatsOrganization
+        account_id = instance.organization_id
+    else:
+        account_model = instance._meta.get_field("account").related_model
+        account_id = instance.account_id
+    nsc_version_bump(account_model._base_manager.filter(pk=account_id))
+
+
+def nsc_version_export_deleted(sender, instance, **kwargs):
+    """
+    Marks accounts exporting or importing instance as changed, before their m2m rows are deleted (without m2m_changed)
+    """
+    for account_model in reconcile_account_models():
+        nsc_version_bump(
+            account_model._base_manager.filter(
+                Q(exports=instance) | Q(imports=instance)
+            ).distinct()
+        )
+
+
+def nsc_version_m2m_changed(sender, instance, action, reverse, model, pk_set, **kwargs):
+    """
+    Marks accounts whose imports or exports changed
+
+    reverse=False: instance is the account
+    reverse=True: instance is the NatsMessageExport, pk_set holds account pks
+    """
+    if action not in ("post_add", "post_remove", "pre_clear"):
+        return
+    if not reverse:
+        if action == "pre_clear" or pk_set:
+            nsc_version_bump(type(instance)._base_manager.filter(pk=instance.pk))
+        return
+    if action == "pre_clear":
+        # accounts related through sender, before the rows are cleared
+        account_field = next(
+            f.name
+            for f in sender._meta.get_fields()
+            if getattr(f, "related_model", None) is model
+        )
+        export_field = next(
+            f.name
+            for f in sender._meta.get_fields()
+            if getattr(f, "related_model", None) is type(instance)
+        )
+        pk_set = set(
+            sender.objects.filter(**{export_field: instance}).values_list(
+                f"{account_field}_id", flat=True
+            )
+        )
+    if pk_set:
+        nsc_version_bump(model._base_manager.filter(pk__in=pk_set))
+
+
+for versioned_model in (
+    reconcile_account_models() + reconcile_app_models() + [NatsMessageExport]
+):
+    pre_save.connect(
+        nsc_version_pre_save,
+        sender=versioned_model,
+        dispatch_uid=f"nsc_version_pre_save_{versioned_model._meta.label}",
+    )
+    post_save.connect(
+        nsc_version_post_save,
+        sender=versioned_model,
+        dispatch_uid=f"nsc_version_post_save_{versioned_model._meta.label}",
+    )
+
+for app_model in reconcile_app_models():
+    post_delete.connect(
+        nsc_version_app_deleted,
+        sender=app_model,
+        dispatch_uid=f"nsc_version_app_deleted_{app_model._meta.label}",
+    )
+
+pre_delete.connect(
+    nsc_version_export_deleted,
+    sender=NatsMessageExport,
+    dispatch_uid="nsc_version_export_deleted",
+)
+
+for account_model in reconcile_account_models():
+    for m2m_field in ("imports", "exports"):
+        m2m_changed.connect(
+            nsc_version_m2m_changed,
+            sender=getattr(account_model, m2m_field).through,
+            dispatch_uid=f"nsc_version_m2m_changed_{account_model._meta.label}_{m2m_field}",
+        )
+
+
+def export_index_stale(sender, **kwargs):
+    export_index.mark_stale()
+
+
+def export_overlap_check(sender, instance, model, action, pk_set, reverse, **kwargs):
+    """
+    Rejects exports overlapping another export of the same account before the m2m rows are written and nsc runs
+    """
+    if action != "pre_add" or not pk_set:
+        return
+    if reverse:
+        for account in model._base_manager.filter(pk__in=pk_set):
+            export_index.check_overlaps(account.name, [instance])
+    else:
+        export_index.check_overlaps(
+            instance.name, model._base_manager.filter(pk__in=pk_set).order_by("pk")
+        )
+
+
+post_save.connect(
+    export_index_stale, sender=NatsMessageExport, dispatch_uid="export_index_save"
+)
+post_delete.connect(
+    export_index_stale, sender=NatsMessageExport, dispatch_uid="export_index_delete"
+)
+
+for account_model in reconcile_account_models():
+    m2m_changed.connect(
+        export_overlap_check,
+        sender=account_model.exports.through,
+        dispatch_uid=f"export_overlap_check_{account_model._meta.label}",
+    )
+    for m2m_field in ("imports", "exports"):
+        m2m_changed.connect(
+            export_index_stale,
+            sender=getattr(account_model, m2m_field).through,
+            dispatch_uid=f"export_index_m2m_changed_{account_model._meta.label}_{m2m_field}",
+        )
 
 
 @receiver(post_save, sender=NatsOrganizationApp)
@@ -21,7 +222,12 @@ def nats_app_bearer_auth_enabled(
 ):
     if update_fields is not None:
         if "bearer" in update_fields and instance.bearer == True:
-            nsc_bearer_auth_enable(instance)
+            if nsc_deferred():
+                enqueue_nsc_operation(NatsNscOperationType.BEARER_AUTH_ENABLE, instance)
+            else:
+                from .services import nsc_bearer_auth_enable
+
+                nsc_bearer_auth_enable(instance)
 
 
 @receiver(post_save, sender=NatsOrganization)
@@ -31,63 +237,43 @@ def nats_organization_jetstream(
     # update jetstream
     if update_fields is not None:
         if any("jetstream" in field for field in update_fields):
-            nsc_jetstream_update(instance)
+            if nsc_deferred():
+                enqueue_nsc_operation(NatsNscOperationType.JETSTREAM_UPDATE, instance)
+            else:
+                from .services import nsc_jetstream_update
+
+                nsc_jetstream_update(instance)
 
 
 @receiver(m2m_changed, sender=NatsOrganization.exports.through)
-def add_nats_organization_export(sender, instance, model, action, pk_set, **kwargs):
+def add_nats_organization_export(
+    sender, instance, model, action, pk_set, reverse=False, **kwargs
+):
     """
     sender - NatsOrganization.exports.through (intermediate M2M model) class
-    instance - NatsOrganization
-    model - NatsMessageExport
+    instance - NatsOrganization (or NatsMessageExport if reverse=True)
+    model - NatsMessageExport (or NatsOrganization if reverse=True)
     """
     # if relationship.add() is called and through model row already exists, pk_set will be empty - skip
-    if action == "post_add" and len(pk_set) == 1:
-        # nsc add export for NatsOrganization account
-        msg_export_id = pk_set.pop()
-        msg_export = model.objects.get(id=msg_export_id)
-        cmd = [
-            "nsc",
-            "add",
-            "export",
-            "--account",
-            instance.name,
-            "--subject",
-            msg_export.subject_pattern,
-            "--name",
-            msg_export.name,
-        ]
-
-        # is export private?
-        if msg_export.public is False:
-            cmd += ["--private"]
-
-        # is export a service?
-        if msg_export.export_type == NatsMessageExportType.SERVICE:
-            cmd += ["--service"]
-
-        # add export to account associated with NatsOrganization
-        run_nsc_and_log_output(cmd)
-
-        # update NatsOrganization json
-        save_describe_json(instance.name, instance)
-
-        # handle import for x-account orgs
-        for org_account in msg_export.nats_organization_imports.all():
-            nsc_add_import(
-                instance.name,
-                org_account.name,
-                msg_export.subject_pattern,
-                public=msg_export.public,
-            )
-            save_describe_json(org_account.name, org_account)
-
-        # handle import for robot account
-        for robot_account in msg_export.nats_robot_imports.all():
-            nsc_add_import(
-                instance.name,
-                robot_account.name,
-                msg_export.subject_pattern,
-                public=msg_export.public,
+    if action != "post_add" or not pk_set:
+        return
+    from .services import nsc_add_exports
+
+    if reverse:
+        # msg_export.nats_organization_exports.add(*orgs)
+        units = [(org, [instance.pk]) for org in model.objects.filter(pk__in=pk_set)]
+    else:
+        units = [(instance, sorted(pk_set))]
+    for org, export_ids in units:
+        # nsc add export(s) for NatsOrganization account
+        if nsc_deferred():
+            enqueue_nsc_operation(
+                NatsNscOperationType.ADD_EXPORT,
+                org,
+                payload={"export_ids": export_ids},
             )
-            save_describe_json(robot_account.name, robot_account)
+            continue
+        msg_exports = NatsMessageExport.objects.filter(id__in=export_ids).order_by("id")
+        result = nsc_add_exports(org, msg_exports)
+        if result.failed:
+            raise result.failed[0][1]
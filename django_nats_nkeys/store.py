@@ -0,0 +1,91 @@
+import os
+from typing import Any, Dict, List, Optional
+
+from django_nats_nkeys.jwt import decode_jwt
+from django_nats_nkeys.settings import nats_nkeys_settings
+
+# nsc store layout
+# ref: https://github.com/nats-io/nsc/blob/main/cmd/store/store.go
+# <NATS_NSC_DATA_DIR>/<operator>/<operator>.jwt
+# <NATS_NSC_DATA_DIR>/<operator>/accounts/<account>/<account>.jwt
+# <NATS_NSC_DATA_DIR>/<operator>/accounts/<account>/users/<user>.jwt
+# <NATS_NSC_KEYSTORE_DIR>/keys/<pubkey[0]>/<pubkey[1:3]>/<pubkey>.nk
+
+
+def operator_dir(operator_name: Optional[str] = None) -> str:
+    if operator_name is None:
+        operator_name = nats_nkeys_settings.NATS_NKEYS_OPERATOR_NAME
+    return os.path.join(nats_nkeys_settings.NATS_NSC_DATA_DIR, operator_name)
+
+
+def account_dir(account_name: str) -> str:
+    return os.path.join(operator_dir(), "accounts", account_name)
+
+
+def operator_jwt_path(operator_name: Optional[str] = None) -> str:
+    if operator_name is None:
+        operator_name = nats_nkeys_settings.NATS_NKEYS_OPERATOR_NAME
+    return os.path.join(operator_dir(operator_name), f"{operator_name}.jwt")
+
+
+def account_names() -> List[str]:
+    accounts_dir = os.path.join(operator_dir(), "accounts")
+    if not os.path.isdir(accounts_dir):
+        return []
+    return sorted(
+        name
+        for name in os.listdir(accounts_dir)
+        if os.path.isfile(account_jwt_path(name))
+    )
+
+
+def account_jwt_path(account_name: str) -> str:
+    return os.path.join(account_dir(account_name), f"{account_name}.jwt")
+
+
+def user_jwt_path(account_name: str, user_name: str) -> str:
+    return os.path.join(account_dir(account_name), "users", f"{user_name}.jwt")
+
+
+def keystore_seed_path(public_key: str) -> str:
+    return os.path.join(
+        nats_nkeys_settings.NATS_NSC_KEYSTORE_DIR,
+        "keys",
+        public_key[0],
+        public_key[1:3],
+        f"{public_key}.nk",
+    )
+
+
+def read_jwt(path: str) -> str:
+    with open(path, "r") as f:
+        return f.read().strip()
+
+
+def read_account_jwt(account_name: str) -> str:
+    return read_jwt(account_jwt_path(account_name))
+
+
+def read_user_jwt(account_name: str, user_name: str) -> str:
+    return read_jwt(user_jwt_path(account_name, user_name))
+
+
+def read_seed(public_key: str) -> str:
+    """
+    Reads the seed for public_key from the nsc keystore. Raises FileNotFoundError if the key is not stored.
+    """
+    with open(keystore_seed_path(public_key), "r") as f:
+        return f.read().strip()
+
+
+def describe_json(account_name: str, user_name: Optional[str] = None) -> Dict[Any, Any]:
+    """
+    Decodes account or user JWT claims from the nsc store
+    Returns the same dict as `nsc describe account|user --json`
+    """
+    if user_name is None:
+        path = account_jwt_path(account_name)
+    else:
+        path = user_jwt_path(account_name, user_name)
+    _, claims, _ = decode_jwt(read_jwt(path))
+    return claims
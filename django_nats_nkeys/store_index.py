@@ -0,0 +1,224 @@
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+from django_nats_nkeys import store
+from django_nats_nkeys.executor import nsc_cmd_account
+from django_nats_nkeys.jwt import decode_jwt
+from django_nats_nkeys.settings import nats_nkeys_settings
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(init=True, repr=True)
+class NscStoreEntry:
+    name: str
+    public_key: str
+    jwt_path: str
+
+
+@dataclass(init=True, repr=True)
+class _AccountIndex:
+    account: NscStoreEntry
+    users: Dict[str, NscStoreEntry]
+    # mtime_ns of <account>/users, None if the directory doesn't exist
+    users_mtime: Optional[int]
+
+
+# nsc subcommands that add or remove accounts/users
+INDEXED_NSC_COMMANDS = ("add", "delete", "import", "pull")
+
+
+def _mtime(path: str) -> Optional[int]:
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+def _entry(name: str, jwt_path: str) -> Optional[NscStoreEntry]:
+    try:
+        _, claims, _ = decode_jwt(store.read_jwt(jwt_path))
+    except (OSError, ValueError) as e:
+        # partially written by a concurrent nsc, picked up on the next refresh
+        logger.debug("Skipping unreadable JWT %s: %s", jwt_path, e)
+        return None
+    return NscStoreEntry(name=name, public_key=claims["sub"], jwt_path=jwt_path)
+
+
+class NscStoreIndex:
+    """
+    In-memory index of account and user names in the nsc store (NATS_NSC_DATA_DIR)
+
+    The store is scanned once, then refreshed incrementally by polling directory mtimes: adding or removing an account changes the mtime of <operator>/accounts, adding or removing a user changes the mtime of <account>/users. Only directories whose mtime changed are re-listed.
+    Refreshes happen on lookup, at most once per NATS_NSC_STORE_INDEX_POLL_INTERVAL seconds. mark_stale() forces the next lookup to refresh.
+    nsc commands run in this process update the index through nsc_command_ran(): adding or deleting one account/user re-reads just that entry, other store-wide commands (import, pull) mark the index stale.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.RLock()
+        self._accounts: Dict[str, _AccountIndex] = {}
+        self._accounts_mtime: Optional[int] = None
+        self._data_dir: Optional[str] = None
+        self._checked_at = 0.0
+        self._stale = True
+
+    def mark_stale(self) -> None:
+        self._stale = True
+
+    def nsc_command_ran(self, cmd: List[str]) -> None:
+        args = cmd[cmd.index("nsc") + 1 :]
+        if not args or args[0] not in INDEXED_NSC_COMMANDS:
+            return
+        account_name = nsc_cmd_account(cmd)
+        if (
+            args[0] in ("add", "delete")
+            and len(args) >= 2
+            and args[1] in ("account", "user")
+            and account_name is not None
+        ):
+            user_name = None
+            if args[1] == "user":
+                if "--name" not in args:
+                    self.mark_stale()
+                    return
+                user_name = args[args.index("--name") + 1]
+            self.update(account_name, user_name=user_name)
+            return
+        self.mark_stale()
+
+    def update(self, account_name: str, user_name: Optional[str] = None) -> None:
+        """
+        Re-reads one account (user_name=None) or user from the store, so adding N accounts costs N updates instead of N full refreshes
+        Directory mtimes are left as they were, so changes made by other processes are still picked up by the next refresh
+        """
+        with self._lock:
+            if self._data_dir != store.operator_dir():
+                # never scanned (or settings changed), the next lookup scans everything
+                self.mark_stale()
+                return
+            if user_name is None:
+                account = None
+                if os.path.exists(store.account_jwt_path(account_name)):
+                    account = self._index_account(account_name)
+                if account is not None:
+                    self._accounts[account_name] = account
+                else:
+                    self._accounts.pop(account_name, None)
+                return
+            account = self._accounts.get(account_name)
+            if account is None:
+                self.mark_stale()
+                return
+            jwt_path = store.user_jwt_path(account_name, user_name)
+            entry = _entry(user_name, jwt_path) if os.path.exists(jwt_path) else None
+            if entry is not None:
+                account.users[user_name] = entry
+            else:
+                account.users.pop(user_name, None)
+
+    def _accounts_dir(self) -> str:
+        return os.path.join(store.operator_dir(), "accounts")
+
+    def _index_users(self, account_name: str) -> Dict[str, NscStoreEntry]:
+        users_dir = os.path.join(store.account_dir(account_name), "users")
+        users = {}
+        try:
+            filenames = os.listdir(users_dir)
+        except OSError:
+            return users
+        for filename in filenames:
+            if not filename.endswith(".jwt"):
+                continue
+            name = filename[: -len(".jwt")]
+            entry = _entry(name, os.path.join(users_dir, filename))
+            if entry is not None:
+                users[name] = entry
+        return users
+
+    def _index_account(self, account_name: str) -> Optional[_AccountIndex]:
+        entry = _entry(account_name, store.account_jwt_path(account_name))
+        if entry is None:
+            return None
+        users_dir = os.path.join(store.account_dir(account_name), "users")
+        # read mtime before listing, so changes made while listing are seen next refresh
+        users_mtime = _mtime(users_dir)
+        return _AccountIndex(
+            account=entry,
+            users=self._index_users(account_name),
+            users_mtime=users_mtime,
+        )
+
+    def refresh(self, force: bool = False) -> None:
+        with self._lock:
+            data_dir = store.operator_dir()
+            if data_dir != self._data_dir:
+                # settings changed (tests), start over
+                self._accounts = {}
+                self._accounts_mtime = None
+                self._data_dir = data_dir
+                force = True
+            now = time.monotonic()
+            interval = nats_nkeys_settings.NATS_NSC_STORE_INDEX_POLL_INTERVAL
+            if not (force or self._stale or now - self._checked_at >= interval):
+                return
+            self._stale = False
+            self._checked_at = now
+
+            accounts_dir = self._accounts_dir()
+            accounts_mtime = _mtime(accounts_dir)
+            if accounts_mtime != self._accounts_mtime or force:
+                self._accounts_mtime = accounts_mtime
+                names = set(store.account_names())
+                for removed in set(self._accounts) - names:
+                    del self._accounts[removed]
+                for added in names - set(self._accounts):
+                    account = self._index_account(added)
+                    if account is not None:
+                        self._accounts[added] = account
+                    else:
+                        # retry unreadable account on next refresh
+                        self._accounts_mtime = None
+
+            for name, account in self._accounts.items():
+                users_dir = os.path.join(store.account_dir(name), "users")
+                users_mtime = _mtime(users_dir)
+                if users_mtime != account.users_mtime:
+                    account.users_mtime = users_mtime
+                    account.users = self._index_users(name)
+
+    def account_names(self) -> List[str]:
+        self.refresh()
+        return sorted(self._accounts)
+
+    def account(self, account_name: str) -> Optional[NscStoreEntry]:
+        self.refresh()
+        account = self._accounts.get(account_name)
+        return account.account if account is not None else None
+
+    def user(self, account_name: str, user_name: str) -> Optional[NscStoreEntry]:
+        self.refresh()
+        account = self._accounts.get(account_name)
+        if account is None:
+            return None
+        return account.users.get(user_name)
+
+    def user_names(self, account_name: str) -> List[str]:
+        self.refresh()
+        account = self._accounts.get(account_name)
+        return sorted(account.users) if account is not None else []
+
+    def has_account(self, account_name: str) -> bool:
+        entry = self.account(account_name)
+        # guard against a delete by another process inside the poll interval
+        return entry is not None and os.path.exists(entry.jwt_path)
+
+    def has_user(self, account_name: str, user_name: str) -> bool:
+        entry = self.user(account_name, user_name)
+        return entry is not None and os.path.exists(entry.jwt_path)
+
+
+store_index = NscStoreIndex()
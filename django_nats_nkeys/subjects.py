@@ -0,0 +1,319 @@
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, FrozenSet, Hashable, Iterable, List, Optional, Set, Tuple
+
+from django_nats_nkeys.errors import NatsSubjectOverlap
+from django_nats_nkeys.settings import nats_nkeys_settings
+
+# ref: https://docs.nats.io/nats-concepts/subjects#wildcards
+# * matches exactly one token, > matches one or more tokens and must be the last token
+WILDCARD_TOKEN = "*"
+FULL_WILDCARD_TOKEN = ">"
+
+
+def subject_tokens(subject: str) -> List[str]:
+    return subject.split(".")
+
+
+def validate_subject_pattern(pattern: str) -> None:
+    """
+    Raises ValueError if pattern is not a valid NATS subject (with optional wildcards)
+    """
+    if not pattern or pattern != pattern.strip() or any(c.isspace() for c in pattern):
+        raise ValueError(f"Invalid subject {pattern!r}: empty or contains whitespace")
+    tokens = subject_tokens(pattern)
+    for i, token in enumerate(tokens):
+        if not token:
+            raise ValueError(f"Invalid subject {pattern!r}: empty token")
+        if FULL_WILDCARD_TOKEN in token and (
+            token != FULL_WILDCARD_TOKEN or i != len(tokens) - 1
+        ):
+            raise ValueError(
+                f"Invalid subject {pattern!r}: {FULL_WILDCARD_TOKEN} must be the last token"
+            )
+        if WILDCARD_TOKEN in token and token != WILDCARD_TOKEN:
+            raise ValueError(
+                f"Invalid subject {pattern!r}: {WILDCARD_TOKEN} must be a whole token"
+            )
+
+
+class _Node:
+    __slots__ = ("children", "values")
+
+    def __init__(self) -> None:
+        self.children: Dict[str, "_Node"] = {}
+        self.values: Set[Hashable] = set()
+
+
+class SubjectTrie:
+    """
+    Trie of subject patterns, one level per token, mapping each pattern to a set of values
+
+    match(subject) returns values of patterns covering subject, overlapping(pattern) returns values of patterns matching at least one subject pattern also matches. Both visit only the branches a wildcard can reach, so lookups cost O(tokens) for literal subjects, independent of the number of patterns.
+    """
+
+    def __init__(self) -> None:
+        self._root = _Node()
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def insert(self, pattern: str, value: Hashable) -> None:
+        node = self._root
+        for token in subject_tokens(pattern):
+            node = node.children.setdefault(token, _Node())
+        if value not in node.values:
+            node.values.add(value)
+            self._size += 1
+
+    def remove(self, pattern: str, value: Hashable) -> bool:
+        path = [self._root]
+        tokens = subject_tokens(pattern)
+        for token in tokens:
+            node = path[-1].children.get(token)
+            if node is None:
+                return False
+            path.append(node)
+        if value not in path[-1].values:
+            return False
+        path[-1].values.discard(value)
+        self._size -= 1
+        # prune branches left empty
+        for token, node, parent in zip(
+            reversed(tokens), reversed(path[1:]), reversed(path[:-1])
+        ):
+            if node.values or node.children:
+                break
+            del parent.children[token]
+        return True
+
+    def match(self, subject: str) -> Set[Hashable]:
+        """
+        Values of patterns covering subject, i.e. matching every subject subject matches
+        """
+        out: Set[Hashable] = set()
+        self._match(self._root, subject_tokens(subject), 0, out)
+        return out
+
+    def _match(self, node: _Node, tokens: List[str], i: int, out: Set) -> None:
+        full = node.children.get(FULL_WILDCARD_TOKEN)
+        if full is not None and i < len(tokens):
+            out |= full.values
+        if i == len(tokens):
+            out |= node.values
+            return
+        token = tokens[i]
+        if token == FULL_WILDCARD_TOKEN:
+            # only > covers >
+            return
+        if token != WILDCARD_TOKEN and token in node.children:
+            self._match(node.children[token], tokens, i + 1, out)
+        if WILDCARD_TOKEN in node.children:
+            self._match(node.children[WILDCARD_TOKEN], tokens, i + 1, out)
+
+    def overlapping(self, pattern: str) -> Set[Hashable]:
+        """
+        Values of patterns sharing at least one subject with pattern
+        """
+        out: Set[Hashable] = set()
+        self._overlap(self._root, subject_tokens(pattern), 0, out)
+        return out
+
+    def _overlap(self, node: _Node, tokens: List[str], i: int, out: Set) -> None:
+        if i == len(tokens):
+            out |= node.values
+            return
+        token = tokens[i]
+        if token == FULL_WILDCARD_TOKEN:
+            # every pattern with at least one more token
+            for child in node.children.values():
+                self._collect(child, out)
+            return
+        full = node.children.get(FULL_WILDCARD_TOKEN)
+        if full is not None:
+            out |= full.values
+        if token == WILDCARD_TOKEN:
+            for child_token, child in node.children.items():
+                if child_token != FULL_WILDCARD_TOKEN:
+                    self._overlap(child, tokens, i + 1, out)
+            return
+        for child_token in (token, WILDCARD_TOKEN):
+            child = node.children.get(child_token)
+            if child is not None:
+                self._overlap(child, tokens, i + 1, out)
+
+    def _collect(self, node: _Node, out: Set) -> None:
+        out |= node.values
+        for child in node.children.values():
+            self._collect(child, out)
+
+
+@dataclass(init=True, repr=True)
+class ExportEntry:
+    pk: Any
+    name: str
+    subject_pattern: str
+    public: bool
+    export_type: str
+    # names of organization/robot accounts exporting and importing this export
+    exporters: FrozenSet[str]
+    importers: FrozenSet[str]
+
+
+class ExportIndex:
+    """
+    In-memory SubjectTrie over every NatsMessageExport, with the accounts exporting and importing each one
+
+    Built with one query for exports plus one per account model and relation, and rebuilt on the next lookup after mark_stale() (called by signals when exports or account imports/exports change in this process), or NATS_NSC_EXPORT_INDEX_TTL seconds after it was built (changes made by other processes).
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.RLock()
+        self._trie = SubjectTrie()
+        self._entries: Dict[Any, ExportEntry] = {}
+        self._built_at: Optional[float] = None
+
+    def mark_stale(self) -> None:
+        self._built_at = None
+
+    def _build(self) -> None:
+        from django_nats_nkeys.models import NatsMessageExport
+        from django_nats_nkeys.reconcile import reconcile_account_models
+
+        relations: Dict[str, Dict[Any, Set[str]]] = {"exports": {}, "imports": {}}
+        for account_model in reconcile_account_models():
+            for relation, by_export in relations.items():
+                m2m_field = getattr(account_model, relation).field
+                account_field = m2m_field.m2m_field_name()
+                export_field = m2m_field.m2m_reverse_field_name()
+                rows = getattr(account_model, relation).through.objects.values_list(
+                    f"{export_field}_id", f"{account_field}__name"
+                )
+                for export_id, account_name in rows:
+                    by_export.setdefault(export_id, set()).add(account_name)
+
+        trie = SubjectTrie()
+        entries = {}
+        for (
+            pk,
+            name,
+            subject_pattern,
+            public,
+            export_type,
+        ) in NatsMessageExport.objects.values_list(
+            "pk", "name", "subject_pattern", "public", "export_type"
+        ):
+            entries[pk] = ExportEntry(
+                pk=pk,
+                name=name,
+                subject_pattern=subject_pattern,
+                public=public,
+                export_type=export_type,
+                exporters=frozenset(relations["exports"].get(pk, ())),
+                importers=frozenset(relations["imports"].get(pk, ())),
+            )
+            trie.insert(subject_pattern, pk)
+        self._trie = trie
+        self._entries = entries
+
+    def refresh(self, force: bool = False) -> None:
+        with self._lock:
+            now = time.monotonic()
+            ttl = nats_nkeys_settings.NATS_NSC_EXPORT_INDEX_TTL
+            if force or self._built_at is None or now - self._built_at >= ttl:
+                # set before building, so a mark_stale() during the build isn't lost
+                self._built_at = now
+                try:
+                    self._build()
+                except BaseException:
+                    self._built_at = None
+                    raise
+
+    def _lookup(self, pks: Iterable[Any]) -> List[ExportEntry]:
+        entries = self._entries
+        return sorted(
+            (entries[pk] for pk in pks if pk in entries),
+            key=lambda entry: entry.subject_pattern,
+        )
+
+    def get(self, pk: Any) -> Optional[ExportEntry]:
+        self.refresh()
+        return self._entries.get(pk)
+
+    def overlapping(
+        self,
+        pattern: str,
+        account_name: Optional[str] = None,
+        exclude: Iterable[Any] = (),
+    ) -> List[ExportEntry]:
+        """
+        Exports whose subject pattern overlaps pattern, optionally only those exported by account_name
+        """
+        self.refresh()
+        exclude = set(exclude)
+        return [
+            entry
+            for entry in self._lookup(self._trie.overlapping(pattern))
+            if entry.pk not in exclude
+            and (account_name is None or account_name in entry.exporters)
+        ]
+
+    def exports_matching(self, subject: str) -> List[ExportEntry]:
+        """
+        Exports whose subject pattern covers subject
+        """
+        self.refresh()
+        return self._lookup(self._trie.match(subject))
+
+    def importers_matching(self, subject: str) -> Set[str]:
+        """
+        Names of accounts importing an export that covers subject
+        """
+        return {
+            account_name
+            for entry in self.exports_matching(subject)
+            for account_name in entry.importers
+        }
+
+    def check_overlaps(self, account_name: str, msg_exports: Iterable[Any]) -> None:
+        """
+        Raises NatsSubjectOverlap if adding msg_exports to account_name would export overlapping subjects, which nsc rejects
+        Checked against the account's other exports and between msg_exports themselves. Conflicts are confirmed against a rebuilt index, so rows deleted or rolled back since the last build are never reported.
+        """
+        msg_exports = list(msg_exports)
+        for msg_export in msg_exports:
+            validate_subject_pattern(msg_export.subject_pattern)
+        conflict = self._first_overlap(account_name, msg_exports)
+        if conflict is not None:
+            self.refresh(force=True)
+            conflict = self._first_overlap(account_name, msg_exports)
+        if conflict is not None:
+            subject_pattern, overlapping = conflict
+            raise NatsSubjectOverlap(
+                subject_pattern, overlapping, account_name=account_name
+            )
+
+    def _first_overlap(
+        self, account_name: str, msg_exports: List[Any]
+    ) -> Optional[Tuple[str, List[str]]]:
+        new_pks = {msg_export.pk for msg_export in msg_exports}
+        pending = SubjectTrie()
+        for msg_export in msg_exports:
+            overlapping = [
+                entry.subject_pattern
+                for entry in self.overlapping(
+                    msg_export.subject_pattern,
+                    account_name=account_name,
+                    exclude=new_pks,
+                )
+            ]
+            overlapping += sorted(pending.overlapping(msg_export.subject_pattern))
+            if overlapping:
+                return msg_export.subject_pattern, overlapping
+            pending.insert(msg_export.subject_pattern, msg_export.subject_pattern)
+        return None
+
+
+export_index = ExportIndex()
@@ -0,0 +1,80 @@
+"""
+Builds signed nkeys and JWTs for test fixtures, as nsc does
+"""
+
+import base64
+import hashlib
+import json
+import os
+import time
+from typing import Any, Dict, Optional
+
+import nkeys
+
+JWT_HEADER = {"typ": "JWT", "alg": "ed25519-nkey"}
+
+
+def _b32encode(raw: bytes) -> str:
+    return base64.b32encode(raw).decode("ascii").rstrip("=")
+
+
+def create_keypair(prefix: int) -> nkeys.KeyPair:
+    """
+    Generates a new ed25519 nkey pair, prefix is one of nkeys.PREFIX_BYTE_ACCOUNT, nkeys.PREFIX_BYTE_USER, ...
+    """
+    return nkeys.from_seed(bytearray(nkeys.encode_seed(os.urandom(32), prefix)))
+
+
+def public_key(kp: nkeys.KeyPair) -> str:
+    return kp.public_key.decode("ascii").rstrip("=")
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).decode("ascii").rstrip("=")
+
+
+def _claims_hash(claims: Dict[str, Any]) -> str:
+    """
+    jti is the base32-encoded sha512/256 digest of the claims, computed before jti is set
+    ref: https://github.com/nats-io/jwt/blob/main/v2/claims.go
+    """
+    payload = json.dumps(claims, separators=(",", ":")).encode("utf8")
+    return _b32encode(hashlib.new("sha512_256", payload).digest())
+
+
+def encode_jwt(claims: Dict[str, Any], kp: nkeys.KeyPair) -> str:
+    """
+    Signs claims with nkey pair, setting iss, iat and jti the same way the nats-io/jwt library does
+    """
+    claims = dict(claims)
+    claims.pop("jti", None)
+    claims["iat"] = int(time.time())
+    claims["iss"] = public_key(kp)
+    claims = {"jti": _claims_hash(claims), **claims}
+
+    header = _b64encode(json.dumps(JWT_HEADER, separators=(",", ":")).encode("utf8"))
+    payload = _b64encode(json.dumps(claims, separators=(",", ":")).encode("utf8"))
+    signing_input = f"{header}.{payload}".encode("ascii")
+    signature = _b64encode(kp.sign(signing_input))
+    return f"{header}.{payload}.{signature}"
+
+
+def user_claims(
+    name: str,
+    user_public_key: str,
+    issuer_account: Optional[str] = None,
+    permissions: Optional[Dict[str, Any]] = None,
+    bearer: bool = False,
+) -> Dict[str, Any]:
+    """
+    Builds unsigned claims for a NATS v2 user JWT
+    """
+    nats: Dict[str, Any] = {"pub": {}, "sub": {}, "subs": -1, "data": -1, "payload": -1}
+    if permissions:
+        nats.update(permissions)
+    if bearer:
+        nats["bearer_token"] = True
+    if issuer_account is not None:
+        nats["issuer_account"] = issuer_account
+    nats.update({"type": "user", "version": 2})
+    return {"name": name, "sub": user_public_key, "nats": nats}
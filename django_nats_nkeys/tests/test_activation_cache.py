@@ -0,0 +1,110 @@
+import subprocess
+import sys
+import time
+from unittest.mock import patch
+
+import nkeys
+from django.test import SimpleTestCase
+
+from django_nats_nkeys.activation_cache import (
+    ActivationTokenCache,
+    activation_jwt,
+    token_file,
+)
+from django_nats_nkeys.tests.jwt_fixtures import create_keypair, encode_jwt, public_key
+
+
+class TestTokenFile(SimpleTestCase):
+    def test_activation_jwt(self):
+        assert activation_jwt("abc.def.ghi\n") == "abc.def.ghi"
+        decorated = "-----BEGIN NATS ACTIVATION JWT-----\nabc.def.ghi\n------END NATS ACTIVATION JWT------\n"
+        assert activation_jwt(decorated) == "abc.def.ghi"
+
+    def test_token_file_readable_by_child(self):
+        with token_file("abc.def.ghi") as (path, pass_fds):
+            result = subprocess.run(
+                [sys.executable, "-c", f"print(open({path!r}).read())"],
+                capture_output=True,
+                encoding="utf8",
+                pass_fds=pass_fds,
+            )
+        assert result.stdout.strip() == "abc.def.ghi"
+
+
+class TestActivationTokenCache(SimpleTestCase):
+    def setUp(self):
+        self.cache = ActivationTokenCache()
+        self.account_kp = create_keypair(nkeys.PREFIX_BYTE_ACCOUNT)
+        self.account_claims = {"sub": public_key(self.account_kp), "nats": {}}
+        describe = patch(
+            "django_nats_nkeys.services.nsc_describe_json",
+            side_effect=lambda name: self.account_claims,
+        )
+        describe.start()
+        self.addCleanup(describe.stop)
+
+    def _token(self, exp=None, kp=None):
+        claims = {"sub": "ATARGET", "nats": {"type": "activation"}}
+        if exp is not None:
+            claims["exp"] = exp
+        return encode_jwt(claims, kp or self.account_kp)
+
+    def test_reuses_valid_token(self):
+        token = self._token()
+        with patch(
+            "django_nats_nkeys.services.nsc_generate_activation", return_value=token
+        ) as mock_generate:
+            assert self.cache.get("acme", "partner", "a.>") == token
+            assert self.cache.get("acme", "partner", "a.>") == token
+            assert mock_generate.call_count == 1
+            self.cache.get("acme", "robots", "a.>")
+            assert mock_generate.call_count == 2
+
+    def test_expired_token_minted_again(self):
+        tokens = [self._token(exp=int(time.time()) + 10), self._token()]
+        with patch(
+            "django_nats_nkeys.services.nsc_generate_activation", side_effect=tokens
+        ) as mock_generate:
+            self.cache.get("acme", "partner", "a.>")
+            # expires within EXPIRY_MARGIN
+            assert self.cache.get("acme", "partner", "a.>") == tokens[1]
+            assert mock_generate.call_count == 2
+
+    def test_rotated_account_key_minted_again(self):
+        new_kp = create_keypair(nkeys.PREFIX_BYTE_ACCOUNT)
+        tokens = [self._token(), self._token(kp=new_kp)]
+        with patch(
+            "django_nats_nkeys.services.nsc_generate_activation", side_effect=tokens
+        ):
+            self.cache.get("acme", "partner", "a.>")
+            # account re-created with a new identity key
+            self.account_claims = {"sub": public_key(new_kp), "nats": {}}
+            assert self.cache.get("acme", "partner", "a.>") == tokens[1]
+
+    def test_signing_key_issuer(self):
+        signing_kp = create_keypair(nkeys.PREFIX_BYTE_ACCOUNT)
+        self.account_claims["nats"]["signing_keys"] = [public_key(signing_kp)]
+        token = self._token(kp=signing_kp)
+        assert self.cache.valid(("acme", "partner", "a.>"), token)
+
+    def test_get_many_in_parallel(self):
+        keys = [("acme", f"partner-{i}", "a.>") for i in range(4)]
+        with patch(
+            "django_nats_nkeys.services.nsc_generate_activation",
+            side_effect=lambda *key: self._token(),
+        ) as mock_generate:
+            tokens = self.cache.get_many(keys + keys[:1])
+            assert set(tokens) == set(keys)
+            assert mock_generate.call_count == 4
+            self.cache.get_many(keys)
+            assert mock_generate.call_count == 4
+
+    def test_invalidate(self):
+        with patch(
+            "django_nats_nkeys.services.nsc_generate_activation",
+            side_effect=lambda *key: self._token(),
+        ) as mock_generate:
+            self.cache.get("acme", "partner", "a.>")
+            self.cache.invalidate("partner")
+            self.cache.get("acme", "partner", "a.>")
+            assert mock_generate.call_count == 2
@@ -0,0 +1,133 @@
+import asyncio
+import tempfile
+import threading
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from django.test import SimpleTestCase, override_settings
+
+from django_nats_nkeys.async_services import (
+    ansc_batch,
+    ansc_push,
+    arun_nsc_and_log_output,
+    asave_describe_json,
+)
+from django_nats_nkeys.errors import NscError
+from django_nats_nkeys.executor import NscStoreLock
+
+
+class FakeProcess:
+    running = 0
+    max_running = 0
+    calls = []
+
+    def __init__(self, *cmd, returncode=0):
+        self.cmd = cmd
+        self.returncode = returncode
+        FakeProcess.calls.append(cmd)
+
+    async def communicate(self):
+        FakeProcess.running += 1
+        FakeProcess.max_running = max(FakeProcess.max_running, FakeProcess.running)
+        await asyncio.sleep(0.01)
+        FakeProcess.running -= 1
+        if self.returncode != 0:
+            return b"", b"nsc error"
+        return b"ok", b""
+
+
+async def fake_exec(*cmd, **kwargs):
+    return FakeProcess(*cmd)
+
+
+async def fake_exec_error(*cmd, **kwargs):
+    return FakeProcess(*cmd, returncode=1)
+
+
+class TestAsyncServices(SimpleTestCase):
+    def setUp(self):
+        self.lock_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.lock_dir.cleanup)
+        settings_override = override_settings(NATS_NSC_LOCK_DIR=self.lock_dir.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        FakeProcess.running = 0
+        FakeProcess.max_running = 0
+        FakeProcess.calls = []
+
+    @override_settings(NATS_NSC_ASYNC_CONCURRENCY=2)
+    async def test_concurrency_limit(self):
+        with patch("asyncio.create_subprocess_exec", fake_exec):
+            results = await asyncio.gather(
+                *[
+                    arun_nsc_and_log_output(["nsc", "describe", "account", str(i)])
+                    for i in range(6)
+                ]
+            )
+        assert all(r.stdout == "ok" for r in results)
+        assert FakeProcess.max_running == 2
+
+    async def test_nsc_error(self):
+        with patch("asyncio.create_subprocess_exec", fake_exec_error):
+            with self.assertRaises(NscError):
+                await arun_nsc_and_log_output(["nsc", "edit", "account"])
+
+    async def test_batch_single_push_per_account(self):
+        with patch("asyncio.create_subprocess_exec", fake_exec):
+            async with ansc_batch():
+                await ansc_push(account="acme")
+                await ansc_push(account="acme")
+                await ansc_push(account="robots")
+                assert FakeProcess.calls == []
+        pushed = sorted(call[3] for call in FakeProcess.calls)
+        assert pushed == ["acme", "robots"]
+
+    async def test_batch_no_push_on_error(self):
+        with patch("asyncio.create_subprocess_exec", fake_exec):
+            with self.assertRaises(RuntimeError):
+                async with ansc_batch(flush_on_error=False):
+                    await ansc_push(account="acme")
+                    raise RuntimeError("edit failed")
+        assert FakeProcess.calls == []
+
+    async def test_save_describe_json_update_fields(self):
+        obj = MagicMock()
+        with patch(
+            "django_nats_nkeys.async_services.ansc_describe_json",
+            AsyncMock(return_value={"name": "acme"}),
+        ):
+            await asave_describe_json("acme", obj)
+        assert obj.json == {"name": "acme"}
+        # a full save would bump nsc_version and mark the account changed
+        obj.save.assert_called_once_with(update_fields=["json"])
+
+    async def test_cancelled_while_waiting_for_lock(self):
+        waiting = threading.Event()
+        unblock = threading.Event()
+        acquired = threading.Event()
+        locks = []
+        acquire = NscStoreLock.acquire
+
+        def slow_acquire(lock):
+            locks.append(lock)
+            waiting.set()
+            unblock.wait(5)
+            acquire(lock)
+            acquired.set()
+
+        loop = asyncio.get_running_loop()
+        with patch.object(NscStoreLock, "acquire", slow_acquire):
+            task = asyncio.ensure_future(
+                arun_nsc_and_log_output(["nsc", "edit", "account", "--name", "acme"])
+            )
+            await loop.run_in_executor(None, waiting.wait, 5)
+            task.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+            unblock.set()
+            await loop.run_in_executor(None, acquired.wait, 5)
+            # the flock taken after cancellation is released once the executor thread gets it
+            for _ in range(100):
+                if not locks[0]._fds:
+                    break
+                await asyncio.sleep(0.01)
+        assert locks[0]._fds == []
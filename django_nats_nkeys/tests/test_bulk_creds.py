@@ -0,0 +1,63 @@
+import io
+import tarfile
+import zipfile
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import nkeys
+from django.test import SimpleTestCase
+
+from django_nats_nkeys.bulk_creds import creds_archive_response, stream_creds_archive
+from django_nats_nkeys.jwt import format_user_creds
+from django_nats_nkeys.tests.jwt_fixtures import (
+    create_keypair,
+    encode_jwt,
+    public_key,
+    user_claims,
+)
+
+ACCOUNT_KP = create_keypair(nkeys.PREFIX_BYTE_ACCOUNT)
+
+
+def fake_generate_creds(account_name, app_name):
+    user_kp = create_keypair(nkeys.PREFIX_BYTE_USER)
+    jwt = encode_jwt(user_claims(app_name, public_key(user_kp)), ACCOUNT_KP)
+    return format_user_creds(jwt, user_kp.seed.decode())
+
+
+def _apps(n):
+    account = SimpleNamespace(name="fleet")
+    return [SimpleNamespace(account=account, app_name=f"device-{i}") for i in range(n)]
+
+
+@patch("django_nats_nkeys.services.nsc_generate_creds", fake_generate_creds)
+class TestBulkCreds(SimpleTestCase):
+    def test_zip(self):
+        data = b"".join(stream_creds_archive(_apps(50), window=4))
+        with zipfile.ZipFile(io.BytesIO(data)) as zf:
+            names = zf.namelist()
+            assert len(names) == 100
+            assert names[:2] == ["fleet/device-0.creds", "fleet/device-0.jwt"]
+            creds = zf.read("fleet/device-7.creds").decode()
+            jwt = zf.read("fleet/device-7.jwt").decode()
+        assert jwt in creds
+        assert "-----BEGIN USER NKEY SEED-----" in creds
+
+    def test_tar(self):
+        data = b"".join(stream_creds_archive(_apps(3), archive_format="tar.gz"))
+        with tarfile.open(fileobj=io.BytesIO(data), mode="r:gz") as tf:
+            assert len(tf.getnames()) == 6
+            assert tf.getmember("fleet/device-2.jwt").mode == 0o600
+
+    def test_streams_incrementally(self):
+        chunks = stream_creds_archive(_apps(10), window=2)
+        first = next(chunks)
+        assert first.startswith(b"PK")
+
+    def test_response(self):
+        response = creds_archive_response(_apps(2), filename="fleet.tar")
+        assert response["Content-Type"] == "application/x-tar"
+        assert 'filename="fleet.tar"' in response["Content-Disposition"]
+        data = b"".join(response.streaming_content)
+        with tarfile.open(fileobj=io.BytesIO(data)) as tf:
+            assert len(tf.getnames()) == 4
@@ -0,0 +1,84 @@
+import time
+from unittest.mock import patch
+
+import nkeys
+from django.test import SimpleTestCase, override_settings
+
+from django_nats_nkeys.creds_cache import NatsCreds, NatsCredsCache
+from django_nats_nkeys.jwt import format_user_creds
+from django_nats_nkeys.tests.jwt_fixtures import (
+    create_keypair,
+    encode_jwt,
+    public_key,
+    user_claims,
+)
+
+
+def _creds(exp=None):
+    account_kp = create_keypair(nkeys.PREFIX_BYTE_ACCOUNT)
+    user_kp = create_keypair(nkeys.PREFIX_BYTE_USER)
+    claims = user_claims("app", public_key(user_kp))
+    if exp is not None:
+        claims["exp"] = exp
+    jwt = encode_jwt(claims, account_kp)
+    return jwt, user_kp.seed.decode(), format_user_creds(jwt, user_kp.seed.decode())
+
+
+class TestNatsCreds(SimpleTestCase):
+    def test_parse(self):
+        jwt, seed, creds = _creds(exp=123)
+        parsed = NatsCreds(creds)
+        assert parsed.jwt == jwt
+        assert parsed.seed == seed
+        assert parsed.expires == 123
+
+
+class TestNatsCredsCache(SimpleTestCase):
+    def setUp(self):
+        self.cache = NatsCredsCache()
+        generate_creds = patch("django_nats_nkeys.services.nsc_generate_creds")
+        generate_jwt = patch("django_nats_nkeys.services.nsc_generate_jwt")
+        self.generate_creds = generate_creds.start()
+        self.generate_jwt = generate_jwt.start()
+        self.addCleanup(generate_creds.stop)
+        self.addCleanup(generate_jwt.stop)
+        self.jwt, _, self.creds = _creds()
+        self.generate_creds.return_value = self.creds
+        self.generate_jwt.return_value = self.jwt
+
+    def test_creds_cached(self):
+        creds = self.cache.get_creds("acme", "app")
+        assert self.cache.get_creds("acme", "app") is creds
+        assert creds.jwt == self.jwt
+        assert self.generate_creds.call_count == 1
+
+    def test_jwt_only(self):
+        assert self.cache.get_jwt("acme", "app") == self.jwt
+        assert self.cache.get_jwt("acme", "app") == self.jwt
+        assert self.generate_jwt.call_count == 1
+        self.generate_creds.assert_not_called()
+
+    def test_invalidate(self):
+        self.cache.get_creds("acme", "app")
+        self.cache.get_jwt("acme", "other")
+        self.cache.get_creds("robots", "app")
+        self.cache.invalidate("acme", "app")
+        self.cache.get_creds("acme", "app")
+        assert self.generate_creds.call_count == 3
+        self.cache.invalidate("acme")
+        self.cache.get_jwt("acme", "other")
+        assert self.generate_jwt.call_count == 2
+        self.cache.get_creds("robots", "app")
+        assert self.generate_creds.call_count == 3
+
+    def test_expired_jwt(self):
+        self.generate_creds.return_value = _creds(exp=int(time.time()) - 1)[2]
+        self.cache.get_creds("acme", "app")
+        self.cache.get_creds("acme", "app")
+        assert self.generate_creds.call_count == 2
+
+    @override_settings(NATS_NSC_CREDS_CACHE_TTL=0)
+    def test_disabled(self):
+        self.cache.get_jwt("acme", "app")
+        self.cache.get_jwt("acme", "app")
+        assert self.generate_jwt.call_count == 2
@@ -0,0 +1,76 @@
+import os
+import tempfile
+from unittest.mock import MagicMock
+
+from django.test import SimpleTestCase, override_settings
+
+from django_nats_nkeys import store
+from django_nats_nkeys.describe_cache import DescribeCache
+
+
+def _write(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        f.write(data)
+
+
+class TestDescribeCache(SimpleTestCase):
+    def setUp(self):
+        self.data_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.data_dir.cleanup)
+        settings_override = override_settings(
+            NATS_NSC_DATA_DIR=self.data_dir.name,
+            NATS_NKEYS_OPERATOR_NAME="TestOperator",
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.cache = DescribeCache()
+        _write(store.account_jwt_path("acme"), "jwt-1")
+
+    def test_hit_until_jwt_changes(self):
+        load = MagicMock(
+            side_effect=[{"name": "acme", "v": 1}, {"name": "acme", "v": 2}]
+        )
+        assert self.cache.get_or_load("acme", None, load)["v"] == 1
+        assert self.cache.get_or_load("acme", None, load)["v"] == 1
+        assert load.call_count == 1
+        assert self.cache.hits == 1
+
+        # nsc rewrites the JWT on every edit
+        _write(store.account_jwt_path("acme"), "jwt-2-longer")
+        assert self.cache.get_or_load("acme", None, load)["v"] == 2
+        assert load.call_count == 2
+
+    def test_returns_copies(self):
+        load = MagicMock(return_value={"name": "acme", "nats": {"limits": {}}})
+        self.cache.get_or_load("acme", None, load)["nats"]["limits"]["subs"] = 1
+        assert self.cache.get_or_load("acme", None, load)["nats"]["limits"] == {}
+
+    def test_missing_jwt_bypasses_cache(self):
+        load = MagicMock(return_value={"name": "missing"})
+        self.cache.get_or_load("missing", None, load)
+        self.cache.get_or_load("missing", None, load)
+        assert load.call_count == 2
+
+    @override_settings(NATS_NSC_DESCRIBE_CACHE_SIZE=1)
+    def test_lru_eviction(self):
+        _write(store.user_jwt_path("acme", "app"), "user-jwt")
+        load = MagicMock(return_value={})
+        self.cache.get_or_load("acme", None, load)
+        self.cache.get_or_load("acme", "app", load)
+        self.cache.get_or_load("acme", None, load)
+        assert load.call_count == 3
+
+    @override_settings(
+        NATS_NSC_DESCRIBE_CACHE="default",
+        CACHES={
+            "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}
+        },
+    )
+    def test_shared_cache(self):
+        load = MagicMock(return_value={"name": "acme"})
+        self.cache.get_or_load("acme", None, load)
+        # another process' cache
+        other = DescribeCache()
+        assert other.get_or_load("acme", None, load) == {"name": "acme"}
+        assert load.call_count == 1
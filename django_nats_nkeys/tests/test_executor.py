@@ -0,0 +1,126 @@
+import tempfile
+import threading
+import time
+from unittest.mock import patch
+
+from django.test import SimpleTestCase, override_settings
+
+from django_nats_nkeys.executor import (
+    NscExecutor,
+    NscStoreLock,
+    nsc_cmd_account,
+    nsc_cmd_readonly,
+    nsc_cmd_user,
+)
+
+
+class TestNscCmdAccount(SimpleTestCase):
+    def test_nsc_cmd_account(self):
+        assert nsc_cmd_account(["nsc", "add", "account", "--name", "acme"]) == "acme"
+        assert nsc_cmd_account(["nsc", "delete", "account", "acme"]) == "acme"
+        assert (
+            nsc_cmd_account(["nsc", "edit", "user", "--account", "acme", "--name", "a"])
+            == "acme"
+        )
+        assert nsc_cmd_account(["nsc", "push", "--account", "acme"]) == "acme"
+        assert nsc_cmd_account(["nsc", "push", "--all"]) is None
+        assert nsc_cmd_account(["nsc", "add", "operator", "--name", "op"]) is None
+        assert nsc_cmd_account(["nsc", "validate", "--all-accounts"]) is None
+
+    def test_nsc_cmd_user(self):
+        assert (
+            nsc_cmd_user(["nsc", "add", "user", "--account", "acme", "--name", "a"])
+            == "a"
+        )
+        assert (
+            nsc_cmd_user(["nsc", "edit", "user", "--account", "acme", "--name", "a"])
+            == "a"
+        )
+        # no --account, nsc falls back to its current context
+        assert nsc_cmd_user(["nsc", "add", "user", "--name", "a"]) is None
+        assert nsc_cmd_user(["nsc", "add", "account", "--name", "acme"]) is None
+
+    def test_nsc_cmd_readonly(self):
+        assert nsc_cmd_readonly(["nsc", "describe", "account", "--name", "acme"])
+        assert nsc_cmd_readonly(
+            ["nsc", "generate", "activation", "--account", "acme", "--subject", "a"]
+        )
+        assert not nsc_cmd_readonly(["nsc", "edit", "account", "--name", "acme"])
+        assert not nsc_cmd_readonly(["nsc", "add", "import", "--account", "acme"])
+
+
+class TestNscStoreLock(SimpleTestCase):
+    def setUp(self):
+        self.lock_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.lock_dir.cleanup)
+        settings_override = override_settings(NATS_NSC_LOCK_DIR=self.lock_dir.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def _max_concurrent(self, accounts, shared=False):
+        running = []
+        peak = []
+        mutex = threading.Lock()
+
+        def work(account):
+            if isinstance(account, tuple):
+                lock = NscStoreLock(account[0], user=account[1])
+            else:
+                lock = NscStoreLock(account, shared=shared)
+            with lock:
+                with mutex:
+                    running.append(account)
+                    peak.append(len(running))
+                time.sleep(0.05)
+                with mutex:
+                    running.remove(account)
+
+        threads = [threading.Thread(target=work, args=(a,)) for a in accounts]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        return max(peak)
+
+    def test_same_account_serialized(self):
+        assert self._max_concurrent(["acme", "acme", "acme"]) == 1
+
+    def test_different_accounts_parallel(self):
+        assert self._max_concurrent(["acme", "robots", "partner"]) == 3
+
+    def test_users_of_account_parallel(self):
+        users = [("acme", "app-a"), ("acme", "app-b"), ("acme", "app-c")]
+        assert self._max_concurrent(users) == 3
+        assert self._max_concurrent([("acme", "app-a")] * 3) == 1
+        assert self._max_concurrent(["acme", ("acme", "app-a")]) == 1
+
+    def test_shared_account_parallel(self):
+        assert self._max_concurrent(["acme", "acme", "acme"], shared=True) == 3
+
+    def test_operator_serialized(self):
+        assert self._max_concurrent([None, None, None]) == 1
+        assert self._max_concurrent([None, "acme", None, "robots"]) < 4
+
+    @override_settings(NATS_NSC_MAX_WORKERS=1)
+    def test_nested_submit_runs_inline(self):
+        executor = NscExecutor()
+        self.addCleanup(executor.shutdown)
+
+        def outer():
+            return executor.submit(lambda: "inner").result(timeout=1)
+
+        assert executor.submit(outer).result(timeout=2) == "inner"
+
+    def test_worker_closes_connections(self):
+        executor = NscExecutor()
+        self.addCleanup(executor.shutdown)
+
+        with patch("django_nats_nkeys.executor.connections") as mock_connections:
+
+            def outer():
+                executor.submit(lambda: None).result(timeout=1)
+                # nested work runs inline, inside the task that owns the connection
+                mock_connections.close_all.assert_not_called()
+
+            executor.submit(outer).result(timeout=2)
+        mock_connections.close_all.assert_called_once_with()
@@ -0,0 +1,106 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+from django.conf import settings
+from django.test import SimpleTestCase
+
+# imported on first use, never by django.setup()
+LAZY_MODULES = (
+    "coolname",
+    "nats",
+    "nkeys",
+    "django_nats_nkeys.services",
+    "django_nats_nkeys.async_services",
+    "django_nats_nkeys.resolver",
+)
+
+
+def imported_modules(code: str):
+    """
+    Runs code in a fresh interpreter, returning the names in sys.modules afterwards
+    """
+    env = {**os.environ, "DJANGO_SETTINGS_MODULE": settings.SETTINGS_MODULE}
+    result = subprocess.run(
+        [
+            sys.executable,
+            "-c",
+            f"{code}; import json, sys; print(json.dumps(sorted(sys.modules)))",
+        ],
+        capture_output=True,
+        text=True,
+        env=env,
+        check=True,
+    )
+    return set(json.loads(result.stdout.splitlines()[-1]))
+
+
+def import_times(code: str):
+    """
+    Runs code in a fresh interpreter under -X importtime, returning {module: self time in us}
+    """
+    env = {**os.environ, "DJANGO_SETTINGS_MODULE": settings.SETTINGS_MODULE}
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        capture_output=True,
+        text=True,
+        env=env,
+        check=True,
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, _, name = line[len("import time:") :].split("|")
+        times[name.strip()] = int(self_us)
+    return times
+
+
+class TestImportTime(SimpleTestCase):
+    def test_setup_skips_lazy_modules(self):
+        # cold start of management commands and workers
+        modules = imported_modules(
+            "import django_nats_nkeys; import django; django.setup()"
+        )
+        assert "django_nats_nkeys.signals" in modules
+        assert [name for name in LAZY_MODULES if name in modules] == []
+
+    def test_services_skips_lazy_modules(self):
+        modules = imported_modules(
+            "import django; django.setup(); import django_nats_nkeys.services"
+        )
+        assert [name for name in ("coolname", "nats", "nkeys") if name in modules] == []
+
+    def test_model_attributes(self):
+        from django.contrib.auth import get_user_model
+
+        from django_nats_nkeys import async_services, services
+        from django_nats_nkeys.settings import nats_nkeys_settings
+
+        assert services.User is get_user_model()
+        assert services.NatsOrganization is nats_nkeys_settings.get_nats_account_model()
+        assert (
+            async_services.NatsRobotAppModel
+            is nats_nkeys_settings.get_nats_robot_app_model()
+        )
+        with self.assertRaises(AttributeError):
+            services.NotAModel
+
+
+@pytest.mark.benchmark
+class TestImportTimeBenchmark(SimpleTestCase):
+    def test_setup_import_time(self):
+        """
+        Reports the time django.setup() spends importing this package, and all imports together
+        """
+        times = import_times("import django_nats_nkeys; import django; django.setup()")
+        own = sum(
+            us for name, us in times.items() if name.startswith("django_nats_nkeys")
+        )
+        print(
+            f"django.setup(): {own / 1000:.1f}ms in django_nats_nkeys, "
+            f"{sum(times.values()) / 1000:.1f}ms in all imports"
+        )
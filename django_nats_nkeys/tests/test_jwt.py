@@ -0,0 +1,120 @@
+import os
+import tempfile
+
+import nkeys
+from django.test import SimpleTestCase, override_settings
+
+from django_nats_nkeys import store
+from django_nats_nkeys.creds import NscCredsEngine
+from django_nats_nkeys.jwt import decode_jwt, format_user_creds
+from django_nats_nkeys.tests.jwt_fixtures import (
+    create_keypair,
+    encode_jwt,
+    public_key,
+    user_claims,
+)
+
+
+def _write(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        f.write(data)
+
+
+class TestNkeys(SimpleTestCase):
+    def test_create_keypair(self):
+        kp = create_keypair(nkeys.PREFIX_BYTE_USER)
+        assert kp.seed.startswith(b"SU")
+        prefix, _ = nkeys.decode_seed(kp.seed)
+        assert prefix == nkeys.PREFIX_BYTE_USER
+
+    def test_public_key(self):
+        kp = create_keypair(nkeys.PREFIX_BYTE_ACCOUNT)
+        assert public_key(kp).startswith("A")
+        assert len(public_key(kp)) == 56
+
+    def test_encode_decode_jwt(self):
+        account_kp = create_keypair(nkeys.PREFIX_BYTE_ACCOUNT)
+        user_kp = create_keypair(nkeys.PREFIX_BYTE_USER)
+        claims = user_claims("test", public_key(user_kp), bearer=True)
+        token = encode_jwt(claims, account_kp)
+        header, decoded, signature = decode_jwt(token)
+        assert header == {"typ": "JWT", "alg": "ed25519-nkey"}
+        assert decoded["iss"] == public_key(account_kp)
+        assert decoded["sub"] == public_key(user_kp)
+        assert decoded["nats"]["bearer_token"] is True
+        assert decoded["nats"]["type"] == "user"
+        signing_input = token.rsplit(".", 1)[0].encode("ascii")
+        assert account_kp.verify(signing_input, signature)
+
+    def test_format_user_creds(self):
+        creds = format_user_creds("a.b.c", "SUAAA\n")
+        assert creds.split("\n")[1] == "a.b.c"
+        assert "-----BEGIN USER NKEY SEED-----\nSUAAA\n" in creds
+        assert creds.endswith(
+            "*************************************************************\n"
+        )
+
+
+class TestNscCredsEngine(SimpleTestCase):
+    def test_generate_creds(self):
+        with tempfile.TemporaryDirectory() as d:
+            with override_settings(
+                NATS_NSC_DATA_DIR=os.path.join(d, "stores"),
+                NATS_NSC_KEYSTORE_DIR=os.path.join(d, "keys"),
+                NATS_NKEYS_OPERATOR_NAME="TestOperator",
+            ):
+                account_kp = create_keypair(nkeys.PREFIX_BYTE_ACCOUNT)
+                signing_kp = create_keypair(nkeys.PREFIX_BYTE_ACCOUNT)
+                user_kp = create_keypair(nkeys.PREFIX_BYTE_USER)
+                for kp in (account_kp, signing_kp, user_kp):
+                    _write(
+                        store.keystore_seed_path(public_key(kp)),
+                        kp.seed.decode("ascii"),
+                    )
+                account_jwt = encode_jwt(
+                    {
+                        "name": "acme",
+                        "sub": public_key(account_kp),
+                        "nats": {"signing_keys": [public_key(signing_kp)]},
+                    },
+                    account_kp,
+                )
+                _write(store.account_jwt_path("acme"), account_jwt)
+                user_jwt = encode_jwt(
+                    user_claims("app", public_key(user_kp)), signing_kp
+                )
+                _write(store.user_jwt_path("acme", "app"), user_jwt)
+
+                engine = NscCredsEngine()
+                assert engine.generate_creds("acme", "app") == format_user_creds(
+                    user_jwt, user_kp.seed.decode("ascii")
+                )
+
+
+class TestDescribeJson(SimpleTestCase):
+    def test_describe_json(self):
+        with tempfile.TemporaryDirectory() as d:
+            with override_settings(
+                NATS_NSC_DATA_DIR=d, NATS_NKEYS_OPERATOR_NAME="TestOperator"
+            ):
+                account_kp = create_keypair(nkeys.PREFIX_BYTE_ACCOUNT)
+                user_kp = create_keypair(nkeys.PREFIX_BYTE_USER)
+                _write(
+                    store.account_jwt_path("acme"),
+                    encode_jwt(
+                        {"name": "acme", "sub": public_key(account_kp)}, account_kp
+                    ),
+                )
+                _write(
+                    store.user_jwt_path("acme", "app"),
+                    encode_jwt(user_claims("app", public_key(user_kp)), account_kp),
+                )
+                account = store.describe_json("acme")
+                assert account["sub"] == public_key(account_kp)
+                assert account["name"] == "acme"
+                user = store.describe_json("acme", user_name="app")
+                assert user["sub"] == public_key(user_kp)
+                assert user["iss"] == public_key(account_kp)
+                with self.assertRaises(FileNotFoundError):
+                    store.describe_json("missing")
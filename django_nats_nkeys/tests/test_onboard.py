@@ -0,0 +1,162 @@
+import json
+import os
+import tempfile
+from unittest.mock import patch
+
+from coolname import generate_slug
+from django.contrib.auth import get_user_model
+from django.db.models import QuerySet
+from django.test import SimpleTestCase, TestCase
+
+from django_nats_nkeys.models import (
+    NatsNscStatus,
+    NatsOrganization,
+    NatsOrganizationUser,
+)
+from django_nats_nkeys.onboard import BulkOnboarder, OnboardCheckpoint, read_records
+from django_nats_nkeys.services import nsc_describe_json
+
+User = get_user_model()
+
+
+class TestReadRecords(SimpleTestCase):
+    def test_csv_and_jsonl(self):
+        with tempfile.TemporaryDirectory() as d:
+            csv_path = os.path.join(d, "users.csv")
+            with open(csv_path, "w") as f:
+                f.write("email,org_name\na@test.com,acme\nb@test.com,\n")
+            jsonl_path = os.path.join(d, "users.jsonl")
+            with open(jsonl_path, "w") as f:
+                f.write('{"email": "a@test.com", "org_name": "acme"}\n\n')
+            assert list(read_records(csv_path)) == [
+                {"email": "a@test.com", "org_name": "acme"},
+                {"email": "b@test.com", "org_name": ""},
+            ]
+            assert list(read_records(jsonl_path)) == [
+                {"email": "a@test.com", "org_name": "acme"}
+            ]
+
+    def test_checkpoint_roundtrip(self):
+        with tempfile.TemporaryDirectory() as d:
+            path = os.path.join(d, "checkpoint.json")
+            checkpoint = OnboardCheckpoint.load(path)
+            assert checkpoint.offset == 0
+            checkpoint.offset = 10
+            checkpoint.failed_keys.append("b@test.com")
+            checkpoint.push_error = "nsc push failed"
+            checkpoint.save()
+            loaded = OnboardCheckpoint.load(path)
+            assert loaded.offset == 10
+            assert loaded.failed_keys == ["b@test.com"]
+            assert loaded.push_error == "nsc push failed"
+
+
+class TestBulkOnboard(TestCase):
+    def test_onboard_and_resume(self):
+        emails = [f"{generate_slug(2)}@test.com" for _ in range(3)]
+        records = [{User.USERNAME_FIELD: email} for email in emails]
+        with tempfile.TemporaryDirectory() as d:
+            checkpoint_path = os.path.join(d, "checkpoint.json")
+            onboarder = BulkOnboarder(batch_size=2, checkpoint=checkpoint_path)
+            checkpoint = onboarder.run(iter(records))
+            assert checkpoint.offset == 3
+            assert checkpoint.created == 3
+            with open(checkpoint_path) as f:
+                assert json.load(f)["offset"] == 3
+
+            for email in emails:
+                org_user = NatsOrganizationUser.objects.get(
+                    **{f"user__{User.USERNAME_FIELD}": email}
+                )
+                org = org_user.organization
+                assert org.owner.organization_user == org_user
+                assert org.nsc_status == NatsNscStatus.COMPLETE
+                assert org.json == nsc_describe_json(org.name)
+                assert org_user.json["name"] == org_user.app_name
+
+            # resumed run skips processed records
+            extra = {User.USERNAME_FIELD: f"{generate_slug(2)}@test.com"}
+            onboarder = BulkOnboarder(batch_size=2, checkpoint=checkpoint_path)
+            checkpoint = onboarder.run(iter(records + [extra]))
+            assert checkpoint.offset == 4
+            assert checkpoint.created == 4
+
+    def test_duplicate_records_one_organization(self):
+        email = f"{generate_slug(2)}@test.com"
+        records = [
+            {User.USERNAME_FIELD: email, "org_name": generate_slug(3)},
+            {User.USERNAME_FIELD: email, "org_name": generate_slug(3)},
+        ]
+        with tempfile.TemporaryDirectory() as d:
+            onboarder = BulkOnboarder(checkpoint=os.path.join(d, "checkpoint.json"))
+            checkpoint = onboarder.run(iter(records))
+        assert checkpoint.created == 1
+        org_user = NatsOrganizationUser.objects.get(
+            **{f"user__{User.USERNAME_FIELD}": email}
+        )
+        assert org_user.organization.name == records[0]["org_name"]
+
+    def test_bulk_create_without_returned_pks(self):
+        bulk_create = QuerySet.bulk_create
+
+        def bulk_create_without_pks(queryset, objs, *args, **kwargs):
+            objs = bulk_create(queryset, objs, *args, **kwargs)
+            for obj in objs:
+                obj.pk = None
+            return objs
+
+        emails = [f"{generate_slug(2)}@test.com" for _ in range(2)]
+        with tempfile.TemporaryDirectory() as d, patch.object(
+            QuerySet, "bulk_create", bulk_create_without_pks
+        ):
+            onboarder = BulkOnboarder(checkpoint=os.path.join(d, "checkpoint.json"))
+            checkpoint = onboarder.run(
+                iter([{User.USERNAME_FIELD: email} for email in emails])
+            )
+        assert checkpoint.created == 2
+        for email in emails:
+            org_user = NatsOrganizationUser.objects.get(
+                **{f"user__{User.USERNAME_FIELD}": email}
+            )
+            assert org_user.organization.owner.organization_user == org_user
+            assert org_user.organization.nsc_status == NatsNscStatus.COMPLETE
+
+    def test_taken_org_names(self):
+        taken = NatsOrganization.objects.create(
+            name=generate_slug(3), slug=generate_slug(3)
+        )
+        emails = [f"{generate_slug(2)}@test.com" for _ in range(3)]
+        records = [
+            {User.USERNAME_FIELD: emails[0], "org_name": taken.name},
+            {User.USERNAME_FIELD: emails[1]},
+            {User.USERNAME_FIELD: emails[2], "org_slug": taken.slug},
+        ]
+        generated = iter([taken.name])
+
+        def generate(*args):
+            # the first generated name collides
+            return next(generated, None) or generate_slug(*args)
+
+        with tempfile.TemporaryDirectory() as d, patch(
+            "coolname.generate_slug", side_effect=generate
+        ):
+            onboarder = BulkOnboarder(checkpoint=os.path.join(d, "checkpoint.json"))
+            checkpoint = onboarder.run(iter(records))
+        # rejected instead of failing the batch with an IntegrityError
+        assert checkpoint.failed_keys == [emails[0], emails[2]]
+        assert checkpoint.created == 1
+        org_user = NatsOrganizationUser.objects.get(
+            **{f"user__{User.USERNAME_FIELD}": emails[1]}
+        )
+        assert org_user.organization.name != taken.name
+
+    def test_push_failure_recorded(self):
+        records = [{User.USERNAME_FIELD: f"{generate_slug(2)}@test.com"}]
+        with tempfile.TemporaryDirectory() as d, patch(
+            "django_nats_nkeys.services.nsc_push_now",
+            side_effect=RuntimeError("nsc push failed"),
+        ):
+            path = os.path.join(d, "checkpoint.json")
+            checkpoint = BulkOnboarder(checkpoint=path).run(iter(records))
+            assert checkpoint.push_error == "nsc push failed"
+            assert OnboardCheckpoint.load(path).push_error == "nsc push failed"
@@ -0,0 +1,164 @@
+from unittest.mock import patch
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.test import TransactionTestCase, override_settings
+from django.utils import timezone
+from coolname import generate_slug
+
+from django_nats_nkeys.async_services import acreate_organization
+from django_nats_nkeys.models import (
+    NatsNscOperation,
+    NatsNscOperationType,
+    NatsNscStatus,
+    NatsRobotAccount,
+    NatsRobotApp,
+)
+from django_nats_nkeys.outbox import NscOutboxWorker
+from django_nats_nkeys.store_index import store_index
+
+User = get_user_model()
+
+
+@override_settings(NATS_NSC_PROVISIONING_MODE="OUTBOX")
+class TestOutbox(TransactionTestCase):
+    def test_create_nsc_queues_operations(self):
+        robot_account = NatsRobotAccount.objects.create_nsc(name=generate_slug(3))
+        robot_app = NatsRobotApp.objects.create_nsc(
+            app_name=generate_slug(3), account=robot_account
+        )
+        assert robot_account.nsc_status == NatsNscStatus.PENDING
+        assert robot_app.nsc_status == NatsNscStatus.PENDING
+        assert robot_account.json == {}
+
+        ops = NatsNscOperation.objects.filter(account_name=robot_account.name)
+        assert [op.operation for op in ops.order_by("id")] == [
+            NatsNscOperationType.ADD_ACCOUNT,
+            NatsNscOperationType.ADD_APP,
+        ]
+
+        # only the oldest operation per account is runnable
+        worker = NscOutboxWorker()
+        claimed = worker.claim()
+        assert [op.operation for op in claimed] == [NatsNscOperationType.ADD_ACCOUNT]
+        for op in claimed:
+            assert worker.run_operation(op)
+
+        worker.run(once=True)
+
+        robot_account.refresh_from_db()
+        robot_app.refresh_from_db()
+        assert robot_account.nsc_status == NatsNscStatus.COMPLETE
+        assert robot_app.nsc_status == NatsNscStatus.COMPLETE
+        assert robot_account.json["name"] == robot_account.name
+        assert robot_app.json["name"] == robot_app.app_name
+        assert not ops.exclude(status=NatsNscStatus.COMPLETE).exists()
+
+    def test_failed_operation_backoff(self):
+        robot_account = NatsRobotAccount.objects.create_nsc(name=generate_slug(3))
+        # operation for an account that doesn't exist in the nsc store fails
+        NatsRobotApp.objects.create_nsc(
+            app_name=generate_slug(3), account=robot_account
+        )
+        NatsNscOperation.objects.filter(
+            operation=NatsNscOperationType.ADD_ACCOUNT,
+            account_name=robot_account.name,
+        ).delete()
+
+        worker = NscOutboxWorker()
+        worker.drain_once()
+
+        op = NatsNscOperation.objects.get(account_name=robot_account.name)
+        assert op.status == NatsNscStatus.PENDING
+        assert op.attempts == 1
+        assert op.last_error
+        # backoff delays the retry
+        assert worker.claim() == []
+
+    def test_failed_push_removes_added_account(self):
+        robot_account = NatsRobotAccount.objects.create_nsc(name=generate_slug(3))
+        worker = NscOutboxWorker()
+        with patch(
+            "django_nats_nkeys.services.nsc_push_now",
+            side_effect=RuntimeError("nsc push failed"),
+        ):
+            worker.drain_once()
+        op = NatsNscOperation.objects.get(
+            operation=NatsNscOperationType.ADD_ACCOUNT,
+            account_name=robot_account.name,
+        )
+        assert op.status == NatsNscStatus.PENDING
+        assert op.attempts == 1
+        # added before the push failed, removed so the retry doesn't conflict
+        assert not store_index.has_account(robot_account.name)
+
+        op.next_attempt_at = timezone.now()
+        op.save(update_fields=["next_attempt_at"])
+        worker.drain_once()
+        op.refresh_from_db()
+        assert op.status == NatsNscStatus.COMPLETE
+        assert store_index.has_account(robot_account.name)
+
+    async def test_acreate_organization_queues_operations(self):
+        user = await sync_to_async(User.objects.create)(
+            email="outbox-async@test.com", password="testing1234"
+        )
+        org = await acreate_organization(user, generate_slug(3))
+        assert org.nsc_status == NatsNscStatus.PENDING
+        # queued like create_organization, no nsc command ran
+        assert not store_index.has_account(org.name)
+        ops = await sync_to_async(list)(
+            NatsNscOperation.objects.filter(account_name=org.name)
+            .order_by("id")
+            .values_list("operation", flat=True)
+        )
+        assert ops == [NatsNscOperationType.ADD_ACCOUNT, NatsNscOperationType.ADD_APP]
+
+
+@override_settings(NATS_NSC_PROVISIONING_MODE="ON_COMMIT")
+class TestOnCommit(TransactionTestCase):
+    def test_operations_run_after_commit(self):
+        with transaction.atomic():
+            robot_account = NatsRobotAccount.objects.create_nsc(name=generate_slug(3))
+            robot_app = NatsRobotApp.objects.create_nsc(
+                app_name=generate_slug(3), account=robot_account
+            )
+            # nothing runs before commit
+            assert not store_index.has_account(robot_account.name)
+
+        robot_account.refresh_from_db()
+        robot_app.refresh_from_db()
+        assert robot_account.nsc_status == NatsNscStatus.COMPLETE
+        assert robot_app.nsc_status == NatsNscStatus.COMPLETE
+        assert robot_app.json["name"] == robot_app.app_name
+        assert (
+            not NatsNscOperation.objects.filter(account_name=robot_account.name)
+            .exclude(status=NatsNscStatus.COMPLETE)
+            .exists()
+        )
+
+    def test_rolled_back_operations_never_run(self):
+        name = generate_slug(3)
+        try:
+            with transaction.atomic():
+                NatsRobotAccount.objects.create_nsc(name=name)
+                raise RuntimeError("rollback")
+        except RuntimeError:
+            pass
+        assert not NatsNscOperation.objects.filter(account_name=name).exists()
+        assert not store_index.has_account(name)
+
+    def test_failed_operation_left_to_worker(self):
+        with transaction.atomic():
+            robot_account = NatsRobotAccount.objects.create_nsc(name=generate_slug(3))
+            # operation for an account that doesn't exist in the nsc store fails
+            NatsNscOperation.objects.filter(account_name=robot_account.name).delete()
+            robot_app = NatsRobotApp.objects.create_nsc(
+                app_name=generate_slug(3), account=robot_account
+            )
+
+        op = NatsNscOperation.objects.get(account_name=robot_account.name)
+        assert op.status == NatsNscStatus.PENDING
+        assert op.attempts == 1
+        assert not store_index.has_user(robot_account.name, robot_app.app_name)
@@ -0,0 +1,99 @@
+import time
+from types import SimpleNamespace
+
+from django.test import SimpleTestCase
+
+from django_nats_nkeys.models import NatsOrganizationApp
+from django_nats_nkeys.permissions import (
+    NatsPermissionsIndex,
+    compile_permissions,
+)
+
+
+def _app(**kwargs):
+    return SimpleNamespace(**kwargs)
+
+
+class TestNatsPermissions(SimpleTestCase):
+    def test_no_permissions_allow_everything(self):
+        permissions = compile_permissions(_app())
+        assert permissions.can_publish("a.b")
+        assert permissions.can_subscribe(">")
+
+    def test_allow_and_deny(self):
+        permissions = compile_permissions(
+            _app(allow_pub="orders.>, audit", deny_pub="orders.internal.*")
+        )
+        assert permissions.can_publish("orders.created")
+        assert permissions.can_publish("audit")
+        assert not permissions.can_publish("audit.x")
+        # deny wins over allow
+        assert not permissions.can_publish("orders.internal.x")
+        # pub allow list doesn't restrict sub
+        assert permissions.can_subscribe("anything")
+
+    def test_pubsub(self):
+        permissions = compile_permissions(
+            _app(allow_pubsub="chat.*", deny_pubsub="chat.admin")
+        )
+        for check in (permissions.can_publish, permissions.can_subscribe):
+            assert check("chat.general")
+            assert not check("chat.admin")
+            assert not check("other")
+
+    def test_wildcard_subscription(self):
+        permissions = compile_permissions(
+            _app(allow_sub="events.>", deny_sub="events.secret")
+        )
+        assert permissions.can_subscribe("events.*")
+        assert not permissions.can_subscribe(">")
+        assert not permissions.can_subscribe("events.secret")
+
+    def test_cached_on_instance(self):
+        app = NatsOrganizationApp(app_name="app", allow_pub="a")
+        compiled = app.nats_permissions
+        assert app.nats_permissions is compiled
+        assert app.can_publish("a") and not app.can_publish("b")
+        app.allow_pub = "b"
+        assert app.nats_permissions is not compiled
+        assert app.can_publish("b") and not app.can_publish("a")
+
+    def test_index(self):
+        apps = [
+            _app(name="all"),
+            _app(name="orders", allow_pub="orders.>"),
+            _app(name="no-internal", deny_pub="orders.internal.>"),
+            _app(name="sub-only", allow_sub="orders.>", allow_pub="none"),
+        ]
+        index = NatsPermissionsIndex(apps)
+        names = lambda apps: [app.name for app in apps]
+        assert names(index.can_publish("orders.created")) == [
+            "all",
+            "orders",
+            "no-internal",
+        ]
+        assert names(index.can_publish("orders.internal.x")) == ["all", "orders"]
+        assert names(index.can_subscribe("orders.created")) == [
+            "all",
+            "orders",
+            "no-internal",
+            "sub-only",
+        ]
+        for subject in ["orders.created", "orders.internal.x", "billing"]:
+            for direction in ("pub", "sub"):
+                assert index.allowed(direction, subject) == [
+                    app
+                    for app in apps
+                    if compile_permissions(app).allowed(direction, subject)
+                ]
+
+    def test_index_time(self):
+        apps = [
+            _app(allow_pub=f"tenant.{i}.>", deny_pub=f"tenant.{i}.admin")
+            for i in range(5000)
+        ]
+        index = NatsPermissionsIndex(apps)
+        started = time.perf_counter()
+        for i in range(1000):
+            assert index.can_publish(f"tenant.{i}.events") == [apps[i]]
+        assert time.perf_counter() - started < 2
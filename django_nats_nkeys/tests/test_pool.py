@@ -0,0 +1,64 @@
+from unittest.mock import patch
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+
+from django_nats_nkeys.async_services import (
+    acreate_org_owner_units_for_authenticated_user,
+)
+from django_nats_nkeys.models import NatsPooledAccount
+from django_nats_nkeys.pool import claim_pooled_account, nsc_pool_top_up
+from django_nats_nkeys.services import (
+    get_or_create_org_owner_units_for_authenticated_user,
+)
+from django_nats_nkeys.store_index import store_index
+
+User = get_user_model()
+
+
+class TestAccountPool(TestCase):
+    def test_top_up_and_claim(self):
+        assert nsc_pool_top_up(2) == 2
+        assert nsc_pool_top_up(2) == 0
+        entry = NatsPooledAccount.objects.order_by("pk").first()
+        assert store_index.has_account(entry.name)
+        assert store_index.has_user(entry.name, entry.app_name)
+        assert entry.json["name"] == entry.name
+
+        user = User.objects.create(email="pool@test.com", password="testing1234")
+        # only rows are written, no nsc command runs
+        with patch("django_nats_nkeys.services.run_nsc_and_log_output") as mock_nsc:
+            org, org_owner, org_user = claim_pooled_account(user)
+        mock_nsc.assert_not_called()
+        assert org.name == entry.name
+        assert org.jetstream_enabled
+        assert org_user.app_name == entry.app_name
+        assert org_user.user == user
+        assert org_owner.organization_user == org_user
+        assert NatsPooledAccount.objects.count() == 1
+
+    @override_settings(NATS_NSC_ACCOUNT_POOL_SIZE=1)
+    def test_signup_claims_pooled_account(self):
+        nsc_pool_top_up()
+        entry = NatsPooledAccount.objects.get()
+        user = User.objects.create(email="pool-signup@test.com", password="testing1234")
+        created, (org, _, org_user) = (
+            get_or_create_org_owner_units_for_authenticated_user(user)
+        )
+        assert created
+        assert org.name == entry.name
+        assert org_user.app_name == entry.app_name
+        assert not NatsPooledAccount.objects.exists()
+
+    @override_settings(NATS_NSC_ACCOUNT_POOL_SIZE=1)
+    async def test_async_signup_claims_pooled_account(self):
+        await sync_to_async(nsc_pool_top_up)()
+        entry = await sync_to_async(NatsPooledAccount.objects.get)()
+        user = await sync_to_async(User.objects.create)(
+            email="pool-async@test.com", password="testing1234"
+        )
+        org, _, org_user = await acreate_org_owner_units_for_authenticated_user(user)
+        assert org.name == entry.name
+        assert org_user.app_name == entry.app_name
+        assert not await sync_to_async(NatsPooledAccount.objects.exists)()
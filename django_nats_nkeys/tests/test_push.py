@@ -0,0 +1,113 @@
+import os
+import subprocess
+import sys
+import time
+from unittest.mock import patch
+
+from django.conf import settings
+from django.test import SimpleTestCase, override_settings
+
+from django_nats_nkeys.push import PushScheduler
+from django_nats_nkeys.services import nsc_push, nsc_push_accounts
+
+
+class TestPushScheduler(SimpleTestCase):
+    def setUp(self):
+        self.scheduler = PushScheduler()
+        patcher = patch("django_nats_nkeys.services.nsc_push_now")
+        self.push_now = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.push_now.side_effect = lambda account=None: account
+
+    def test_coalesce_per_account(self):
+        futures = [self.scheduler.schedule("acme", debounce=0.05) for _ in range(5)]
+        futures.append(self.scheduler.schedule("robots", debounce=0.05))
+        assert all(
+            f.result(timeout=5) == f_acct
+            for f, f_acct in zip(futures, ["acme"] * 5 + ["robots"])
+        )
+        assert sorted(c.kwargs["account"] for c in self.push_now.call_args_list) == [
+            "acme",
+            "robots",
+        ]
+        metrics = self.scheduler.metrics()
+        assert metrics["requested"] == 6
+        assert metrics["issued"] == 2
+        assert metrics["coalesced"] == 4
+        assert metrics["pending"] == 0
+
+    def test_flush(self):
+        future = self.scheduler.schedule("acme", debounce=60)
+        assert not future.done()
+        self.scheduler.flush("acme")
+        assert future.result(timeout=0) == "acme"
+        assert self.scheduler.metrics()["pending"] == 0
+
+    @override_settings(NATS_NSC_PUSH_MAX_ATTEMPTS=1)
+    def test_failed_push(self):
+        self.push_now.side_effect = RuntimeError("nsc push failed")
+        future = self.scheduler.schedule("acme", debounce=0)
+        with self.assertRaises(RuntimeError):
+            future.result(timeout=5)
+        metrics = self.scheduler.metrics()
+        assert metrics["failed"] == 1
+        assert metrics["retried"] == 0
+        assert metrics["pending"] == 0
+
+    @override_settings(NATS_NSC_PUSH_DEBOUNCE=60)
+    def test_failed_push_retried(self):
+        self.push_now.side_effect = [RuntimeError("nsc push failed"), "acme"]
+        future = self.scheduler.schedule("acme", debounce=0)
+        with self.assertRaises(RuntimeError):
+            future.result(timeout=5)
+        # marked pending again instead of dropped
+        metrics = self.scheduler.metrics()
+        assert metrics["retried"] == 1
+        assert metrics["pending"] == 1
+        self.scheduler.flush("acme")
+        assert self.push_now.call_count == 2
+        assert self.scheduler.metrics()["pending"] == 0
+
+    @override_settings(NATS_NSC_PUSH_DEBOUNCE=0.05, NATS_NSC_PUSH_MAX_ATTEMPTS=1)
+    def test_push_accounts_reports_coalesced_failures(self):
+        error = RuntimeError("nsc push failed")
+
+        def push_now(account=None):
+            if account == "robots":
+                raise error
+            return account
+
+        self.push_now.side_effect = push_now
+        with patch("django_nats_nkeys.services.push_scheduler", self.scheduler):
+            assert nsc_push_accounts(["acme", "robots", "acme"]) == [("robots", error)]
+        assert self.push_now.call_count == 2
+
+    @override_settings(NATS_NSC_PUSH_DEBOUNCE=0.05)
+    def test_nsc_push_wait(self):
+        with patch("django_nats_nkeys.services.push_scheduler", self.scheduler):
+            start = time.monotonic()
+            assert nsc_push(account="acme") is None
+            assert nsc_push(account="acme", wait=True) == "acme"
+            assert time.monotonic() - start >= 0.05
+        assert self.push_now.call_count == 1
+
+    def test_flush_at_exit(self):
+        # pushes still pending at interpreter exit go through nsc_executor before its pool shuts down
+        code = "; ".join(
+            [
+                "import django",
+                "django.setup()",
+                "from django_nats_nkeys import services",
+                "from django_nats_nkeys.executor import nsc_executor",
+                "from django_nats_nkeys.push import push_scheduler",
+                "services.nsc_push_now = lambda account=None: nsc_executor.submit(print, 'pushed', account).result()",
+                "push_scheduler.schedule('acme', debounce=60)",
+            ]
+        )
+        result = subprocess.run(
+            [sys.executable, "-c", code],
+            capture_output=True,
+            text=True,
+            env={**os.environ, "DJANGO_SETTINGS_MODULE": settings.SETTINGS_MODULE},
+        )
+        assert result.stdout == "pushed acme\n", result.stderr
@@ -0,0 +1,189 @@
+from types import SimpleNamespace
+from unittest.mock import patch
+
+from coolname import generate_slug
+from django.contrib.auth import get_user_model
+from django.db import connection, models
+from django.db.models import F
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from django_nats_nkeys.models import (
+    NatsOrganizationApp,
+    NatsOrganizationUser,
+    NatsRobotAccount,
+    NatsRobotApp,
+)
+from django_nats_nkeys.reconcile import (
+    NscReconcileOperation,
+    NscReconciler,
+    app_permissions,
+    jetstream_matches,
+    nsc_edit_user_cmds,
+    nsc_reconcile,
+    size_values,
+)
+from django_nats_nkeys.services import create_organization, nsc_describe_json
+
+User = get_user_model()
+
+
+def _app(**kwargs):
+    fields = {
+        "app_name": "app",
+        "bearer": False,
+        "allow_pub": None,
+        "allow_pubsub": None,
+        "allow_sub": None,
+        "deny_pub": None,
+        "deny_pubsub": None,
+        "deny_sub": None,
+    }
+    fields.update(kwargs)
+    return SimpleNamespace(**fields)
+
+
+class TestReconcileDiff(SimpleTestCase):
+    def test_app_permissions(self):
+        permissions = app_permissions(_app(allow_pub="a.>, b", allow_pubsub="c"))
+        assert permissions["pub.allow"] == {"a.>", "b", "c"}
+        assert permissions["sub.allow"] == {"c"}
+        assert permissions["pub.deny"] == set()
+
+    def test_edit_user_in_sync(self):
+        claims = {"nats": {"pub": {"allow": ["a"]}, "sub": {}}}
+        assert nsc_edit_user_cmds("acme", _app(allow_pub="a"), claims) == []
+
+    def test_edit_user_missing_and_extra(self):
+        claims = {"nats": {"pub": {"allow": ["a", "old"]}, "sub": {}}}
+        cmds = nsc_edit_user_cmds("acme", _app(allow_pub="a,b"), claims)
+        edit_user = ["nsc", "edit", "user", "--account", "acme", "--name", "app"]
+        assert cmds == [
+            edit_user + ["--rm", "old"],
+            edit_user + ["--allow-pub", "a,b"],
+        ]
+
+    def test_edit_user_bearer(self):
+        claims = {"nats": {"bearer_token": True}}
+        assert nsc_edit_user_cmds("acme", _app(), claims) == [
+            ["nsc", "edit", "user", "--account", "acme", "--name", "app"]
+            + ["--bearer=false"]
+        ]
+
+    def test_jetstream_matches(self):
+        assert size_values("1M") == {1000**2, 1024**2}
+        assert size_values("512") == {512}
+        org = SimpleNamespace(
+            jetstream_max_mem="1M",
+            jetstream_max_file="5MB",
+            jetstream_max_streams=10,
+            jetstream_max_consumers=10,
+        )
+        limits = {
+            "mem_storage": 1000**2,
+            "disk_storage": 5 * 1024**2,
+            "streams": 10,
+            "consumer": 10,
+        }
+        assert jetstream_matches(org, {"nats": {"limits": limits}})
+        limits["streams"] = 5
+        assert not jetstream_matches(org, {"nats": {"limits": limits}})
+        assert not jetstream_matches(org, {})
+
+    def test_version_bumped_in_update_fields(self):
+        app = NatsRobotApp(pk=1, app_name="app", nsc_version=3)
+        app._state.adding = False
+        with patch.object(models.Model, "save") as mock_save:
+            app.save(update_fields=["allow_pub"])
+            assert mock_save.call_args.kwargs["update_fields"] == {
+                "allow_pub",
+                "nsc_version",
+            }
+            assert app.nsc_version == F("nsc_version") + 1
+
+            app.nsc_version = 3
+            app.save(update_fields=["json"])
+            assert mock_save.call_args.kwargs["update_fields"] == {"json"}
+            assert app.nsc_version == 3
+
+
+class TestReconcile(TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.user = User.objects.create(
+            email="reconcile@test.com", password="testing1234", is_superuser=False
+        )
+        cls.org = create_organization(
+            cls.user, generate_slug(3), org_user_defaults={"is_admin": True}
+        )
+        cls.org_user = NatsOrganizationUser.objects.get(user=cls.user)
+        cls.app = NatsOrganizationApp.objects.create_nsc(
+            app_name=generate_slug(3),
+            organization_user=cls.org_user,
+            organization=cls.org,
+        )
+
+    def test_version_bumped_on_save(self):
+        version = NatsOrganizationApp.objects.get(pk=self.app.pk).nsc_version
+        self.app.allow_pub = "reconcile.test"
+        with CaptureQueriesContext(connection) as queries:
+            self.app.save()
+        # bumped in the UPDATE itself, not read back
+        assert [q["sql"].split()[0] for q in queries.captured_queries] == ["UPDATE"]
+        assert self.app.nsc_version == version + 1
+        # saving json only doesn't mark the row changed
+        self.app.save(update_fields=["json"])
+        assert self.app.nsc_version == version + 1
+
+        with CaptureQueriesContext(connection) as queries:
+            self.app.save(update_fields=["allow_pub"])
+        assert [q["sql"].split()[0] for q in queries.captured_queries] == ["UPDATE"]
+        assert '"nsc_version"' in queries.captured_queries[0]["sql"]
+        assert self.app.nsc_version == version + 2
+
+    def test_reconcile_permissions_and_missing_rows(self):
+        nsc_reconcile(full=True)
+        assert not NscReconciler().plan().actions
+
+        # rows changed without nsc, as if the nsc edit failed in STRICT mode
+        NatsOrganizationApp.objects.filter(pk=self.app.pk).update(
+            allow_sub="reconcile.>"
+        )
+        self.app.refresh_from_db()
+        self.app.save()
+        robot = NatsRobotAccount.objects.create(name=generate_slug(3))
+        robot_app = NatsRobotApp.objects.create(
+            app_name=generate_slug(3), account=robot
+        )
+
+        plan = NscReconciler().plan()
+        operations = {(a.operation, a.account_name) for a in plan.actions}
+        assert (NscReconcileOperation.EDIT_USER, self.org.name) in operations
+        assert (NscReconcileOperation.ADD_ACCOUNT, robot.name) in operations
+        assert (NscReconcileOperation.ADD_USER, robot.name) in operations
+
+        result = NscReconciler().apply(plan)
+        assert result.ok()
+        assert robot.name in result.pushed
+        claims = nsc_describe_json(self.org.name, app_name=self.app.app_name)
+        assert "reconcile.>" in claims["nats"]["sub"]["allow"]
+        robot_app.refresh_from_db()
+        assert robot_app.nsc_reconciled_version == robot_app.nsc_version
+        assert robot_app.json == nsc_describe_json(
+            robot.name, app_name=robot_app.app_name
+        )
+
+        # nothing changed since
+        assert not NscReconciler().plan().actions
+
+    @override_settings(NATS_NSC_PUSH_DEBOUNCE=0.01, NATS_NSC_PUSH_MAX_ATTEMPTS=1)
+    def test_failed_coalesced_push_left_unreconciled(self):
+        robot = NatsRobotAccount.objects.create(name=generate_slug(3))
+        error = RuntimeError("nsc push failed")
+        with patch("django_nats_nkeys.services.nsc_push_now", side_effect=error):
+            result = NscReconciler().apply(NscReconciler().plan())
+        assert (robot.name, error) in result.push_failed
+        assert robot.name not in result.pushed
+        robot.refresh_from_db()
+        assert robot.nsc_reconciled_version < robot.nsc_version
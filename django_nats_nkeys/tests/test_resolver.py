@@ -0,0 +1,56 @@
+import json
+
+from coolname import generate_slug
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from django_nats_nkeys.errors import NatsResolverError
+from django_nats_nkeys.models import NatsRobotAccount
+from django_nats_nkeys.resolver import parse_claims_update_reply, resolver_pusher
+from django_nats_nkeys.services import nsc_push
+
+
+class TestClaimsUpdateReply(SimpleTestCase):
+    def test_ack(self):
+        data = json.dumps(
+            {
+                "server": {"name": "localnats"},
+                "data": {"account": "ABC", "code": 200, "message": "jwt updated"},
+            }
+        ).encode()
+        assert parse_claims_update_reply("acme", data)["message"] == "jwt updated"
+
+    def test_error(self):
+        data = json.dumps(
+            {
+                "server": {"name": "localnats"},
+                "error": {"account": "ABC", "code": 500, "description": "bad jwt"},
+            }
+        ).encode()
+        with self.assertRaises(NatsResolverError) as ctx:
+            parse_claims_update_reply("acme", data)
+        assert ctx.exception.code == 500
+        assert ctx.exception.account == "acme"
+
+    def test_invalid_reply(self):
+        with self.assertRaises(NatsResolverError):
+            parse_claims_update_reply("acme", b"not json")
+
+
+@override_settings(NATS_NSC_PUSH_BACKEND="NATS")
+class TestNatsResolverPush(TestCase):
+    """
+    Requires nats-server running with .nats/nats-server.conf
+    """
+
+    def tearDown(self):
+        resolver_pusher.close()
+
+    def test_push_account(self):
+        robot_account = NatsRobotAccount.objects.create_nsc(name=generate_slug(3))
+        acks = nsc_push(account=robot_account.name)
+        assert len(acks) == 1
+        assert acks[0]["account"] == robot_account.json["sub"]
+        # connection is reused
+        nc = resolver_pusher._nc
+        nsc_push(account=robot_account.name)
+        assert resolver_pusher._nc is nc
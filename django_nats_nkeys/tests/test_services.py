@@ -2,14 +2,16 @@ import pytest
 import tempfile
 import zipfile
 import os
+from unittest.mock import MagicMock, patch
 from asgiref.sync import async_to_sync, sync_to_async
 
-from django.test import TestCase
+from django.test import SimpleTestCase, TestCase, override_settings
 from django.contrib.auth import get_user_model
 from django.db import IntegrityError
 from django_nats_nkeys.models import (
     NatsMessageExport,
     NatsMessageExportType,
+    NatsNscStatus,
     NatsOrganizationApp,
     NatsOrganizationOwner,
     NatsRobotAccount,
@@ -20,12 +22,19 @@ from coolname import generate_slug
 import nats
 import paho.mqtt.client as mqtt
 
+from django_nats_nkeys.async_services import (
+    aget_or_create_org_owner_units_for_authenticated_user,
+)
 from django_nats_nkeys.services import (
     create_organization,
     nsc_describe_json,
     nsc_generate_creds,
     nsc_validate,
     get_or_create_org_owner_units_for_authenticated_user,
+    nsc_batch,
+    nsc_bulk_add_apps,
+    nsc_push,
+    save_describe_json,
 )
 
 User = get_user_model()
@@ -176,6 +185,62 @@ class TestGetOrCreateOwnerUnits(TestCase):
         ) = get_or_create_org_owner_units_for_authenticated_user(self.user)
         assert created == False
 
+    def test_existing_units_single_query_memoized(self):
+        created, units = get_or_create_org_owner_units_for_authenticated_user(self.user)
+        user = User.objects.get(pk=self.user.pk)
+        with self.assertNumQueries(1):
+            created, (
+                org,
+                org_owner,
+                org_user,
+            ) = get_or_create_org_owner_units_for_authenticated_user(user)
+            assert org_owner.organization_user_id == org_user.pk
+            assert org_user.organization_id == org.pk
+        assert created == False
+        assert (org, org_owner, org_user) == units
+        # memoized on the user instance, e.g. request.user
+        with self.assertNumQueries(0):
+            assert get_or_create_org_owner_units_for_authenticated_user(user) == (
+                False,
+                units,
+            )
+
+    def test_nsc_runs_after_commit(self):
+        user = User.objects.create(email="commit@test.com", password="testing1234")
+        with patch(
+            "django_nats_nkeys.services.nsc_provision_organization"
+        ) as mock_provision:
+            with self.captureOnCommitCallbacks(execute=False) as callbacks:
+                created, (org, _, org_user) = (
+                    get_or_create_org_owner_units_for_authenticated_user(user)
+                )
+            # user's row stays locked only while the rows are written
+            mock_provision.assert_not_called()
+            assert created
+            assert org.nsc_status == NatsNscStatus.PENDING
+            assert len(callbacks) == 1
+            callbacks[0]()
+        mock_provision.assert_called_once_with(org, org_user)
+
+    async def test_async_shares_lock_and_memo(self):
+        user = await sync_to_async(User.objects.create)(
+            email="async-commit@test.com", password="testing1234"
+        )
+        with patch(
+            "django_nats_nkeys.async_services.ansc_provision_organization"
+        ) as mock_provision:
+            created, units = (
+                await aget_or_create_org_owner_units_for_authenticated_user(user)
+            )
+        assert created
+        org, _, org_user = units
+        mock_provision.assert_awaited_once_with(org, org_user)
+        assert org.nsc_status == NatsNscStatus.PENDING
+        assert get_or_create_org_owner_units_for_authenticated_user(user) == (
+            False,
+            units,
+        )
+
 
 class TestSharedServices(TestCase):
     @classmethod
@@ -305,6 +370,42 @@ class TestSharedServices(TestCase):
 
         assert self.robot_app.nsc_validate().ok() is True
 
+    def test_bulk_create_robot_apps(self):
+        robot_account = NatsRobotAccount.objects.create_nsc(name=generate_slug(3))
+        names = [generate_slug(3) for _ in range(5)]
+        result = NatsRobotApp.objects.bulk_create_nsc(
+            [
+                NatsRobotApp(
+                    app_name=name, account=robot_account, allow_sub="devices.>"
+                )
+                for name in names
+            ]
+        )
+        assert result.failed == []
+        assert sorted(app.app_name for app in result.succeeded) == sorted(names)
+        for app in NatsRobotApp.objects.filter(account=robot_account):
+            assert app.json == nsc_describe_json(
+                robot_account.name, app_name=app.app_name
+            )
+            assert app.json["nats"]["sub"]["allow"] == ["devices.>"]
+
+    @override_settings(NATS_NSC_PUSH_DEBOUNCE=0.01, NATS_NSC_PUSH_MAX_ATTEMPTS=1)
+    def test_bulk_add_apps_push_failed(self):
+        robot_account = NatsRobotAccount.objects.create_nsc(name=generate_slug(3))
+        # only account_id set, the account is loaded once before the workers run
+        apps = NatsRobotApp.objects.bulk_create(
+            [
+                NatsRobotApp(app_name=generate_slug(3), account_id=robot_account.pk)
+                for _ in range(3)
+            ]
+        )
+        error = RuntimeError("nsc push failed")
+        with patch("django_nats_nkeys.services.nsc_push_now", side_effect=error):
+            result = nsc_bulk_add_apps(apps)
+        assert result.succeeded == []
+        assert result.failed == [(app, error) for app in apps]
+        assert all(NatsRobotApp.account.is_cached(app) for app in apps)
+
     def test_validator(self):
         validator = nsc_validate(account_name=self.org_name)
         assert validator.ok() is True
@@ -512,6 +613,34 @@ class TestPublicStreamExport(TestCase):
             == self.org.json["nats"]["exports"][0]["subject"]
         )
 
+    def test_add_multiple_exports(self):
+        msg_streams = [
+            NatsMessageExport.objects.create(
+                name=f"multi-{i}",
+                subject_pattern=f"multi.{i}.>",
+                public=True,
+                export_type=NatsMessageExportType.STREAM,
+            )
+            for i in range(2)
+        ]
+        self.robot_account.imports.add(*msg_streams)
+
+        # one m2m_changed signal with both pks
+        self.org.exports.add(*msg_streams)
+
+        self.org.refresh_from_db()
+        self.robot_account.refresh_from_db()
+        assert {e["subject"] for e in self.org.json["nats"]["exports"]} >= {
+            "multi.0.>",
+            "multi.1.>",
+        }
+        imported = {
+            i["subject"]
+            for i in self.robot_account.json["nats"]["imports"]
+            if i["account"] == self.org.json["sub"]
+        }
+        assert imported >= {"multi.0.>", "multi.1.>"}
+
 
 class TestPrivateStreamExport(TestCase):
     @classmethod
@@ -607,3 +736,49 @@ class TestPrivateStreamExport(TestCase):
             == subject_pattern
             == self.org.json["nats"]["exports"][0]["subject"]
         )
+
+
+class TestNscBatch(SimpleTestCase):
+    def test_single_push_per_account(self):
+        with tempfile.TemporaryDirectory() as d, override_settings(
+            NATS_NSC_LOCK_DIR=d
+        ), patch("django_nats_nkeys.executor.subprocess.run") as mock_run:
+            with nsc_batch():
+                nsc_push(account="acme")
+                nsc_push(account="acme")
+                with nsc_batch():
+                    nsc_push(account="robots")
+                assert mock_run.call_count == 0
+            assert mock_run.call_count == 2
+            pushed = [call.args[0][3] for call in mock_run.call_args_list]
+            assert pushed == ["acme", "robots"]
+
+    def test_single_describe_per_object(self):
+        obj = MagicMock()
+        obj._meta.label = "django_nats_nkeys.NatsOrganization"
+        obj.pk = 1
+        with patch(
+            "django_nats_nkeys.services.nsc_describe_json", return_value={"sub": "A"}
+        ) as mock_describe:
+            with nsc_batch():
+                save_describe_json("acme", obj)
+                save_describe_json("acme", obj)
+                assert mock_describe.call_count == 0
+            mock_describe.assert_called_once_with("acme", app_name=None)
+        assert obj.json == {"sub": "A"}
+        obj.save.assert_called_once()
+
+    def test_flush_on_error(self):
+        with patch("django_nats_nkeys.services.nsc_push_now") as mock_push:
+            with self.assertRaises(RuntimeError):
+                with nsc_batch():
+                    nsc_push(account="acme")
+                    raise RuntimeError("edit failed")
+            # the local store has the edits, push them
+            mock_push.assert_called_once_with(account="acme")
+            mock_push.reset_mock()
+            with self.assertRaises(RuntimeError):
+                with nsc_batch(flush_on_error=False):
+                    nsc_push(account="acme")
+                    raise RuntimeError("edit failed")
+            mock_push.assert_not_called()
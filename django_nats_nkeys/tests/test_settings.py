@@ -1,8 +1,12 @@
 """
 dj-stripe Migrations Tests
 """
+import time
+from unittest.mock import patch
+
 import pytest
-from django.test import TestCase, override_settings
+from django.apps import apps as django_apps
+from django.test import SimpleTestCase, TestCase, override_settings
 from django.core.exceptions import ImproperlyConfigured
 from django_nats_nkeys.settings import nats_nkeys_settings
 
@@ -88,3 +92,58 @@ class TestSettings(TestCase):
             NatsOrganizationApp,
             NatsRobotApp,
         ]
+
+
+class TestCachedSettings(SimpleTestCase):
+    def test_cleared_on_setting_changed(self):
+        assert nats_nkeys_settings.NATS_NKEYS_OPERATOR_NAME == "DjangoOperator"
+        with override_settings(NATS_NKEYS_OPERATOR_NAME="Changed"):
+            assert nats_nkeys_settings.NATS_NKEYS_OPERATOR_NAME == "Changed"
+        assert nats_nkeys_settings.NATS_NKEYS_OPERATOR_NAME == "DjangoOperator"
+
+    def test_cached_app_models_copied(self):
+        app_models = nats_nkeys_settings.get_nats_app_models()
+        app_models.append(None)
+        assert None not in nats_nkeys_settings.get_nats_app_models()
+
+    def test_model_lookup_cached(self):
+        """
+        get_nats_account_model() (called by every create_organization()) resolves the model once
+        """
+        nats_nkeys_settings.clear()
+        model = nats_nkeys_settings.get_nats_account_model()
+        with patch.object(
+            django_apps, "get_model", wraps=django_apps.get_model
+        ) as mock_get_model:
+            assert nats_nkeys_settings.get_nats_account_model() is model
+            mock_get_model.assert_not_called()
+            nats_nkeys_settings.clear()
+            nats_nkeys_settings.get_nats_account_model()
+            mock_get_model.assert_called_once_with(
+                nats_nkeys_settings.get_nats_account_model_string()
+            )
+        nats_nkeys_settings.clear()
+
+
+@pytest.mark.benchmark
+class TestCachedSettingsBenchmark(SimpleTestCase):
+    def test_model_lookup(self):
+        """
+        Reports the cost of get_nats_account_model(), resolved on every call vs cached
+        """
+
+        def per_call(clear: bool) -> float:
+            started = time.perf_counter()
+            for _ in range(10000):
+                if clear:
+                    nats_nkeys_settings.clear()
+                nats_nkeys_settings.get_nats_account_model()
+            return (time.perf_counter() - started) / 10000
+
+        resolved = per_call(clear=True)
+        cached = per_call(clear=False)
+        nats_nkeys_settings.clear()
+        print(
+            f"get_nats_account_model(): {resolved * 1e6:.2f}us resolved, "
+            f"{cached * 1e6:.2f}us cached"
+        )
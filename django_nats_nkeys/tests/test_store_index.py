@@ -0,0 +1,137 @@
+import os
+import shutil
+import tempfile
+from unittest.mock import patch
+
+import nkeys
+from django.test import SimpleTestCase, override_settings
+
+from django_nats_nkeys import store
+from django_nats_nkeys.tests.jwt_fixtures import (
+    create_keypair,
+    encode_jwt,
+    public_key,
+    user_claims,
+)
+from django_nats_nkeys.services import nsc_skip_add
+from django_nats_nkeys.store_index import NscStoreIndex
+
+
+def _write(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        f.write(data)
+
+
+def _add_account(name):
+    kp = create_keypair(nkeys.PREFIX_BYTE_ACCOUNT)
+    _write(
+        store.account_jwt_path(name),
+        encode_jwt({"name": name, "sub": public_key(kp)}, kp),
+    )
+    return kp
+
+
+def _add_user(account_name, account_kp, name):
+    kp = create_keypair(nkeys.PREFIX_BYTE_USER)
+    _write(
+        store.user_jwt_path(account_name, name),
+        encode_jwt(user_claims(name, public_key(kp)), account_kp),
+    )
+    return kp
+
+
+class TestNscStoreIndex(SimpleTestCase):
+    def setUp(self):
+        self.data_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.data_dir.cleanup)
+        settings_override = override_settings(
+            NATS_NSC_DATA_DIR=self.data_dir.name,
+            NATS_NKEYS_OPERATOR_NAME="TestOperator",
+            NATS_NSC_STORE_INDEX_POLL_INTERVAL=0,
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.index = NscStoreIndex()
+
+    def test_lookup(self):
+        acme_kp = _add_account("acme")
+        app_kp = _add_user("acme", acme_kp, "app")
+        assert self.index.account_names() == ["acme"]
+        assert self.index.account("acme").public_key == public_key(acme_kp)
+        assert self.index.user("acme", "app").public_key == public_key(app_kp)
+        assert self.index.has_user("acme", "app")
+        assert not self.index.has_user("acme", "missing")
+        assert not self.index.has_account("missing")
+
+    def test_incremental_refresh(self):
+        acme_kp = _add_account("acme")
+        assert self.index.user_names("acme") == []
+        with patch.object(
+            self.index, "_index_account", wraps=self.index._index_account
+        ) as index_account:
+            # changes made by another process
+            _add_account("robots")
+            _add_user("acme", acme_kp, "app")
+            assert self.index.account_names() == ["acme", "robots"]
+            assert self.index.user_names("acme") == ["app"]
+            # only the new account was scanned
+            assert [c.args[0] for c in index_account.call_args_list] == ["robots"]
+
+        shutil.rmtree(store.account_dir("robots"))
+        os.remove(store.user_jwt_path("acme", "app"))
+        assert self.index.account_names() == ["acme"]
+        assert self.index.user_names("acme") == []
+
+    @override_settings(NATS_NSC_STORE_INDEX_POLL_INTERVAL=3600)
+    def test_poll_interval(self):
+        _add_account("acme")
+        assert self.index.account_names() == ["acme"]
+        _add_account("robots")
+        assert self.index.account_names() == ["acme"]
+        self.index.nsc_command_ran(["nsc", "add", "account", "--name", "robots"])
+        assert self.index.account_names() == ["acme", "robots"]
+
+    @override_settings(NATS_NSC_STORE_INDEX_POLL_INTERVAL=3600)
+    def test_nsc_command_updates_entry(self):
+        acme_kp = _add_account("acme")
+        assert self.index.account_names() == ["acme"]
+        with patch.object(
+            self.index, "_index_users", wraps=self.index._index_users
+        ) as index_users:
+            for name in ["a", "b", "c"]:
+                _add_account(name)
+                self.index.nsc_command_ran(["nsc", "add", "account", "--name", name])
+                assert self.index.has_account(name)
+            _add_user("acme", acme_kp, "app")
+            self.index.nsc_command_ran(
+                ["nsc", "add", "user", "--account", "acme", "--name", "app"]
+            )
+            assert self.index.has_user("acme", "app")
+            # one users listing per added account, no rescan of the whole store
+            assert [c.args[0] for c in index_users.call_args_list] == ["a", "b", "c"]
+        assert not self.index._stale
+
+        os.remove(store.user_jwt_path("acme", "app"))
+        self.index.nsc_command_ran(
+            ["nsc", "delete", "user", "--account", "acme", "--name", "app"]
+        )
+        assert self.index.user_names("acme") == []
+        shutil.rmtree(store.account_dir("a"))
+        self.index.nsc_command_ran(["nsc", "delete", "account", "a"])
+        assert self.index.account_names() == ["acme", "b", "c"]
+
+        self.index.nsc_command_ran(["nsc", "pull", "--all"])
+        assert self.index._stale
+
+    def test_skip_add_idempotent(self):
+        acme_kp = _add_account("acme")
+        _add_user("acme", acme_kp, "app")
+        with patch("django_nats_nkeys.services.store_index", self.index):
+            with override_settings(NATS_NSC_RETRY_MODE="IDEMPOTENT"):
+                assert nsc_skip_add("acme")
+                assert nsc_skip_add("acme", user_name="app")
+                assert not nsc_skip_add("robots")
+                assert not nsc_skip_add("acme", user_name="other")
+            with override_settings(NATS_NSC_RETRY_MODE="STRICT"):
+                assert not nsc_skip_add("acme")
@@ -0,0 +1,111 @@
+import time
+
+from coolname import generate_slug
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.test import SimpleTestCase, TestCase
+
+from django_nats_nkeys.errors import NatsSubjectOverlap
+from django_nats_nkeys.models import NatsMessageExport, NatsMessageExportType
+from django_nats_nkeys.services import create_organization
+from django_nats_nkeys.subjects import (
+    SubjectTrie,
+    export_index,
+    validate_subject_pattern,
+)
+
+User = get_user_model()
+
+
+def _trie(*patterns):
+    trie = SubjectTrie()
+    for pattern in patterns:
+        trie.insert(pattern, pattern)
+    return trie
+
+
+class TestSubjectTrie(SimpleTestCase):
+    def test_validate_subject_pattern(self):
+        for pattern in ["a", "a.b", "a.*.c", "a.>", "*", ">"]:
+            validate_subject_pattern(pattern)
+        for pattern in ["", "a..b", "a.>.c", "a.b*", "a.>x", " a", "a b"]:
+            with self.assertRaises(ValueError):
+                validate_subject_pattern(pattern)
+
+    def test_export_clean(self):
+        with self.assertRaises(ValidationError):
+            NatsMessageExport(name="bad", subject_pattern="a.>.b", public=True).clean()
+
+    def test_match(self):
+        trie = _trie("a.b.c", "a.*.c", "a.>", "a.b", "*.b.*", "x.>")
+        assert trie.match("a.b.c") == {"a.b.c", "a.*.c", "a.>", "*.b.*"}
+        assert trie.match("a.b") == {"a.b", "a.>"}
+        assert trie.match("a") == set()
+        # covering a wildcard subject requires a wildcard at least as wide
+        assert trie.match("a.*.c") == {"a.*.c", "a.>"}
+        assert trie.match("a.>") == {"a.>"}
+
+    def test_overlapping(self):
+        trie = _trie("a.b.c", "a.*.c", "a.>", "a.b", "*.b.*", "x.>", "a")
+        assert trie.overlapping("a.b.c") == {"a.b.c", "a.*.c", "a.>", "*.b.*"}
+        assert trie.overlapping("a.>") == {"a.b.c", "a.*.c", "a.>", "a.b", "*.b.*"}
+        assert trie.overlapping("*.*.c") == {"a.b.c", "a.*.c", "a.>", "*.b.*", "x.>"}
+        assert trie.overlapping("x") == set()
+        assert len(trie.overlapping(">")) == len(trie)
+        assert trie.overlapping("y.z") == set()
+
+    def test_remove(self):
+        trie = _trie("a.b.c", "a.>")
+        assert trie.remove("a.b.c", "a.b.c")
+        assert not trie.remove("a.b.c", "a.b.c")
+        assert len(trie) == 1
+        assert trie.match("a.b.c") == {"a.>"}
+
+    def test_lookup_time(self):
+        trie = SubjectTrie()
+        for i in range(20000):
+            trie.insert(f"tenant.{i}.events.>", i)
+            trie.insert(f"tenant.{i}.rpc.*", -i - 1)
+        started = time.perf_counter()
+        for i in range(1000):
+            assert trie.match(f"tenant.{i}.events.created") == {i}
+            assert trie.overlapping(f"tenant.{i}.rpc.ping") == {-i - 1}
+        # 2000 lookups over 40k patterns, far under 1ms each
+        assert time.perf_counter() - started < 2
+
+
+class TestExportIndex(TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.user = User.objects.create(
+            email="subjects@test.com", password="testing1234", is_superuser=False
+        )
+        cls.org = create_organization(
+            cls.user, generate_slug(3), org_user_defaults={"is_admin": True}
+        )
+
+    def _export(self, name, subject_pattern):
+        return NatsMessageExport.objects.create(
+            name=name,
+            subject_pattern=subject_pattern,
+            public=True,
+            export_type=NatsMessageExportType.STREAM,
+        )
+
+    def test_overlapping_export_rejected_before_nsc(self):
+        events = self._export("events", "subjects.events.>")
+        self.org.exports.add(events)
+        created = self._export("created", "subjects.events.created")
+        with self.assertRaises(NatsSubjectOverlap):
+            self.org.exports.add(created)
+        assert not self.org.exports.filter(pk=created.pk).exists()
+
+        assert [e.name for e in export_index.overlapping("subjects.*.created")] == [
+            "created",
+            "events",
+        ]
+        assert [e.name for e in export_index.exports_matching("subjects.events.x")] == [
+            "events"
+        ]
+        assert export_index.importers_matching("subjects.events.x") == set()
@@ -0,0 +1,63 @@
+import json
+import os
+import subprocess
+import tempfile
+from unittest.mock import patch
+
+from django.test import SimpleTestCase, override_settings
+
+from django_nats_nkeys import store
+from django_nats_nkeys.validate import nsc_validate_accounts
+
+
+def _write(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        f.write(data)
+
+
+def fake_run_nsc(cmd, check=True, **kwargs):
+    account = cmd[cmd.index("--account") + 1]
+    returncode = 1 if account == "broken" else 0
+    return subprocess.CompletedProcess(cmd, returncode, stdout="", stderr="")
+
+
+@patch("django_nats_nkeys.services.run_nsc_and_log_output", fake_run_nsc)
+class TestNscValidateAccounts(SimpleTestCase):
+    def setUp(self):
+        self.data_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.data_dir.cleanup)
+        settings_override = override_settings(
+            NATS_NSC_DATA_DIR=self.data_dir.name,
+            NATS_NKEYS_OPERATOR_NAME="TestOperator",
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        _write(store.operator_jwt_path(), "operator")
+        for name in ("acme", "robots", "broken"):
+            _write(store.account_jwt_path(name), name)
+        self.state_file = os.path.join(self.data_dir.name, "validate.json")
+
+    def test_report(self):
+        report = nsc_validate_accounts(account_names=["acme", "robots", "broken"])
+        assert not report.ok()
+        assert [r.account_name for r in report.failed()] == ["broken"]
+        data = json.loads(report.to_json())
+        assert len(data["results"]) == 3
+        assert all("duration" in r for r in data["results"])
+        assert "broken   FAILED" in report.to_table()
+
+    def test_changed_since(self):
+        names = ["acme", "robots", "broken"]
+        report = nsc_validate_accounts(account_names=names, state_file=self.state_file)
+        assert len(report.results) == 3
+
+        # ok and unchanged accounts are skipped, failed accounts are retried
+        report = nsc_validate_accounts(account_names=names, state_file=self.state_file)
+        assert sorted(report.skipped) == ["acme", "robots"]
+        assert [r.account_name for r in report.results] == ["broken"]
+
+        # adding a user changes the account's signature
+        _write(store.user_jwt_path("acme", "app"), "user")
+        report = nsc_validate_accounts(account_names=names, state_file=self.state_file)
+        assert sorted(r.account_name for r in report.results) == ["acme", "broken"]
@@ -0,0 +1,161 @@
+import json
+import os
+import time
+from dataclasses import asdict, dataclass, field
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from django_nats_nkeys import store
+from django_nats_nkeys.executor import nsc_executor
+from django_nats_nkeys.store_index import store_index
+
+# (operator jwt mtime, account jwt mtime, account jwt size, newest user jwt mtime, user count)
+AccountSignature = Tuple[int, int, int, int, int]
+
+
+@dataclass(init=True, repr=True)
+class NscValidationResult:
+    account_name: str
+    ok: bool
+    returncode: int
+    duration: float
+    output: str
+
+
+@dataclass(init=True, repr=True)
+class NscValidationReport:
+    results: List[NscValidationResult] = field(default_factory=list)
+    # accounts unchanged since the last successful validation
+    skipped: List[str] = field(default_factory=list)
+    duration: float = 0.0
+
+    def ok(self) -> bool:
+        return all(r.ok for r in self.results)
+
+    def failed(self) -> List[NscValidationResult]:
+        return [r for r in self.results if not r.ok]
+
+    def to_dict(self) -> Dict:
+        return {
+            "ok": self.ok(),
+            "duration": self.duration,
+            "results": [asdict(r) for r in self.results],
+            "skipped": self.skipped,
+        }
+
+    def to_json(self, **kwargs) -> str:
+        return json.dumps(self.to_dict(), **kwargs)
+
+    def to_table(self) -> str:
+        width = max([len("ACCOUNT")] + [len(r.account_name) for r in self.results])
+        lines = [f"{'ACCOUNT'.ljust(width)}  STATUS  SECONDS"]
+        for r in sorted(self.results, key=lambda r: r.account_name):
+            status = "ok" if r.ok else "FAILED"
+            lines.append(
+                f"{r.account_name.ljust(width)}  {status.ljust(6)}  {r.duration:.2f}"
+            )
+        lines.append(
+            f"{len(self.results)} validated, {len(self.failed())} failed, {len(self.skipped)} unchanged, {self.duration:.2f}s"
+        )
+        return "\n".join(lines)
+
+
+def account_signature(account_name: str) -> Optional[AccountSignature]:
+    """
+    Changes whenever the operator, the account or one of its users is edited, added or removed
+    """
+    try:
+        operator_st = os.stat(store.operator_jwt_path())
+        account_st = os.stat(store.account_jwt_path(account_name))
+    except OSError:
+        return None
+    users_dir = os.path.join(store.account_dir(account_name), "users")
+    newest_user, user_count = 0, 0
+    try:
+        with os.scandir(users_dir) as entries:
+            for entry in entries:
+                if entry.name.endswith(".jwt"):
+                    user_count += 1
+                    newest_user = max(newest_user, entry.stat().st_mtime_ns)
+    except OSError:
+        pass
+    return (
+        operator_st.st_mtime_ns,
+        account_st.st_mtime_ns,
+        account_st.st_size,
+        newest_user,
+        user_count,
+    )
+
+
+def _load_state(path: Optional[str]) -> Dict[str, List[int]]:
+    if path is None or not os.path.exists(path):
+        return {}
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def _save_state(path: str, state: Dict[str, List[int]]) -> None:
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(state, f)
+    os.replace(tmp, path)
+
+
+def _validate(account_name: str) -> NscValidationResult:
+    from django_nats_nkeys.services import NSCValidator
+
+    start = time.monotonic()
+    validator = NSCValidator(account_name=account_name)
+    validator.run()
+    return NscValidationResult(
+        account_name=account_name,
+        ok=validator.ok(),
+        returncode=validator.result.returncode,
+        duration=time.monotonic() - start,
+        output=(validator.result.stdout or "") + (validator.result.stderr or ""),
+    )
+
+
+def nsc_validate_accounts(
+    account_names: Optional[Iterable[str]] = None, state_file: Optional[str] = None
+) -> NscValidationReport:
+    """
+    Runs `nsc validate --account <account>` for each account in parallel on nsc_executor
+
+    account_names defaults to every account in the nsc store.
+    If state_file is given, accounts whose JWTs haven't changed since they last validated ok (according to state_file) are skipped, and state_file is updated with this run's results.
+    """
+    start = time.monotonic()
+    if account_names is None:
+        account_names = store_index.account_names()
+    state = _load_state(state_file)
+    report = NscValidationReport()
+
+    signatures = {}
+    to_validate = []
+    for account_name in account_names:
+        signature = account_signature(account_name)
+        signatures[account_name] = signature
+        if (
+            state_file is not None
+            and signature is not None
+            and state.get(account_name) == list(signature)
+        ):
+            report.skipped.append(account_name)
+        else:
+            to_validate.append(account_name)
+
+    futures = [nsc_executor.submit(_validate, name) for name in to_validate]
+    for future in futures:
+        result = future.result()
+        report.results.append(result)
+        signature = signatures[result.account_name]
+        if result.ok and signature is not None:
+            state[result.account_name] = list(signature)
+        else:
+            state.pop(result.account_name, None)
+
+    if state_file is not None:
+        _save_state(state_file, state)
+    report.duration = time.monotonic() - start
+    return report